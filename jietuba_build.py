@@ -193,6 +193,10 @@ def build_executable():
     # SVG 目录的绝对路径
     svg_dir = os.path.join(current_dir, 'svg')
     
+    # 生成二进制资源文件（运行时内存映射注册，代替导入 jietuba_resource 模块）
+    from jietuba_resource_loader import build_rcc
+    rcc_file = build_rcc(os.path.join(current_dir, 'jietuba_resource.rcc'))
+    
     # PyInstaller 参数
     args = [
         'main.py',                          # 主程序入口
@@ -203,6 +207,7 @@ def build_executable():
         
         # 添加数据文件 - SVG图标（使用绝对路径）
         f'--add-data={svg_dir};svg',        # 包含svg目录及其所有文件
+        f'--add-data={rcc_file};.',         # 图标资源 (.rcc)
         
         # 核心依赖
         '--hidden-import=PyQt5.QtCore',
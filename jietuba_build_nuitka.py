@@ -102,6 +102,10 @@ def build_executable():
     # 获取当前目录
     current_dir = os.path.dirname(os.path.abspath(__file__))
     
+    # 生成二进制资源文件（运行时内存映射注册，代替导入 jietuba_resource 模块）
+    from jietuba_resource_loader import build_rcc
+    rcc_file = build_rcc(os.path.join(current_dir, 'jietuba_resource.rcc'))
+    
     # Nuitka 参数
     args = [
         sys.executable,                     # 当前 Python 解释器
@@ -140,6 +144,8 @@ def build_executable():
         '--include-module=jietuba_long_stitch',
         '--include-module=jietuba_public',
         '--include-module=jietuba_resource',
+        '--include-module=jietuba_resource_loader',
+        f'--include-data-files={rcc_file}=jietuba_resource.rcc',
         '--include-module=jietuba_screenshot',
         '--include-module=jietuba_scroll',
         '--include-module=jietuba_stitch',
@@ -0,0 +1,320 @@
+"""
+jietuba_capture.py - 区域截屏服务模块
+
+只截取指定区域,而不是每次都 grabWindow(0) 整个屏幕再合成虚拟桌面。
+单帧截屏的开销与区域大小成正比,与桌面大小无关。
+
+主要功能:
+- 根据全局(逻辑)坐标矩形找到所在的 QScreen,按该屏幕的相对坐标截取
+- 区域跨越多个显示器时,只截取每个屏幕上相交的部分并合成
+- 返回的 QPixmap 为物理像素分辨率,并带有对应的 devicePixelRatio
+- 记录/读取"上一次截图区域",供"重复上次区域"快捷键直接截图
+- 多屏截图: 各屏幕在主线程依次 grabWindow 并单独保存;截图界面仍需要
+  compose() 合成的整张虚拟桌面(单屏时直接用该屏截图,不复制)
+
+主要类/函数:
+- screen_for_rect(): 与矩形相交面积最大的屏幕
+- grab_region(): 截取全局坐标矩形
+- save_last_region() / load_last_region(): 上次截图区域的持久化
+- DesktopCapture: 按屏幕保存的整桌面截图 (grab / compose)
+- CaptureRingBuffer: 低延迟模式下由主线程定时器定时截屏,保留最近几帧,
+  按下快捷键时直接用最新一帧显示截图界面
+  (截屏在主线程进行,间隔默认 1 秒;按住鼠标或编辑钉图期间跳过)
+- capture_exclusion_supported(): 系统能否把截图界面排除在截屏之外
+  (不支持时缓冲帧无法事后刷新,只接受足够新的帧)
+
+使用方法:
+    from jietuba_capture import grab_region
+    pixmap = grab_region(QRect(100, 100, 800, 600))
+"""
+
+import sys
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+from PyQt5.QtCore import QRect, QSettings, Qt, QTimer
+from PyQt5.QtGui import QGuiApplication, QPainter, QPixmap
+
+
+_LAST_REGION_KEY = 'screenshot/last_region'
+
+
+def _intersections(rect: QRect) -> List[Tuple[object, QRect]]:
+    """返回 [(screen, 与该屏幕相交的全局矩形)]，按相交面积从大到小排序"""
+    result = []
+    for screen in QGuiApplication.screens():
+        part = screen.geometry().intersected(rect)
+        if not part.isEmpty():
+            result.append((screen, part))
+    result.sort(key=lambda item: item[1].width() * item[1].height(), reverse=True)
+    return result
+
+
+def screen_for_rect(rect: QRect):
+    """返回与矩形相交面积最大的屏幕（都不相交时返回主屏）"""
+    parts = _intersections(rect)
+    if parts:
+        return parts[0][0]
+    return QGuiApplication.primaryScreen()
+
+
+def _grab_on_screen(screen, rect: QRect) -> QPixmap:
+    """在指定屏幕上截取全局矩形（grabWindow(0) 的坐标相对于该屏幕）"""
+    geo = screen.geometry()
+    return screen.grabWindow(0, rect.x() - geo.x(), rect.y() - geo.y(), rect.width(), rect.height())
+
+
+def grab_region(rect: QRect) -> QPixmap:
+    """截取全局逻辑坐标矩形
+
+    Args:
+        rect: 全局坐标（与 QScreen.geometry() 同一坐标系）
+
+    Returns:
+        QPixmap: 物理像素分辨率的截图；区域不在任何屏幕上时返回空 QPixmap
+    """
+    if rect is None or rect.isEmpty():
+        return QPixmap()
+    parts = _intersections(rect)
+    if not parts:
+        return QPixmap()
+
+    # 常见情况：区域完整位于一个屏幕内，直接截取
+    if len(parts) == 1 and parts[0][1] == rect:
+        return _grab_on_screen(parts[0][0], rect)
+
+    # 跨屏：以相交面积最大的屏幕的 DPR 建立画布，只截取每个屏幕相交的部分
+    ratio = parts[0][0].devicePixelRatio()
+    canvas = QPixmap(int(round(rect.width() * ratio)), int(round(rect.height() * ratio)))
+    canvas.setDevicePixelRatio(ratio)
+    canvas.fill(Qt.black)
+    painter = QPainter(canvas)
+    for screen, part in parts:
+        piece = _grab_on_screen(screen, part)
+        if piece.isNull():
+            continue
+        target = QRect(part.x() - rect.x(), part.y() - rect.y(), part.width(), part.height())
+        painter.drawPixmap(target, piece)
+    painter.end()
+    return canvas
+
+
+def save_last_region(rect: QRect) -> None:
+    """保存上一次截图区域（全局坐标）"""
+    if rect is None or rect.isEmpty():
+        return
+    QSettings('Fandes', 'jietuba').setValue(_LAST_REGION_KEY, [rect.x(), rect.y(), rect.width(), rect.height()])
+
+
+def load_last_region() -> Optional[QRect]:
+    """读取上一次截图区域；不存在或已不在任何屏幕上时返回 None"""
+    value = QSettings('Fandes', 'jietuba').value(_LAST_REGION_KEY, None)
+    if not value:
+        return None
+    try:
+        x, y, w, h = (int(v) for v in value)
+    except (TypeError, ValueError):
+        return None
+    rect = QRect(x, y, w, h)
+    if rect.isEmpty() or not _intersections(rect):
+        return None
+    return rect
+
+
+def capture_exclusion_supported() -> bool:
+    """是否支持 SetWindowDisplayAffinity(WDA_EXCLUDEFROMCAPTURE)（Windows 10 2004 / build 19041 以上）"""
+    if not sys.platform.startswith("win"):
+        return False
+    try:
+        return sys.getwindowsversion().build >= 19041
+    except Exception:
+        return False
+
+
+class ScreenTile:
+    """单个屏幕的截图"""
+
+    __slots__ = ("name", "geometry", "dpr", "pixmap")
+
+    def __init__(self, name: str, geometry: QRect, dpr: float, pixmap: QPixmap):
+        self.name = name
+        self.geometry = QRect(geometry)
+        self.dpr = dpr
+        self.pixmap = pixmap
+
+
+class DesktopCapture:
+    """按屏幕保存的整桌面截图
+
+    每个屏幕的截图单独保存：
+    - region() 把与目标区域相交的屏幕合成到一张图上
+    - compose() 合成整张虚拟桌面（截图界面的背景），多屏时会分配整张画布
+    """
+
+    def __init__(self, tiles: List[ScreenTile]):
+        self.tiles = tiles
+        self.grab_ms = 0.0
+
+    @classmethod
+    def grab(cls, screens=None) -> "DesktopCapture":
+        """截取所有屏幕（必须在 GUI 线程调用）
+
+        Args:
+            screens: 要截取的屏幕列表，默认全部
+        """
+        screens = list(screens if screens is not None else QGuiApplication.screens())
+
+        start = time.perf_counter()
+        pixmaps = [screen.grabWindow(0) for screen in screens]
+
+        tiles = []
+        for i, (screen, pixmap) in enumerate(zip(screens, pixmaps)):
+            try:
+                name = screen.name()
+            except Exception:
+                name = f"Screen{i+1}"
+            tiles.append(ScreenTile(name, screen.geometry(), screen.devicePixelRatio(), pixmap))
+
+        capture = cls(tiles)
+        capture.grab_ms = (time.perf_counter() - start) * 1000
+        return capture
+
+    @property
+    def bounds(self) -> QRect:
+        """虚拟桌面范围（全局逻辑坐标）"""
+        rect = QRect()
+        for tile in self.tiles:
+            rect = rect.united(tile.geometry)
+        return rect
+
+    def region(self, rect: QRect, fill=Qt.black) -> QPixmap:
+        """合成全局坐标矩形内的画面（逻辑尺寸，带透明通道）
+
+        只绘制与 rect 相交的屏幕，未被任何屏幕覆盖的部分以 fill 填充。
+        """
+        canvas = QPixmap(max(1, rect.width()), max(1, rect.height()))
+        canvas.fill(Qt.transparent)  # 先填透明，保证结果带透明通道
+        painter = QPainter(canvas)
+        if fill is not None and fill != Qt.transparent:
+            painter.fillRect(canvas.rect(), fill)
+        for tile in self.tiles:
+            part = tile.geometry.intersected(rect)
+            if part.isEmpty() or tile.pixmap.isNull():
+                continue
+            # 屏幕内的源矩形按 DPR 换算成物理像素
+            source = QRect(
+                int(round((part.x() - tile.geometry.x()) * tile.dpr)),
+                int(round((part.y() - tile.geometry.y()) * tile.dpr)),
+                int(round(part.width() * tile.dpr)),
+                int(round(part.height() * tile.dpr)),
+            )
+            target = QRect(part.x() - rect.x(), part.y() - rect.y(), part.width(), part.height())
+            painter.drawPixmap(target, tile.pixmap, source)
+        painter.end()
+        return canvas
+
+    def compose(self) -> QPixmap:
+        """合成整张虚拟桌面
+
+        只有一个屏幕时直接返回该屏幕的截图，不做任何复制。
+        """
+        if len(self.tiles) == 1:
+            return self.tiles[0].pixmap
+        return self.region(self.bounds)
+
+    def release(self) -> None:
+        """释放各屏幕截图"""
+        self.tiles = []
+
+
+class CaptureRingBuffer:
+    """定时截屏环形缓冲（低延迟截图模式）
+
+    每隔 interval 秒截取一次整桌面，只保留最近 size 帧。
+    QPixmap 与 grabWindow 只能在 GUI 线程使用，因此由主线程的 QTimer 驱动，
+    所有方法也都在主线程调用。每次截屏都会占用主线程（多屏时更久），所以：
+    - 间隔默认 1 秒
+    - 按住鼠标（拖动钉图、绘制等）或 busy() 返回 True（例如正在编辑钉图）时跳过本次截屏
+    截图界面显示期间调用 pause()，避免把截图界面本身截进去。
+    """
+
+    def __init__(self, interval: float = 1.0, size: int = 2, busy: Optional[Callable[[], bool]] = None):
+        self.interval = max(0.1, float(interval))
+        self._frames = deque(maxlen=max(1, int(size)))
+        self._paused = False
+        self._timer: Optional[QTimer] = None
+        self._busy = busy
+
+    def start(self) -> "CaptureRingBuffer":
+        self._timer = QTimer()
+        self._timer.timeout.connect(self._grab_once)
+        self._timer.start(int(self.interval * 1000))
+        print(f"🎞️ [低延迟] 定时截屏已启动: 间隔={self.interval:.2f}s 缓冲={self._frames.maxlen}帧")
+        return self
+
+    def stop(self) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+            self._timer = None
+        self.clear()
+
+    def pause(self) -> None:
+        """暂停截取并丢弃已缓存的帧"""
+        self._paused = True
+        self.clear()
+
+    def resume(self) -> None:
+        self._paused = False
+
+    def clear(self) -> None:
+        self._frames.clear()
+
+    def _grab_once(self) -> None:
+        if self._paused or self._timer is None:
+            return
+        if QGuiApplication.mouseButtons() != Qt.NoButton:
+            return
+        if self._busy is not None:
+            try:
+                if self._busy():
+                    return
+            except Exception:
+                pass
+        try:
+            capture = DesktopCapture.grab()
+        except Exception as e:
+            print(f"⚠️ [低延迟] 定时截屏失败: {e}")
+            return
+        self._frames.append((time.perf_counter(), capture))
+
+    def take_latest(self, max_age: Optional[float] = None) -> Optional[Tuple[DesktopCapture, float]]:
+        """取出最新一帧
+
+        Args:
+            max_age: 可接受的最大帧龄（秒），默认 2 个截屏间隔
+
+        Returns:
+            (capture, age_seconds)；没有足够新的帧时返回 None
+        """
+        if not self._frames:
+            return None
+        stamp, capture = self._frames.pop()
+        self._frames.clear()
+        age = time.perf_counter() - stamp
+        if max_age is None:
+            max_age = 2 * self.interval
+        if age > max_age:
+            return None
+        return capture, age
+
+
+__all__ = [
+    "screen_for_rect",
+    "grab_region",
+    "save_last_region",
+    "load_last_region",
+    "DesktopCapture",
+    "CaptureRingBuffer",
+    "capture_exclusion_supported",
+]
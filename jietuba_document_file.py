@@ -0,0 +1,433 @@
+"""
+jietuba_document_file.py - 可继续编辑的标注文件格式 (.jtba)
+
+钉图窗口关闭后 layer_document 随之释放，只能保存合成后的 PNG，无法再次编辑。
+本模块把底图与矢量命令一起存成一个二进制容器，重新打开后可以继续编辑/撤销。
+
+文件布局（小端序，各段按读取顺序排列，可只读前面的部分）:
+
+    头部      固定 88 字节: 魔数、版本、尺寸、命令数、底图格式、各段偏移/长度
+    缩略图    PNG（合成后的效果图，长边不超过 256px）
+    索引      每条命令 28 字节: 在命令表中的偏移/长度 + 归一化包围盒 (float32)
+    命令表    每条命令: 定长字段 + 点坐标 (float64 交错数组) + extra (JSON)
+    底图      PNG / WebP / raw (zlib 压缩的原始像素)
+
+命令记录与 VectorLayerDocument.export_state()/import_state() 的字典格式一致，
+点坐标直接以 array('d') 的字节写入/读出，读取时不逐点构造 Python 对象。
+
+使用方法:
+    from jietuba_document_file import save_document, DocumentFileReader, load_document
+    save_document("a.jtba", freezer.layer_document)
+    reader = DocumentFileReader("a.jtba")   # 只读取头部和索引
+    thumb = reader.thumbnail()              # QImage
+    doc = reader.load_document()            # 完整的 VectorLayerDocument
+
+命令行:
+    python jietuba_document_file.py --bench     # 往返校验并比较各底图格式的保存/加载耗时
+"""
+
+import json
+import math
+import os
+import struct
+import sys
+import time
+import zlib
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QSize, Qt
+from PyQt5.QtGui import QImage, QPixmap
+
+from jietuba_layer_system import PointBuffer, VectorLayerDocument, command_bounds
+
+
+FILE_SUFFIX = ".jtba"
+FILE_FILTER = "jietuba 編集ファイル (*.jtba)"
+
+MAGIC = b"JTBA"
+VERSION = 1
+
+# 魔数, 版本, 标志, 宽, 高, 命令数, 底图格式, (缩略图, 索引, 命令表, 底图) 的 (偏移, 长度)
+_HEADER = struct.Struct("<4sHHIII4s8Q")
+# 命令表中的偏移, 长度, 包围盒 x0, y0, x1, y1
+_INDEX_ENTRY = struct.Struct("<QI4f")
+# 类型, 混合模式, RGBA, width_ratio, 点数, extra 字节数
+_RECORD = struct.Struct("<BB4BdII")
+# raw 底图: QImage 格式, 宽, 高, 每行字节数
+_RAW_HEADER = struct.Struct("<IIII")
+
+KINDS = ("stroke", "rect", "circle", "arrow", "text", "number")
+BLENDS = ("normal", "multiply")
+BASE_FORMATS = {"png": b"png\0", "webp": b"webp", "raw": b"raw\0"}
+_RAW_FORMATS = (QImage.Format_RGB32, QImage.Format_ARGB32, QImage.Format_ARGB32_Premultiplied)
+
+THUMBNAIL_SIZE = 256
+
+
+class DocumentHeader:
+    """文件头（只读取前 88 字节即可得到）"""
+
+    __slots__ = ("version", "flags", "width", "height", "command_count", "base_format", "sections")
+
+    def __init__(self, version, flags, width, height, command_count, base_format, sections):
+        self.version = version
+        self.flags = flags
+        self.width = width
+        self.height = height
+        self.command_count = command_count
+        self.base_format = base_format
+        # {"thumbnail"/"index"/"table"/"base": (offset, length)}
+        self.sections = sections
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "DocumentHeader":
+        if len(data) < _HEADER.size or data[:4] != MAGIC:
+            raise ValueError("jietuba 编辑文件格式不正确")
+        magic, version, flags, width, height, count, base_tag, *offsets = _HEADER.unpack_from(data)
+        if version > VERSION:
+            raise ValueError(f"不支持的 jietuba 编辑文件版本: {version}")
+        base_format = next((name for name, tag in BASE_FORMATS.items() if tag == base_tag), None)
+        if base_format is None:
+            raise ValueError(f"未知的底图格式: {base_tag!r}")
+        names = ("thumbnail", "index", "table", "base")
+        sections = {name: (offsets[i * 2], offsets[i * 2 + 1]) for i, name in enumerate(names)}
+        return cls(version, flags, width, height, count, base_format, sections)
+
+
+def _points_to_bytes(points) -> bytes:
+    data = PointBuffer.coerce(points)._data
+    if sys.byteorder != "little":
+        data = array("d", data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _points_from_bytes(data) -> PointBuffer:
+    values = array("d")
+    values.frombytes(data)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return PointBuffer.from_array(values)
+
+
+def _encode_record(record: Dict) -> bytes:
+    kind = record.get("kind", "stroke")
+    if kind not in KINDS:
+        raise ValueError(f"无法保存的命令类型: {kind}")
+    blend = record.get("blend", "normal")
+    if blend not in BLENDS:
+        raise ValueError(f"无法保存的混合模式: {blend}")
+    r, g, b, a = (int(v) for v in record.get("color", (255, 0, 0, 255)))
+    points = _points_to_bytes(record.get("points", ()))
+    extra = record.get("extra") or {}
+    extra_bytes = json.dumps(extra, ensure_ascii=False, separators=(",", ":")).encode("utf-8") if extra else b""
+    head = _RECORD.pack(
+        KINDS.index(kind),
+        BLENDS.index(blend),
+        r, g, b, a,
+        float(record.get("width_ratio", 0.0)),
+        len(points) // 16,
+        len(extra_bytes),
+    )
+    return head + points + extra_bytes
+
+
+def _decode_record(data, offset: int = 0) -> Dict:
+    kind, blend, r, g, b, a, width_ratio, count, extra_len = _RECORD.unpack_from(data, offset)
+    start = offset + _RECORD.size
+    end = start + count * 16
+    view = memoryview(data)
+    extra = json.loads(bytes(view[end:end + extra_len]).decode("utf-8")) if extra_len else {}
+    return {
+        "kind": KINDS[kind],
+        "points": _points_from_bytes(view[start:end]),
+        "width_ratio": width_ratio,
+        "color": (r, g, b, a),
+        "blend": BLENDS[blend],
+        "extra": extra,
+    }
+
+
+def _encode_image(image: QImage, fmt: str) -> bytes:
+    if fmt == "raw":
+        if image.format() not in _RAW_FORMATS:
+            image = image.convertToFormat(QImage.Format_ARGB32)
+        head = _RAW_HEADER.pack(int(image.format()), image.width(), image.height(), image.bytesPerLine())
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        return head + zlib.compress(bytes(bits), 1)
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    if not image.save(buffer, fmt.upper()):
+        raise ValueError(f"底图编码失败: {fmt}")
+    buffer.close()
+    return bytes(data)
+
+
+def _decode_image(data: bytes, fmt: str) -> QImage:
+    if fmt == "raw":
+        qformat, width, height, bytes_per_line = _RAW_HEADER.unpack_from(data)
+        pixels = zlib.decompress(memoryview(data)[_RAW_HEADER.size:])
+        # QImage 不持有外部缓冲区，copy() 后与 pixels 脱离
+        return QImage(pixels, width, height, bytes_per_line, QImage.Format(qformat)).copy()
+    image = QImage()
+    if not image.loadFromData(data, fmt.upper()):
+        raise ValueError(f"底图解码失败: {fmt}")
+    return image
+
+
+def _supports_format(fmt: str) -> bool:
+    if fmt == "raw":
+        return True
+    from PyQt5.QtGui import QImageWriter
+    return fmt.encode() in [bytes(name) for name in QImageWriter.supportedImageFormats()]
+
+
+def save_document(
+    path: str,
+    document: VectorLayerDocument,
+    *,
+    base_format: str = "png",
+    thumbnail_size: int = THUMBNAIL_SIZE,
+) -> int:
+    """把底图与矢量命令保存为 .jtba 文件（先写临时文件再替换，写到一半不会损坏原文件）
+
+    Args:
+        base_format: 底图格式 "png" / "webp" / "raw"；WebP 插件不可用时回退到 PNG
+        thumbnail_size: 缩略图长边像素，0 表示不写缩略图
+
+    Returns:
+        写入的字节数
+    """
+    if base_format not in BASE_FORMATS:
+        raise ValueError(f"未知的底图格式: {base_format}")
+    base = document.base_pixmap()
+    if base is None or base.isNull():
+        raise ValueError("文档没有底图，无法保存")
+    if not _supports_format(base_format):
+        print(f"⚠️ [编辑文件] 不支持 {base_format}，改用 png 保存底图")
+        base_format = "png"
+
+    thumbnail = b""
+    if thumbnail_size > 0:
+        size = document.base_size.scaled(QSize(thumbnail_size, thumbnail_size), Qt.KeepAspectRatio)
+        if size.width() < 1 or size.height() < 1:
+            size = QSize(max(1, size.width()), max(1, size.height()))
+        try:
+            thumbnail = _encode_image(document.render_composited(size).toImage(), "png")
+        except Exception as e:
+            # 缩略图只用于预览，生成失败不影响保存
+            print(f"⚠️ [编辑文件] 缩略图生成失败: {e}")
+
+    index_parts: List[bytes] = []
+    table_parts: List[bytes] = []
+    table_length = 0
+    for cmd, record in zip(document.commands, document.export_state()):
+        encoded = _encode_record(record)
+        bounds = command_bounds(cmd) or (math.nan,) * 4
+        index_parts.append(_INDEX_ENTRY.pack(table_length, len(encoded), *bounds))
+        table_parts.append(encoded)
+        table_length += len(encoded)
+    index = b"".join(index_parts)
+    base_data = _encode_image(base.toImage(), base_format)
+
+    offset = _HEADER.size
+    sections = []
+    for length in (len(thumbnail), len(index), table_length, len(base_data)):
+        sections.extend((offset, length))
+        offset += length
+    header = _HEADER.pack(
+        MAGIC, VERSION, 0, base.width(), base.height(), len(table_parts),
+        BASE_FORMATS[base_format], *sections,
+    )
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(thumbnail)
+        f.write(index)
+        for part in table_parts:
+            f.write(part)
+        f.write(base_data)
+    os.replace(tmp_path, path)
+    return offset
+
+
+class DocumentFileReader:
+    """按需读取 .jtba 文件: 构造时只读头部与索引，缩略图/命令/底图在访问时才读取"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.header = DocumentHeader.unpack(f.read(_HEADER.size))
+            offset, length = self.header.sections["index"]
+            f.seek(offset)
+            index = f.read(length)
+        if len(index) != self.header.command_count * _INDEX_ENTRY.size:
+            raise ValueError("jietuba 编辑文件索引已损坏")
+        self._index = [entry for entry in _INDEX_ENTRY.iter_unpack(index)]
+
+    def __len__(self) -> int:
+        return self.header.command_count
+
+    @property
+    def size(self) -> QSize:
+        return QSize(self.header.width, self.header.height)
+
+    def _read_section(self, name: str, start: int = 0, length: Optional[int] = None) -> bytes:
+        offset, total = self.header.sections[name]
+        length = total - start if length is None else length
+        with open(self.path, "rb") as f:
+            f.seek(offset + start)
+            data = f.read(length)
+        if len(data) != length:
+            raise ValueError(f"jietuba 编辑文件不完整: {name}")
+        return data
+
+    def thumbnail(self) -> QImage:
+        """缩略图（合成后的效果图）；文件未包含缩略图时返回空 QImage"""
+        if not self.header.sections["thumbnail"][1]:
+            return QImage()
+        return _decode_image(self._read_section("thumbnail"), "png")
+
+    def base_image(self) -> QImage:
+        return _decode_image(self._read_section("base"), self.header.base_format)
+
+    def bounds(self, index: int) -> Optional[Tuple[float, float, float, float]]:
+        """第 index 条命令的归一化包围盒（来自索引，不读取命令表）"""
+        bounds = self._index[index][2:]
+        return None if math.isnan(bounds[0]) else bounds
+
+    def commands_in_rect(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+        """包围盒与归一化矩形相交的命令序号（只用索引判断）"""
+        result = []
+        for i, (_offset, _length, bx0, by0, bx1, by1) in enumerate(self._index):
+            if not math.isnan(bx0) and bx0 <= x1 and bx1 >= x0 and by0 <= y1 and by1 >= y0:
+                result.append(i)
+        return result
+
+    def command(self, index: int) -> Dict:
+        """读取单条命令记录（格式同 export_state）"""
+        offset, length = self._index[index][:2]
+        return _decode_record(self._read_section("table", offset, length))
+
+    def iter_commands(self) -> Iterator[Dict]:
+        table = self._read_section("table")
+        for offset, _length, *_bounds in self._index:
+            yield _decode_record(table, offset)
+
+    def export_state(self) -> List[Dict]:
+        """全部命令记录，可直接传给 VectorLayerDocument.import_state()"""
+        return list(self.iter_commands())
+
+    def load_document(self) -> VectorLayerDocument:
+        document = VectorLayerDocument(QPixmap.fromImage(self.base_image()))
+        document.import_state(self.iter_commands())
+        return document
+
+
+def read_header(path: str) -> DocumentHeader:
+    """只读取文件头（尺寸、命令数等）"""
+    with open(path, "rb") as f:
+        return DocumentHeader.unpack(f.read(_HEADER.size))
+
+
+def load_document(path: str) -> VectorLayerDocument:
+    return DocumentFileReader(path).load_document()
+
+
+def _benchmark_document(width: int = 1920, height: int = 1080, strokes: int = 300) -> VectorLayerDocument:
+    """生成带渐变底图和随机笔迹/形状/文字的测试文档"""
+    import random
+    from PyQt5.QtGui import QColor, QLinearGradient, QPainter
+
+    random.seed(0)
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor(240, 240, 245))
+    gradient.setColorAt(1, QColor(60, 90, 140))
+    painter.fillRect(image.rect(), gradient)
+    for _ in range(200):
+        painter.fillRect(random.randrange(width), random.randrange(height), 120, 16, QColor(30, 30, 30))
+    painter.end()
+    document = VectorLayerDocument(QPixmap.fromImage(image))
+    for i in range(strokes):
+        x, y = random.random(), random.random()
+        points = []
+        for _ in range(random.randint(20, 400)):
+            x = min(1.0, max(0.0, x + random.uniform(-0.004, 0.004)))
+            y = min(1.0, max(0.0, y + random.uniform(-0.004, 0.004)))
+            points.append((x, y))
+        highlight = i % 5 == 0
+        document.add_stroke(
+            points, QColor(255, 255, 0, 90) if highlight else QColor(220, 30, 30), 0.004,
+            blend="multiply" if highlight else "normal", brush="square" if highlight else "round",
+            extra_meta={"raw_alpha": 90.0} if highlight else None,
+        )
+    for i in range(strokes // 10):
+        start, end = (random.random(), random.random()), (random.random(), random.random())
+        document.add_arrow(start, end, QColor(0, 120, 255), 0.003)
+        document.add_rect(start, end, QColor(0, 160, 0), 0.002)
+        document.add_text(start, f"注釈 {i}\n二行目", QColor(0, 0, 0), 0.02, 1.2, font_family="Meiryo")
+        document.add_number(end, i + 1, QColor(255, 255, 255), QColor(220, 0, 0), 0.02)
+    return document
+
+
+def benchmark(path: str = "") -> None:
+    """往返校验，并比较各底图格式的文件大小与保存/加载耗时"""
+    import tempfile
+
+    document = _benchmark_document()
+    original = document.export_state()
+    points = sum(len(record["points"]) for record in original)
+    print(f"📊 [编辑文件] 测试文档: {len(original)} 条命令, {points} 个点, "
+          f"底图 {document.base_size.width()}x{document.base_size.height()}")
+    folder = os.path.dirname(path) if path else tempfile.gettempdir()
+    for fmt in ("png", "webp", "raw"):
+        if not _supports_format(fmt):
+            print(f"   {fmt:<5} 不可用（缺少图像格式插件）")
+            continue
+        target = path or os.path.join(folder, f"jietuba_bench_{fmt}{FILE_SUFFIX}")
+        start = time.perf_counter()
+        written = save_document(target, document, base_format=fmt)
+        saved = time.perf_counter()
+        reader = DocumentFileReader(target)
+        reader.thumbnail()
+        opened = time.perf_counter()
+        commands = reader.export_state()
+        decoded = time.perf_counter()
+        loaded = reader.load_document()
+        done = time.perf_counter()
+        same = commands == original and loaded.export_state() == original
+        if fmt == "raw":
+            same = same and loaded.base_pixmap().toImage() == document.base_pixmap().toImage()
+        print(
+            f"   {fmt:<5} {written / 1024:8.0f} KB  保存 {(saved - start) * 1000:6.1f}ms  "
+            f"头部+缩略图 {(opened - saved) * 1000:5.1f}ms  命令 {(decoded - opened) * 1000:5.1f}ms  "
+            f"完整加载 {(done - decoded) * 1000:6.1f}ms  往返一致={same}"
+        )
+        if not path:
+            os.remove(target)
+
+
+__all__ = [
+    "FILE_SUFFIX",
+    "FILE_FILTER",
+    "DocumentHeader",
+    "DocumentFileReader",
+    "save_document",
+    "read_header",
+    "load_document",
+]
+
+
+if __name__ == "__main__":
+    if "--bench" in sys.argv:
+        from PyQt5.QtWidgets import QApplication
+
+        _app = QApplication.instance() or QApplication(sys.argv)
+        args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+        benchmark(args[0] if args else "")
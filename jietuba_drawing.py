@@ -9,6 +9,7 @@ jietuba_drawing.py - 统一绘画模块
 主要类:
 - UnifiedTextDrawer: 统一文字绘制器类
 - MaskLayer: 遮罩层，显示截图选区、手柄、放大镜等
+- MagnifierRenderer: 放大镜渲染器，只采样鼠标附近的小区域并缓存结果
 - PaintLayer: 绘画层，处理所有绘图操作
 
 主要功能函数:
@@ -18,13 +19,14 @@ jietuba_drawing.py - 统一绘画模块
 - PyQt5: GUI框架和绘图功能
 """
 
-import math
 from typing import Optional
 from PyQt5.QtCore import Qt, QRect, QRectF, QPoint, QPointF
 from PyQt5.QtGui import (QPainter, QPen, QColor, QBrush, QPixmap, QFont, 
-                         QPolygon, QFontMetrics)
+                         QPolygon, QFontMetrics, QImage, QRegion)
 from PyQt5.QtWidgets import QLabel
-from jietuba_layer_system import StrokeStampRenderer
+from jietuba_layer_system import StrokeStampRenderer, prepare_stroke, stroke_commit_options
+from jietuba_shape_geometry import draw_shape
+from jietuba_text_layout import text_layout
 
 
 # ============================================================================
@@ -86,10 +88,8 @@ class UnifiedTextDrawer:
 
         try:
             painter = QPainter(pixmap)
-            painter.setFont(QFont('', font_size))
             painter.setPen(QPen(color, 3, Qt.SolidLine))
 
-            lines = text.split('\n')
             line_height = font_size * 2.0
             if document_size:
                 base_x = pos[0] + document_size.height() / 8 - 3
@@ -98,9 +98,7 @@ class UnifiedTextDrawer:
                 base_x = pos[0]
                 base_y = pos[1]
 
-            for i, line in enumerate(lines):
-                if line.strip():
-                    painter.drawText(base_x, base_y + i * line_height, line)
+            text_layout(text, QFont('', font_size), pixmap).draw(painter, base_x, base_y, line_height)
 
             painter.end()
             return True
@@ -210,11 +208,8 @@ class UnifiedTextDrawer:
 
                 if not handled_by_vector:
                     try:
-                        if font_obj:
-                            pixmap_painter.setFont(font_obj)
-                        for i, line in enumerate(lines):
-                            if line.strip():
-                                pixmap_painter.drawText(base_x, base_y + i * line_height, line)
+                        layout = text_layout(text, font_obj, pixmap_painter.device())
+                        layout.draw(pixmap_painter, base_x, base_y, line_height)
                     except Exception as draw_error:
                         print(f"统一文字绘制: 绘制文字时出错: {draw_error}")
                         return False
@@ -310,18 +305,11 @@ class UnifiedTextDrawer:
             except Exception:
                 font = QFont()
             font.setPointSize(max(1, parent.tool_width))
-            painter.setFont(font)
+            # 排版按行缓存：每次按键只有正在编辑的行需要重新排版
+            layout = text_layout(text, font, target_widget)
+            painter.setFont(layout.font)
             base_pen = QPen(parent.pencolor, 3, Qt.SolidLine)
             painter.setPen(base_pen)
-            
-            # 创建字体度量对象用于精确测量文字宽度（使用相同的字体）
-            font_metrics = QFontMetrics(font)
-
-            def _text_width_local(content: str) -> int:
-                try:
-                    return font_metrics.horizontalAdvance(content)
-                except AttributeError:
-                    return font_metrics.width(content)
 
             lines = text.split('\n')
             line_height = parent.tool_width * 2.0
@@ -358,7 +346,7 @@ class UnifiedTextDrawer:
             for i, line in enumerate(lines):
                 y = base_y + i * line_height
                 painter.setPen(base_pen)
-                painter.drawText(base_x, y, line)
+                layout.draw_line(painter, i, base_x, y)
 
                 # 预编辑文本使用虚线下划线高亮，帮助用户区分候选状态
                 if preedit_text and preedit_start >= 0:
@@ -367,11 +355,9 @@ class UnifiedTextDrawer:
                     overlap_start = max(preedit_start, line_start)
                     overlap_end = min(preedit_end, line_end)
                     if overlap_start < overlap_end:
-                        prefix = line[:overlap_start - line_start]
-                        highlight = line[overlap_start - line_start: overlap_end - line_start]
-                        prefix_width = _text_width_local(prefix)
-                        highlight_width = _text_width_local(highlight)
-                        underline_y = y + font_metrics.descent() + 2
+                        prefix_width = layout.prefix_width(i, overlap_start - line_start)
+                        highlight_width = layout.prefix_width(i, overlap_end - line_start) - prefix_width
+                        underline_y = y + layout.descent + 2
                         highlight_pen = QPen(QColor(parent.pencolor).lighter(140), max(1, parent.tool_width // 6))
                         highlight_pen.setStyle(Qt.DashLine)
                         painter.setPen(highlight_pen)
@@ -380,8 +366,7 @@ class UnifiedTextDrawer:
                         painter.setPen(base_pen)
 
                 if i == cursor_line:
-                    text_before_cursor_in_line = line[:cursor_column] if cursor_column <= len(line) else line
-                    cursor_x = base_x + _text_width_local(text_before_cursor_in_line)
+                    cursor_x = base_x + layout.prefix_width(i, cursor_column)
                     cursor_y = y
 
                 line_offset += len(line) + 1
@@ -398,6 +383,94 @@ class UnifiedTextDrawer:
             print(f"实时文字预览错误: {e}")
 
 
+# ============================================================================
+#  放大镜渲染器
+# ============================================================================
+
+class MagnifierRenderer:
+    """放大镜渲染器
+
+    原实现每次重绘都分配一张 (桌面宽+120)x(桌面高+120) 的 QPixmap 并绘制整张截图，
+    这里只采样鼠标周围 SIZE x SIZE 的源区域（超出边缘的部分填黑），
+    写入预分配的缓冲区后放大；位置和缩放不变时直接复用上次的结果。
+
+    采样源优先使用 Slabel 缓存的 qimg（智能选区初始化时生成），否则直接从截图 pixmap 中取子区域。
+    """
+
+    SIZE = 120
+
+    def __init__(self):
+        self._buffer = QImage(self.SIZE, self.SIZE, QImage.Format_ARGB32_Premultiplied)
+        self._cache_key = None
+        self._cache_pix = None
+
+    @staticmethod
+    def _source(parent):
+        """返回 (采样源, 源的缓存键)"""
+        pixmap = parent.pixmap()
+        img = getattr(parent, 'qimg', None)
+        if img is not None and not img.isNull() and pixmap is not None and img.size() == pixmap.size():
+            return img, ('img', img.cacheKey())
+        if pixmap is not None and not pixmap.isNull():
+            return pixmap, ('pix', pixmap.cacheKey())
+        return None, None
+
+    def pixel_color(self, parent, x, y):
+        """鼠标所在像素的颜色（超出范围返回白色）"""
+        img = getattr(parent, 'qimg', None)
+        if img is not None and not img.isNull():
+            if 0 <= x < img.width() and 0 <= y < img.height():
+                return QColor(img.pixelColor(x, y))
+            return QColor(255, 255, 255)
+        pixmap = parent.pixmap()
+        if pixmap is not None and not pixmap.isNull() and 0 <= x < pixmap.width() and 0 <= y < pixmap.height():
+            return QColor(pixmap.copy(x, y, 1, 1).toImage().pixelColor(0, 0))
+        return QColor(255, 255, 255)
+
+    def render(self, parent, x, y, zoom):
+        """渲染以 (x, y) 为中心的放大图
+
+        Args:
+            parent: 截图窗口（提供 pixmap()/qimg）
+            x, y: 鼠标位置（截图坐标）
+            zoom: 放大量（与原实现一致，为 tool_width）
+
+        Returns:
+            SIZE x SIZE 的 QPixmap；没有采样源时返回 None
+        """
+        source, source_key = self._source(parent)
+        if source is None:
+            return None
+        key = (source_key, x, y, zoom)
+        if key == self._cache_key and self._cache_pix is not None:
+            return self._cache_pix
+
+        half = self.SIZE // 2
+        self._buffer.fill(QColor(0, 0, 0))
+        area = QRect(x - half, y - half, self.SIZE, self.SIZE).intersected(
+            QRect(0, 0, source.width(), source.height()))
+        if not area.isEmpty():
+            painter = QPainter(self._buffer)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            target = QRect(area.x() - (x - half), area.y() - (y - half), area.width(), area.height())
+            if isinstance(source, QImage):
+                painter.drawImage(target, source, area)
+            else:
+                painter.drawPixmap(target, source, area)
+            painter.end()
+
+        scaled_size = self.SIZE + zoom * 10
+        larger = QPixmap.fromImage(self._buffer.scaled(scaled_size, scaled_size))
+        pix = larger.copy(larger.width() // 2 - half, larger.height() // 2 - half, self.SIZE, self.SIZE)
+        self._cache_key = key
+        self._cache_pix = pix
+        return pix
+
+    def invalidate(self):
+        self._cache_key = None
+        self._cache_pix = None
+
+
 # ============================================================================
 #  遮罩层类
 # ============================================================================
@@ -409,12 +482,84 @@ class MaskLayer(QLabel):
         self.parent = parent
         self.setAttribute(Qt.WA_TranslucentBackground, True)
         self.setMouseTracking(True)
+        self.magnifier = MagnifierRenderer()
+        self._painted_overlay_rect = None  # 屏幕上当前显示的选区/手柄/放大镜范围（局部重绘用）
+
+    # ------------------------------------------------------------------
+    # 局部重绘：只刷新选区、手柄、尺寸文字、放大镜新旧位置的并集
+    # ------------------------------------------------------------------
+    INFO_BOX_WIDTH = 150
+    INFO_BOX_HEIGHT = 75
+
+    def _magnifier_visible(self):
+        tools = self.parent.painter_tools
+        return not (tools['drawcircle_on'] or tools['drawrect_bs_on'] or tools['drawarrow_on'] or
+                    tools['drawnumber_on'] or tools['pen_on'] or tools['highlight_on'] or
+                    tools['drawtext_on'] or self.parent.move_rect)
+
+    def _magnifier_origin(self):
+        """放大镜左上角位置（鼠标靠近右/下边缘时显示在左/上方）"""
+        if self.parent.mouse_posx > self.width() - 140:
+            enlarge_box_x = self.parent.mouse_posx - 140
+        else:
+            enlarge_box_x = self.parent.mouse_posx + 20
+        if self.parent.mouse_posy > self.height() - 140:
+            enlarge_box_y = self.parent.mouse_posy - 120
+        else:
+            enlarge_box_y = self.parent.mouse_posy + 20
+        return enlarge_box_x, enlarge_box_y
+
+    def _size_text_pos(self):
+        """尺寸文字的绘制位置"""
+        if self.parent.x1 > self.parent.x0:
+            x = self.parent.x0 + 5
+        else:
+            x = self.parent.x0 - 72
+        if self.parent.y1 > self.parent.y0:
+            y = self.parent.y0 + 15
+        else:
+            y = self.parent.y0 - 5
+        return x, y
+
+    def overlay_rect(self):
+        """当前选区边框、手柄、尺寸文字和放大镜覆盖的范围"""
+        p = self.parent
+        rect = QRect(min(p.x0, p.x1), min(p.y0, p.y1), abs(p.x1 - p.x0), abs(p.y1 - p.y0))
+        # 边框 4px + 手柄半径 6px + 手柄描边
+        result = rect.adjusted(-10, -10, 11, 11)
+
+        x, y = self._size_text_pos()
+        text = '{}x{}'.format(abs(p.x1 - p.x0), abs(p.y1 - p.y0))
+        text_rect = QFontMetrics(self.font()).boundingRect(text).translated(x, y)
+        result = result.united(text_rect.adjusted(-3, -3, 3, 3))
+
+        if self._magnifier_visible():
+            mx, my = self._magnifier_origin()
+            result = result.united(QRect(mx - 2, my - self.INFO_BOX_HEIGHT - 2,
+                                         self.INFO_BOX_WIDTH + 4, self.INFO_BOX_HEIGHT + 124))
+        return result
+
+    def dirty_region(self):
+        """计算需要重绘的区域（已绘制的覆盖范围与当前覆盖范围的并集）
+
+        选区外的阴影只会在新旧选区的差集内变化，已包含在并集中。
+        已绘制范围在 paintEvent 中记录，因此其他地方的整体重绘也会被正确跟踪。
+
+        Returns:
+            QRegion；尚未绘制过时返回 None，表示需要整体重绘
+        """
+        if self._painted_overlay_rect is None:
+            return None
+        return QRegion(self._painted_overlay_rect).united(QRegion(self.overlay_rect()))
 
     def paintEvent(self, e):
         super().paintEvent(e)
         if self.parent.on_init:
             print('oninit return')
+            self._painted_overlay_rect = None
             return
+        # 重绘区域总是包含整个覆盖范围，绘制后屏幕上显示的就是当前状态
+        self._painted_overlay_rect = self.overlay_rect()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.Antialiasing)
         
@@ -428,15 +573,7 @@ class MaskLayer(QLabel):
         painter.drawRect(0, 0, self.width(), self.height())
         
         # 绘制尺寸文字
-        x = y = 100
-        if self.parent.x1 > self.parent.x0:
-            x = self.parent.x0 + 5
-        else:
-            x = self.parent.x0 - 72
-        if self.parent.y1 > self.parent.y0:
-            y = self.parent.y0 + 15
-        else:
-            y = self.parent.y0 - 5
+        x, y = self._size_text_pos()
         painter.setPen(QPen(QColor(32, 178, 170), 2, Qt.SolidLine))
         painter.drawText(x, y,
                          '{}x{}'.format(abs(self.parent.x1 - self.parent.x0), abs(self.parent.y1 - self.parent.y0)))
@@ -476,52 +613,27 @@ class MaskLayer(QLabel):
             painter.drawEllipse(pos, handle_size // 2, handle_size // 2)
         
         # 以下为鼠标放大镜
-        if not (self.parent.painter_tools['drawcircle_on'] or
-                self.parent.painter_tools['drawrect_bs_on'] or
-                self.parent.painter_tools['drawarrow_on'] or
-                self.parent.painter_tools['drawnumber_on'] or
-                self.parent.painter_tools['pen_on'] or
-                self.parent.painter_tools['highlight_on'] or
-                self.parent.painter_tools['drawtext_on'] or
-                self.parent.move_rect):
+        if self._magnifier_visible():
 
             # 鼠标放大镜功能
-            if self.parent.mouse_posx > self.width() - 140:
-                enlarge_box_x = self.parent.mouse_posx - 140
-            else:
-                enlarge_box_x = self.parent.mouse_posx + 20
-            if self.parent.mouse_posy > self.height() - 140:
-                enlarge_box_y = self.parent.mouse_posy - 120
-            else:
-                enlarge_box_y = self.parent.mouse_posy + 20
+            enlarge_box_x, enlarge_box_y = self._magnifier_origin()
             enlarge_rect = QRect(enlarge_box_x, enlarge_box_y, 120, 120)
             painter.setPen(QPen(QColor(64, 224, 208), 2, Qt.SolidLine))
             painter.drawRect(enlarge_rect)
             
             # 优化：绘制更美观的信息背景框
-            info_box_height = 75  # 增加高度以容纳更大字体
-            info_box_width = 150  # 增加宽度
+            info_box_height = self.INFO_BOX_HEIGHT  # 增加高度以容纳更大字体
+            info_box_width = self.INFO_BOX_WIDTH  # 增加宽度
             painter.setPen(QPen(QColor(64, 224, 208), 2, Qt.SolidLine))  # 加边框
             painter.setBrush(QBrush(QColor(40, 40, 45, 220)))  # 更深的背景，更高透明度
             painter.drawRoundedRect(QRect(enlarge_box_x, enlarge_box_y - info_box_height, 
                                          info_box_width, info_box_height), 5, 5)  # 圆角矩形
             painter.setBrush(Qt.NoBrush)
 
-            # 安全获取像素颜色
-            color = QColor(255, 255, 255)
+            # 安全获取像素颜色（只读取单个像素，不转换整张截图）
             mouse_x = self.parent.mouse_posx
             mouse_y = self.parent.mouse_posy
-
-            if hasattr(self.parent, 'qimg') and self.parent.qimg:
-                img = self.parent.qimg
-                if 0 <= mouse_x < img.width() and 0 <= mouse_y < img.height():
-                    color = QColor(img.pixelColor(mouse_x, mouse_y))
-            else:
-                pixmap = self.parent.pixmap()
-                if pixmap and not pixmap.isNull():
-                    img = pixmap.toImage()
-                    if 0 <= mouse_x < img.width() and 0 <= mouse_y < img.height():
-                        color = QColor(img.pixelColor(mouse_x, mouse_y))
+            color = self.magnifier.pixel_color(self.parent, mouse_x, mouse_y)
 
             RGB_color = [color.red(), color.green(), color.blue()]
             # 使用 QColor 的内置方法获取 HSV 值（不需要 cv2）
@@ -547,15 +659,9 @@ class MaskLayer(QLabel):
 
             try:
                 painter.setCompositionMode(QPainter.CompositionMode_Source)
-                rpix = QPixmap(self.width() + 120, self.height() + 120)
-                rpix.fill(QColor(0, 0, 0))
-                rpixpainter = QPainter(rpix)
-                rpixpainter.drawPixmap(60, 60, self.parent.pixmap())
-                rpixpainter.end()
-                larger_pix = rpix.copy(self.parent.mouse_posx, self.parent.mouse_posy, 120, 120).scaled(
-                    120 + self.parent.tool_width * 10, 120 + self.parent.tool_width * 10)
-                pix = larger_pix.copy(larger_pix.width() // 2 - 60, larger_pix.height() // 2 - 60, 120, 120)
-                painter.drawPixmap(enlarge_box_x, enlarge_box_y, pix)
+                pix = self.magnifier.render(self.parent, mouse_x, mouse_y, self.parent.tool_width)
+                if pix is not None:
+                    painter.drawPixmap(enlarge_box_x, enlarge_box_y, pix)
                 painter.setPen(QPen(QColor(64, 224, 208), 1, Qt.SolidLine))
                 painter.drawLine(enlarge_box_x, enlarge_box_y + 60, enlarge_box_x + 120, enlarge_box_y + 60)
                 painter.drawLine(enlarge_box_x + 60, enlarge_box_y, enlarge_box_x + 60, enlarge_box_y + 120)
@@ -728,123 +834,9 @@ class PaintLayer(QLabel):
         return True
 
     def _draw_optimized_arrow(self, painter, pointlist, color, width):
-        """绘制箭头（尖细尾巴+渐变箭杆+后弯曲箭头）"""
+        """绘制箭头（尖细尾巴+渐变箭杆+后弯曲箭头），几何由 jietuba_shape_geometry 生成"""
         try:
-            start_point = pointlist[0]
-            end_point = pointlist[1]
-            
-            # 计算箭头的方向和长度
-            dx = end_point[0] - start_point[0]
-            dy = end_point[1] - start_point[1]
-            length = math.sqrt(dx * dx + dy * dy)
-            
-            if length < 5:
-                return
-            
-            # 单位向量和垂直向量
-            unit_x = dx / length
-            unit_y = dy / length
-            perp_x = -unit_y
-            perp_y = unit_x
-            
-            # === 参数设计 ===
-            base_width = width
-            
-            # 箭头三角形参数
-            arrow_head_length = min(length * 0.25, max(20, base_width * 4.5))
-            arrow_head_width = max(base_width * 1.8, 7)  # 箭头要宽一些
-            
-            # 箭杆与箭头连接处的宽度（要比箭头窄）
-            neck_width = arrow_head_width * 0.85  # 颈部细窄
-            
-            # === 第一部分：绘制箭杆（从尖细尾巴到颈部） ===
-            # 箭杆结束点（箭头颈部位置）
-            neck_x = end_point[0] - arrow_head_length * unit_x
-            neck_y = end_point[1] - arrow_head_length * unit_y
-            
-            # 尾巴起点宽度（非常尖细）
-            tail_width = base_width * 0.15
-
-            # 箭杆中段宽度（最粗的部分，在70%位置）
-            mid_point = 0.7
-            mid_x = start_point[0] + dx * mid_point
-            mid_y = start_point[1] + dy * mid_point
-            mid_width = base_width * 0.9
-            
-            # 使用多个点绘制平滑渐变的箭杆
-            from PyQt5.QtGui import QPainterPath
-            from PyQt5.QtCore import QPointF
-            
-            path = QPainterPath()
-            
-            # 构建箭杆轮廓（上半部分）
-            path.moveTo(QPointF(start_point[0] + perp_x * tail_width / 2,
-                               start_point[1] + perp_y * tail_width / 2))
-            
-            # 添加中间粗的部分
-            path.lineTo(QPointF(mid_x + perp_x * mid_width / 2,
-                               mid_y + perp_y * mid_width / 2))
-            
-            # 连接到颈部（变细）
-            path.lineTo(QPointF(neck_x + perp_x * neck_width / 2,
-                               neck_y + perp_y * neck_width / 2))
-            
-            # 下半部分（镜像）
-            path.lineTo(QPointF(neck_x - perp_x * neck_width / 2,
-                               neck_y - perp_y * neck_width / 2))
-            
-            path.lineTo(QPointF(mid_x - perp_x * mid_width / 2,
-                               mid_y - perp_y * mid_width / 2))
-            
-            path.lineTo(QPointF(start_point[0] - perp_x * tail_width / 2,
-                               start_point[1] - perp_y * tail_width / 2))
-            
-            path.closeSubpath()
-            
-            # 绘制箭杆
-            painter.setPen(Qt.NoPen)
-            painter.setBrush(QBrush(color))
-            painter.drawPath(path)
-            
-            # === 第二部分：绘制带后弯曲的箭头三角形 ===
-            # 箭头尖端
-            tip_x = end_point[0]
-            tip_y = end_point[1]
-            
-            # 箭头底部两翼（宽度大于颈部）
-            wing_left_x = neck_x + perp_x * arrow_head_width
-            wing_left_y = neck_y + perp_y * arrow_head_width
-            
-            wing_right_x = neck_x - perp_x * arrow_head_width
-            wing_right_y = neck_y - perp_y * arrow_head_width
-            
-            # 添加后弯曲效果：在箭头底部中心向后凹陷
-            # 凹陷点位置（向后退一点）
-            notch_depth = arrow_head_length * 0.2  # 凹陷深度
-            notch_x = neck_x - unit_x * notch_depth
-            notch_y = neck_y - unit_y * notch_depth
-            
-            # 使用Path绘制带凹陷的箭头
-            arrow_path = QPainterPath()
-            arrow_path.moveTo(QPointF(tip_x, tip_y))
-            arrow_path.lineTo(QPointF(wing_left_x, wing_left_y))
-            
-            # 绘制后弯曲的底边（使用二次贝塞尔曲线）
-            # 控制点在凹陷处
-            arrow_path.quadTo(
-                QPointF(notch_x, notch_y),  # 控制点（凹陷点）
-                QPointF(wing_right_x, wing_right_y)  # 终点
-            )
-            
-            arrow_path.lineTo(QPointF(tip_x, tip_y))
-            arrow_path.closeSubpath()
-            
-            # 绘制箭头
-            painter.drawPath(arrow_path)
-            
-            # 恢复画笔设置
-            painter.setBrush(Qt.NoBrush)
-            
+            draw_shape(painter, "arrow", pointlist[0], pointlist[1], color, width)
         except Exception as e:
             print(f"绘制优化箭头错误: {e}")
 
@@ -978,19 +970,16 @@ class PaintLayer(QLabel):
         if self.parent.drawrect_pointlist[0][0] != -2 and self.parent.drawrect_pointlist[1][0] != -2:
             try:
                 temppainter = QPainter(self)
-                temppainter.setPen(QPen(self.parent.pencolor, self.parent.tool_width, Qt.SolidLine))
                 poitlist = self.parent.drawrect_pointlist
-                temppainter.drawRect(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                     abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                draw_shape(temppainter, "rect", poitlist[0], poitlist[1], self.parent.pencolor, self.parent.tool_width)
                 temppainter.end()
             except Exception as e:
                 print(f"画矩形临时QPainter错误: {e}")
                 
             if self.parent.drawrect_pointlist[2] == 1:
                 try:
-                    self.pixPainter.setPen(QPen(self.parent.pencolor, self.parent.tool_width, Qt.SolidLine))
-                    self.pixPainter.drawRect(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                             abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                    draw_shape(self.pixPainter, "rect", poitlist[0], poitlist[1],
+                               self.parent.pencolor, self.parent.tool_width)
                     self.parent.drawrect_pointlist = [[-2, -2], [-2, -2], 0]
                     if hasattr(self.parent, 'record_rectangle_command'):
                         self.parent.record_rectangle_command(
@@ -1008,19 +997,16 @@ class PaintLayer(QLabel):
         if self.parent.drawcircle_pointlist[0][0] != -2 and self.parent.drawcircle_pointlist[1][0] != -2:
             try:
                 temppainter = QPainter(self)
-                temppainter.setPen(QPen(self.parent.pencolor, self.parent.tool_width, Qt.SolidLine))
                 poitlist = self.parent.drawcircle_pointlist
-                temppainter.drawEllipse(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                        abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                draw_shape(temppainter, "circle", poitlist[0], poitlist[1], self.parent.pencolor, self.parent.tool_width)
                 temppainter.end()
             except Exception as e:
                 print(f"画圆临时QPainter错误: {e}")
                 
             if self.parent.drawcircle_pointlist[2] == 1:
                 try:
-                    self.pixPainter.setPen(QPen(self.parent.pencolor, self.parent.tool_width, Qt.SolidLine))
-                    self.pixPainter.drawEllipse(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                                abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                    draw_shape(self.pixPainter, "circle", poitlist[0], poitlist[1],
+                               self.parent.pencolor, self.parent.tool_width)
                     self.parent.drawcircle_pointlist = [[-2, -2], [-2, -2], 0]
                     if hasattr(self.parent, 'record_circle_command'):
                         self.parent.record_circle_command(
@@ -1223,14 +1209,20 @@ class PaintLayer(QLabel):
             # 兼容老版本，仅包含颜色/宽度/高亮标记
             color, width, is_highlight = self._current_stroke_meta
             raw_alpha = int(color.alpha())
+        # 提交前简化采样点（容差随笔宽，外观不变）
+        simplify, smooth = stroke_commit_options()
+        points, stroke_meta = prepare_stroke(
+            self._active_stroke, width, simplify=simplify, smooth=smooth,
+        )
         self._pending_vectors.append(
             {
                 "type": "stroke",
-                "points": [tuple(pt) for pt in self._active_stroke],
+                "points": points,
                 "color": QColor(color),
                 "width": width,
                 "is_highlight": is_highlight,
                 "raw_alpha": raw_alpha,
+                "stamp_ratio": stroke_meta.get("stamp_ratio"),
             }
         )
         self._active_stroke = []
@@ -0,0 +1,114 @@
+"""
+jietuba_export.py - 后台线程合成导出模块
+
+钉图窗口的保存/复制以及 OCR 前的合成原先都在 GUI 线程上用 QPixmap 完成，
+大尺寸、命令多的钉图会卡住界面。这里改为:
+
+- GUI 线程只生成只读快照 (VectorLayerDocument.render_snapshot()，几乎不耗时)
+- ExportThread 在后台用 QImage 合成（可选叠加尚未提交的绘画层、直接保存到文件）
+- 结果通过信号回到 GUI 线程（剪贴板等必须在 GUI 线程操作）
+
+使用方法:
+    from jietuba_export import export_async
+    snapshot = freezer.layer_document.render_snapshot()
+    export_async(snapshot, QSize(w, h), path="a.png",
+                 on_done=lambda image, path: print("saved", path))
+"""
+
+import time
+from typing import Callable, Optional, Set
+
+from PyQt5.QtCore import QSize, Qt, QThread, pyqtSignal
+from PyQt5.QtGui import QImage, QPainter
+
+from jietuba_layer_system import RenderSnapshot
+
+
+class ExportThread(QThread):
+    """在后台线程合成快照；完成时发出 image_ready(图像, 已保存路径或空串)，失败时发出 failed(错误信息)"""
+
+    image_ready = pyqtSignal(QImage, str)
+    failed = pyqtSignal(str)
+
+    def __init__(
+        self,
+        snapshot: RenderSnapshot,
+        size: Optional[QSize] = None,
+        *,
+        overlay: Optional[QImage] = None,
+        path: str = "",
+    ):
+        super().__init__()
+        self.snapshot = snapshot
+        self.size = QSize(size) if size is not None else None
+        # 尚未提交到文档的绘画层内容（QImage，GUI 线程转换好）
+        self.overlay = overlay
+        self.path = path
+
+    def run(self):
+        try:
+            start = time.perf_counter()
+            image = self.snapshot.render_image(self.size)
+            overlay = self.overlay
+            if overlay is not None and not overlay.isNull():
+                if overlay.size() != image.size():
+                    overlay = overlay.scaled(image.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
+                painter = QPainter(image)
+                painter.setRenderHint(QPainter.Antialiasing)
+                painter.drawImage(0, 0, overlay)
+                painter.end()
+            if self.path and not image.save(self.path):
+                raise IOError(f"保存失败: {self.path}")
+            print(f"🧵 [后台导出] {image.width()}x{image.height()}, {len(self.snapshot.commands)} 条命令, "
+                  f"{(time.perf_counter() - start) * 1000:.0f}ms")
+            self.image_ready.emit(image, self.path)
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+# 运行中的线程（保持引用直到结束，发起方窗口先关闭也不会析构正在运行的线程）
+_running: Set[ExportThread] = set()
+
+
+def export_async(
+    snapshot: RenderSnapshot,
+    size: Optional[QSize] = None,
+    *,
+    overlay: Optional[QImage] = None,
+    path: str = "",
+    on_done: Optional[Callable[[QImage, str], None]] = None,
+    on_error: Optional[Callable[[str], None]] = None,
+) -> ExportThread:
+    """在后台线程合成（并可选保存）快照，回调在 GUI 线程执行
+
+    必须在 GUI 线程调用（回调按调用线程排队执行）。
+    """
+    thread = ExportThread(snapshot, size, overlay=overlay, path=path)
+    if on_done is not None:
+        thread.image_ready.connect(on_done)
+    if on_error is not None:
+        thread.failed.connect(on_error)
+    else:
+        thread.failed.connect(lambda message: print(f"❌ [后台导出] {message}"))
+
+    def _release():
+        _running.discard(thread)
+        thread.deleteLater()
+
+    thread.finished.connect(_release)
+    _running.add(thread)
+    thread.start()
+    return thread
+
+
+def wait_all(timeout_ms: int = 5000) -> None:
+    """等待所有后台导出结束（退出程序前调用，避免保存到一半）"""
+    for thread in list(_running):
+        thread.wait(timeout_ms)
+
+
+__all__ = [
+    "ExportThread",
+    "export_async",
+    "wait_all",
+]
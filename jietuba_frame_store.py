@@ -0,0 +1,233 @@
+"""
+jietuba_frame_store.py - 长截图帧存储模块
+
+为滚动长截图会话提供带内存预算的帧存储,替代原先把每一帧 PIL 图片
+都常驻内存的列表。
+
+主要功能:
+- 在内存预算内保留最近的帧,超出预算时把最旧的帧换出到临时文件
+- 换出格式支持原始像素(mmap 读取)和 zlib 快速压缩块两种
+- 读取时按需换入,只在重新拼接/备份时才真正解码
+- 会话结束时删除临时文件
+
+主要类:
+- FrameStore: 类 list 的帧容器,支持 append / pop / len / 下标 / 迭代 / clear
+
+使用方法:
+    store = FrameStore(ram_budget_bytes=256 * 1024 * 1024)
+    store.append(pil_image)
+    first = store[0]   # 已换出的帧会从临时文件中换入
+    store.close()      # 清理临时文件
+"""
+
+import mmap
+import os
+import tempfile
+import threading
+import zlib
+from typing import Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+
+class _FrameEntry:
+    """单帧的元数据（常驻内存的图片或临时文件中的位置）"""
+
+    __slots__ = ("mode", "size", "nbytes", "image", "offset", "length", "codec")
+
+    def __init__(self, image: Image.Image):
+        self.mode = image.mode
+        self.size = image.size
+        self.nbytes = _image_nbytes(image)
+        self.image: Optional[Image.Image] = image
+        self.offset = -1
+        self.length = 0
+        self.codec = ""
+
+    @property
+    def resident(self) -> bool:
+        return self.image is not None
+
+
+def _image_nbytes(image: Image.Image) -> int:
+    bands = len(image.getbands())
+    return image.size[0] * image.size[1] * bands
+
+
+class FrameStore:
+    """带内存预算的长截图帧存储
+
+    特性：
+    - 行为类似 list：append / pop / len / 下标访问 / 迭代 / clear
+    - 常驻内存的帧总字节数超过 ram_budget_bytes 时，按先进先出换出到临时文件
+    - 最新的一帧始终常驻内存（下一次拼接/去重可能马上需要）
+    - spill_mode="raw" 时原样写入像素，读取时通过 mmap 换入；
+      spill_mode="zlib" 时以 level=1 快速压缩，换出文件更小
+    """
+
+    SPILL_RAW = "raw"
+    SPILL_ZLIB = "zlib"
+
+    def __init__(self, ram_budget_bytes: int = 256 * 1024 * 1024,
+                 spill_mode: str = SPILL_RAW, temp_dir: Optional[str] = None):
+        self.ram_budget_bytes = max(0, int(ram_budget_bytes))
+        self.spill_mode = spill_mode if spill_mode in (self.SPILL_RAW, self.SPILL_ZLIB) else self.SPILL_RAW
+        self.temp_dir = temp_dir
+        self._entries: List[_FrameEntry] = []
+        self._resident_bytes = 0
+        self._file = None
+        self._file_path: Optional[str] = None
+        self._file_size = 0
+        self._mmap: Optional[mmap.mmap] = None
+        self._mmap_size = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # list 兼容接口
+    # ------------------------------------------------------------------
+    def append(self, image: Image.Image) -> None:
+        with self._lock:
+            entry = _FrameEntry(image)
+            self._entries.append(entry)
+            self._resident_bytes += entry.nbytes
+            self._enforce_budget()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __getitem__(self, index: int) -> Image.Image:
+        with self._lock:
+            entry = self._entries[index]
+            return self._load(entry)
+
+    def pop(self, index: int = -1) -> Image.Image:
+        """移除并返回一帧（换出文件中的空间不回收，会话结束时统一删除）"""
+        with self._lock:
+            entry = self._entries.pop(index)
+            image = self._load(entry)
+            if entry.resident:
+                self._resident_bytes -= entry.nbytes
+            return image
+
+    def __iter__(self) -> Iterator[Image.Image]:
+        for i in range(len(self._entries)):
+            yield self[i]
+
+    def clear(self) -> None:
+        """清空所有帧并删除临时文件"""
+        with self._lock:
+            self._entries = []
+            self._resident_bytes = 0
+            self._close_file()
+
+    def close(self) -> None:
+        """会话结束时调用，等价于 clear()"""
+        self.clear()
+
+    # ------------------------------------------------------------------
+    # 统计信息
+    # ------------------------------------------------------------------
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    @property
+    def spilled_bytes(self) -> int:
+        return self._file_size
+
+    @property
+    def spilled_count(self) -> int:
+        return sum(1 for entry in self._entries if not entry.resident)
+
+    def frame_size(self, index: int) -> Tuple[int, int]:
+        """不换入图片直接返回帧尺寸"""
+        return self._entries[index].size
+
+    # ------------------------------------------------------------------
+    # 内部实现
+    # ------------------------------------------------------------------
+    def _enforce_budget(self) -> None:
+        if self._resident_bytes <= self.ram_budget_bytes:
+            return
+        # 最后一帧保持常驻，从最旧的开始换出
+        for entry in self._entries[:-1]:
+            if self._resident_bytes <= self.ram_budget_bytes:
+                break
+            if entry.resident:
+                self._spill(entry)
+
+    def _ensure_file(self) -> None:
+        if self._file is not None:
+            return
+        fd, path = tempfile.mkstemp(prefix="jietuba_frames_", suffix=".bin", dir=self.temp_dir)
+        self._file = os.fdopen(fd, "w+b")
+        self._file_path = path
+        self._file_size = 0
+
+    def _spill(self, entry: _FrameEntry) -> None:
+        self._ensure_file()
+        # Windows 下存在映射视图时无法扩展文件，写入前先释放映射
+        self._release_mmap()
+        payload = entry.image.tobytes()
+        if self.spill_mode == self.SPILL_ZLIB:
+            payload = zlib.compress(payload, 1)
+        self._file.seek(self._file_size)
+        self._file.write(payload)
+        entry.offset = self._file_size
+        entry.length = len(payload)
+        entry.codec = self.spill_mode
+        self._file_size += len(payload)
+        entry.image = None
+        self._resident_bytes -= entry.nbytes
+
+    def _load(self, entry: _FrameEntry) -> Image.Image:
+        if entry.image is not None:
+            return entry.image
+        end = entry.offset + entry.length
+        if self._mmap is None or self._mmap_size < end:
+            # 文件增长后重新映射
+            self._file.flush()
+            self._release_mmap()
+            self._mmap = mmap.mmap(self._file.fileno(), self._file_size, access=mmap.ACCESS_READ)
+            self._mmap_size = self._file_size
+        payload = self._mmap[entry.offset:end]
+        if entry.codec == self.SPILL_ZLIB:
+            payload = zlib.decompress(payload)
+        return Image.frombytes(entry.mode, entry.size, payload)
+
+    def _release_mmap(self) -> None:
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except Exception:
+                pass
+            self._mmap = None
+            self._mmap_size = 0
+
+    def _close_file(self) -> None:
+        self._release_mmap()
+        if self._file is not None:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+        if self._file_path:
+            try:
+                os.remove(self._file_path)
+            except OSError:
+                pass
+            self._file_path = None
+        self._file_size = 0
+
+    def __del__(self):
+        try:
+            self._close_file()
+        except Exception:
+            pass
+
+
+__all__ = ["FrameStore"]
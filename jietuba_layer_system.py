@@ -6,19 +6,49 @@
 1. 仅保留一张原始底图(QPixmap)，所有绘制操作以矢量命令形式存储。
 2. 支持根据任意尺寸重新渲染绘图层，避免缩放导致的模糊。
 3. 内置撤销/重做状态导出接口，供旧的 backup_shortshot 流程复用。
+   撤销快照 (CommandSnapshot) 只记录相对上一快照的增量，命令对象在快照之间共享。
 4. 区分普通混合与荧光笔(正片叠底)混合模式。
+5. 每条命令缓存归一化包围盒，并由网格空间索引 (VectorSpatialIndex) 支持
+   按区域查询与点击测试，裁剪/命中判断不必遍历全部命令的所有点。
+6. 不透明笔迹重放由 StrokePathRenderer 整条路径一次绘制，不再逐像素盖章；
+   半透明笔迹（荧光笔）仍逐点盖章，保持边缘到中心的透明度过渡。
+7. 文档带修改版本号，render_composited 按目标尺寸缓存绘图层；
+   只追加了命令时只绘制新命令，尺寸变化或撤销/清空等修改才整体重绘。
+8. 超大文档（长截图）可由 VectorTileCache 按视口分块渲染，内存与视口大小相关。
+9. 命令使用 __slots__，点坐标存放在只读的 PointBuffer (array('d')) 中，
+   导出/导入/克隆都直接共享，坐标变换整体进行。
+10. 底图按需生成逐级减半的缩放金字塔：连续缩放时 render_preview 从最接近的层
+    与已缓存的绘图层各做一次双线性缩放，停止后再高质量渲染；分块显示同样从金字塔取样。
+11. render_snapshot() 生成只读快照 (RenderSnapshot)，可在后台线程只用 QImage 合成，
+    保存/复制/OCR 不再阻塞界面。
+12. 笔迹提交前可经 prepare_stroke 简化（Ramer–Douglas–Peucker，容差随笔宽）
+    并可选 Chaikin 平滑，外观不变而点数大幅减少。
+13. 箭头/矩形/椭圆的几何由 jietuba_shape_geometry 生成（与实时绘制共用），
+    按 (命令, 目标尺寸) 缓存在命令上，重放时每个形状只绘制一次缓存路径
+    （QPainterPath 不是线程安全的，缓存只在 GUI 线程读写，后台导出时临时生成）。
+14. 文字/序号的排版由 jietuba_text_layout 按 (文字, 字体, DPI) 缓存为 QStaticText，
+    重放时不再重复创建字体度量和逐行排版。
 
 该模块不依赖具体窗口实现，只专注于数据结构与渲染逻辑。
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import threading
+from array import array
+from collections.abc import Sequence as _SequenceABC
+from collections import OrderedDict
+from dataclasses import dataclass
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
-from PyQt5.QtCore import QPointF, QSize, Qt, QRectF
-from PyQt5.QtGui import (QColor, QFont, QPainter, QPen,
-					 QPixmap)
+from PyQt5.QtCore import QPointF, QRect, QSettings, QSize, Qt, QRectF
+from PyQt5.QtGui import (QColor, QFont, QImage, QPainter, QPen,
+					 QPixmap, QPolygonF, QTransform)
+
+from jietuba_shape_geometry import SHAPE_KINDS, ShapeGeometry, ShapeMemo, build_shape
+from jietuba_text_layout import text_layout
 
 
 ColorTuple = Tuple[int, int, int, int]
@@ -40,21 +70,196 @@ def _clamp(value: float, minimum: float, maximum: float) -> float:
 	return max(minimum, min(value, maximum))
 
 
-@dataclass
+_numpy_module = None
+
+
+def _numpy():
+	"""按需导入 numpy（无 OCR 打包版本不含 numpy，此时返回 None 走纯 Python 实现）"""
+	global _numpy_module
+	if _numpy_module is None:
+		try:
+			import numpy
+			_numpy_module = numpy
+		except ImportError:
+			_numpy_module = False
+	return _numpy_module or None
+
+
+class PointBuffer(_SequenceABC):
+	"""紧凑的只读点序列，坐标交错存放在 array('d') 中 (x0, y0, x1, y1, ...)。
+
+	每个点 16 字节（list[tuple] 约 110 字节）。行为上是 Sequence[(x, y)]，
+	不可变，因此命令、导出记录和撤销快照之间可以直接共享同一个对象。
+	"""
+
+	__slots__ = ("_data",)
+
+	def __init__(self, points: Iterable[Sequence[float]] = ()):
+		if isinstance(points, PointBuffer):
+			self._data = points._data
+		else:
+			self._data = array("d", [float(value) for point in points for value in (point[0], point[1])])
+
+	@classmethod
+	def coerce(cls, points: Iterable[Sequence[float]]) -> "PointBuffer":
+		"""已是 PointBuffer 时直接返回（共享），否则转换"""
+		return points if isinstance(points, PointBuffer) else cls(points)
+
+	@classmethod
+	def from_array(cls, data: array) -> "PointBuffer":
+		"""直接接管交错坐标数组（调用方之后不得再修改它）"""
+		buffer = cls.__new__(cls)
+		buffer._data = data
+		return buffer
+
+	def __len__(self) -> int:
+		return len(self._data) >> 1
+
+	def __iter__(self) -> Iterator[PointTuple]:
+		values = iter(self._data)
+		return zip(values, values)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			start, stop, step = index.indices(len(self))
+			if step == 1:
+				return PointBuffer.from_array(self._data[start * 2:max(start, stop) * 2])
+			return [self[i] for i in range(start, stop, step)]
+		if index < 0:
+			index += len(self)
+		if not 0 <= index < len(self):
+			raise IndexError("PointBuffer index out of range")
+		return self._data[index * 2], self._data[index * 2 + 1]
+
+	def __eq__(self, other) -> bool:
+		if isinstance(other, PointBuffer):
+			return self._data == other._data
+		if isinstance(other, (list, tuple, _SequenceABC)) and len(other) == len(self):
+			return all(a[0] == b[0] and a[1] == b[1] for a, b in zip(self, other))
+		return False
+
+	__hash__ = None
+
+	def __repr__(self) -> str:
+		return f"PointBuffer({list(self)!r})"
+
+	def __reduce__(self):
+		return PointBuffer.from_array, (self._data,)
+
+	def __copy__(self) -> "PointBuffer":
+		return self
+
+	def __deepcopy__(self, memo) -> "PointBuffer":
+		return self
+
+	@property
+	def nbytes(self) -> int:
+		return self._data.itemsize * len(self._data)
+
+	def bounds(self) -> Optional["BoundsTuple"]:
+		"""(x0, y0, x1, y1)，空序列返回 None"""
+		if not self._data:
+			return None
+		xs = self._data[0::2]
+		ys = self._data[1::2]
+		return min(xs), min(ys), max(xs), max(ys)
+
+	def transformed(
+		self,
+		scale_x: float,
+		scale_y: float,
+		offset_x: float = 0.0,
+		offset_y: float = 0.0,
+		*,
+		clamp: Optional[Tuple[float, float]] = None,
+	) -> "PointBuffer":
+		"""返回 (x * scale_x + offset_x, y * scale_y + offset_y) 的新序列，可选截断到 [lo, hi]"""
+		np = _numpy()
+		if np is not None and len(self._data) >= 64:
+			coords = np.frombuffer(self._data, dtype=np.float64).reshape(-1, 2) * (scale_x, scale_y)
+			coords += (offset_x, offset_y)
+			if clamp is not None:
+				np.clip(coords, clamp[0], clamp[1], out=coords)
+			result = array("d")
+			result.frombytes(coords.tobytes())
+			return PointBuffer.from_array(result)
+		result = array("d", self._data)
+		if clamp is None:
+			result[0::2] = array("d", [x * scale_x + offset_x for x in self._data[0::2]])
+			result[1::2] = array("d", [y * scale_y + offset_y for y in self._data[1::2]])
+		else:
+			lo, hi = clamp
+			result[0::2] = array("d", [min(hi, max(lo, x * scale_x + offset_x)) for x in self._data[0::2]])
+			result[1::2] = array("d", [min(hi, max(lo, y * scale_y + offset_y)) for y in self._data[1::2]])
+		return PointBuffer.from_array(result)
+
+	def any_inside(self, x0: float, y0: float, x1: float, y1: float) -> bool:
+		"""是否有点落在闭区间矩形 [x0, x1] × [y0, y1] 内"""
+		np = _numpy()
+		if np is not None and len(self._data) >= 64:
+			coords = np.frombuffer(self._data, dtype=np.float64).reshape(-1, 2)
+			xs = coords[:, 0]
+			ys = coords[:, 1]
+			return bool(np.any((xs >= x0) & (xs <= x1) & (ys >= y0) & (ys <= y1)))
+		return any(x0 <= x <= x1 and y0 <= y <= y1 for x, y in self)
+
+
+_UNSET = object()
+
+
 class VectorPaintCommand:
-	"""表示一次矢量绘制命令。"""
+	"""表示一次矢量绘制命令。
+
+	命令加入文档后视为不可变；导出记录、包围盒与形状几何在首次使用时缓存在
+	_record / _bounds / _shape 中。
+	"""
+
+	__slots__ = ("kind", "points", "width_ratio", "color", "blend", "extra", "_record", "_bounds", "_shape")
 
-	kind: str
-	points: List[PointTuple]
-	width_ratio: float
-	color: ColorTuple
-	blend: str = "normal"  # normal / multiply
-	extra: Dict[str, float] = field(default_factory=dict)
+	def __init__(
+		self,
+		kind: str,
+		points: Iterable[Sequence[float]],
+		width_ratio: float,
+		color: ColorTuple,
+		blend: str = "normal",  # normal / multiply
+		extra: Optional[Dict[str, float]] = None,
+	):
+		self.kind = kind
+		self.points = PointBuffer.coerce(points)
+		self.width_ratio = width_ratio
+		self.color = color
+		self.blend = blend
+		self.extra = extra if extra is not None else {}
+		self._record = None
+		self._bounds = _UNSET
+		self._shape: Optional[ShapeMemo] = None
+
+	def __eq__(self, other) -> bool:
+		if not isinstance(other, VectorPaintCommand):
+			return NotImplemented
+		return (
+			self.kind == other.kind
+			and self.points == other.points
+			and self.width_ratio == other.width_ratio
+			and tuple(self.color) == tuple(other.color)
+			and self.blend == other.blend
+			and self.extra == other.extra
+		)
+
+	__hash__ = None
+
+	def __repr__(self) -> str:
+		return (
+			f"VectorPaintCommand(kind={self.kind!r}, points=<{len(self.points)} pts>, "
+			f"width_ratio={self.width_ratio!r}, color={self.color!r}, blend={self.blend!r}, extra={self.extra!r})"
+		)
 
 	def clone(self) -> "VectorPaintCommand":
+		# 点序列不可变，直接共享
 		return VectorPaintCommand(
 			kind=self.kind,
-			points=list(self.points),
+			points=self.points,
 			width_ratio=self.width_ratio,
 			color=tuple(self.color),
 			blend=self.blend,
@@ -62,13 +267,275 @@ class VectorPaintCommand:
 		)
 
 
+class _CommandRecord(dict):
+	"""命令的导出记录（与 export_state 的字典格式相同）。
+
+	每个命令只生成一次，在所有撤销快照之间共享，使用方只能读取。
+	"""
+
+	__slots__ = ("command", "nbytes")
+
+
+def _command_record(cmd: VectorPaintCommand) -> _CommandRecord:
+	"""返回命令对应的共享记录（命令添加后不再修改，因此可以缓存）。"""
+
+	record = cmd._record
+	if record is None:
+		record = _CommandRecord(
+			kind=cmd.kind,
+			points=cmd.points,
+			width_ratio=cmd.width_ratio,
+			color=tuple(cmd.color),
+			blend=cmd.blend,
+			extra=dict(cmd.extra or {}),
+		)
+		record.command = cmd
+		text = record["extra"].get("text", "")
+		# 点序列与命令共享，只计一次
+		record.nbytes = 160 + 64 + cmd.points.nbytes + 64 * len(record["extra"]) + 2 * len(str(text))
+		cmd._record = record
+	return record
+
+
+BoundsTuple = Tuple[float, float, float, float]
+
+
+def _points_bounds(points: Sequence[PointTuple]) -> Optional[BoundsTuple]:
+	if isinstance(points, PointBuffer):
+		return points.bounds()
+	if not points:
+		return None
+	xs = [float(pt[0]) for pt in points]
+	ys = [float(pt[1]) for pt in points]
+	return min(xs), min(ys), max(xs), max(ys)
+
+
+def command_bounds(cmd: VectorPaintCommand) -> Optional[BoundsTuple]:
+	"""返回命令的归一化包围盒 (x0, y0, x1, y1)，包含线宽/文字范围的保守估计。
+
+	线宽以短边为基准，换算到任一方向的归一化坐标都不会超过 width_ratio，
+	因此直接用 width_ratio 外扩即可保证不漏掉命令。结果缓存在命令对象上。
+	"""
+
+	cached = cmd._bounds
+	if cached is not _UNSET:
+		return cached
+	bounds = _points_bounds(cmd.points)
+	if bounds is not None:
+		x0, y0, x1, y1 = bounds
+		ratio = abs(float(cmd.width_ratio or 0))
+		if cmd.kind == "text":
+			# 锚点为首行基线左端：向右延伸最长行，向上一行高，向下按行数和行距
+			lines = str(cmd.extra.get("text", "")).split("\n")
+			em = ratio * 1.5
+			line_ratio = max(1.0, float(cmd.extra.get("line", 1.8)))
+			x1 += em * max(len(line) for line in lines)
+			y0 -= em
+			y1 += em * line_ratio * len(lines)
+		elif cmd.kind == "arrow":
+			# 箭头头部比线宽大得多
+			pad = ratio * 4
+			x0, y0, x1, y1 = x0 - pad, y0 - pad, x1 + pad, y1 + pad
+		else:
+			x0, y0, x1, y1 = x0 - ratio, y0 - ratio, x1 + ratio, y1 + ratio
+		bounds = (x0, y0, x1, y1)
+	cmd._bounds = bounds
+	return bounds
+
+
+def record_bounds(raw: Dict) -> Optional[BoundsTuple]:
+	"""导出记录的包围盒：共享记录直接使用命令缓存，普通字典只按点计算。"""
+
+	command = getattr(raw, "command", None)
+	if command is not None:
+		return command_bounds(command)
+	return _points_bounds(raw.get("points") or [])
+
+
+class VectorSpatialIndex:
+	"""归一化坐标 [0, 1] 上的均匀网格索引。
+
+	每条命令按包围盒登记到覆盖的格子里，查询时只检查相关格子中的命令，
+	返回的下标按命令顺序（即绘制顺序）排列。
+	"""
+
+	def __init__(self, cells: int = 16):
+		self.cells = max(1, int(cells))
+		self._grid: Dict[Tuple[int, int], List[int]] = {}
+		self._bounds: List[Optional[BoundsTuple]] = []
+
+	def __len__(self) -> int:
+		return len(self._bounds)
+
+	def _cell_range(self, x0: float, y0: float, x1: float, y1: float):
+		last = self.cells - 1
+		cx0 = int(_clamp(x0 * self.cells, 0, last))
+		cy0 = int(_clamp(y0 * self.cells, 0, last))
+		cx1 = int(_clamp(x1 * self.cells, 0, last))
+		cy1 = int(_clamp(y1 * self.cells, 0, last))
+		return cx0, cy0, cx1, cy1
+
+	def add(self, bounds: Optional[BoundsTuple]) -> int:
+		"""登记下一条命令，返回其下标"""
+		index = len(self._bounds)
+		self._bounds.append(bounds)
+		if bounds is not None:
+			cx0, cy0, cx1, cy1 = self._cell_range(*bounds)
+			for cy in range(cy0, cy1 + 1):
+				for cx in range(cx0, cx1 + 1):
+					self._grid.setdefault((cx, cy), []).append(index)
+		return index
+
+	def query(self, x0: float, y0: float, x1: float, y1: float) -> List[int]:
+		"""返回包围盒与矩形相交的命令下标（升序）"""
+		found = set()
+		cx0, cy0, cx1, cy1 = self._cell_range(x0, y0, x1, y1)
+		for cy in range(cy0, cy1 + 1):
+			for cx in range(cx0, cx1 + 1):
+				for index in self._grid.get((cx, cy), ()):
+					if index in found:
+						continue
+					bx0, by0, bx1, by1 = self._bounds[index]
+					if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+						found.add(index)
+		return sorted(found)
+
+
+class CommandSnapshot(_SequenceABC):
+	"""撤销/重做用的矢量状态快照（结构共享的增量链）。
+
+	快照 = base 的前 keep 条命令 + tail 中新增的命令，
+	因此每一步只占用本步新增命令的内存，相同命令在所有快照间共享。
+	行为上是一个只读的 Sequence[dict]，可以直接传给 import_state 或逐条遍历。
+	链过长时自动展平（只复制引用），保证随机访问开销有上限。
+	"""
+
+	__slots__ = ("base", "keep", "tail", "depth", "_len")
+
+	MAX_DEPTH = 32
+
+	def __init__(self, base: Optional["CommandSnapshot"], keep: int, tail: Tuple[_CommandRecord, ...]):
+		if base is None or keep <= 0:
+			base, keep = None, 0
+		elif base.depth >= self.MAX_DEPTH:
+			tail = tuple(base.iter_range(0, keep)) + tuple(tail)
+			base, keep = None, 0
+		self.base = base
+		self.keep = keep
+		self.tail = tuple(tail)
+		self.depth = base.depth + 1 if base is not None else 0
+		self._len = keep + len(self.tail)
+
+	def __len__(self) -> int:
+		return self._len
+
+	def iter_range(self, start: int, stop: int) -> Iterator[_CommandRecord]:
+		"""按顺序遍历 [start, stop) 范围内的记录"""
+		segments = []
+		node: Optional[CommandSnapshot] = self
+		high = stop
+		while node is not None and high > start:
+			low = max(start, node.keep)
+			if high > low:
+				segments.append((node.tail, low - node.keep, high - node.keep))
+			high = min(high, node.keep)
+			node = node.base
+		for tail, a, b in reversed(segments):
+			yield from islice(tail, a, b)
+
+	def __iter__(self) -> Iterator[_CommandRecord]:
+		return self.iter_range(0, self._len)
+
+	def __getitem__(self, index):
+		if isinstance(index, slice):
+			return list(self)[index]
+		if index < 0:
+			index += self._len
+		if not 0 <= index < self._len:
+			raise IndexError("CommandSnapshot index out of range")
+		return next(self.iter_range(index, index + 1))
+
+	def __eq__(self, other) -> bool:
+		if other is self:
+			return True
+		if not isinstance(other, (_SequenceABC, list)) or len(other) != self._len:
+			return False
+		return all(a == b for a, b in zip(self, other))
+
+	__hash__ = None
+
+
+def history_footprint(
+	snapshots: Sequence[Optional[CommandSnapshot]], document: Optional["VectorLayerDocument"] = None
+) -> List[int]:
+	"""撤销历史实际占用的内存（字节），供按内存预算裁剪历史使用。
+
+	快照之间共享记录，丢弃旧快照只会释放既不被较新快照、也不被当前文档引用的记录，
+	因此不能把各快照新增记录的大小直接相加（链过长展平后的快照还会重复计入整个文档）。
+	返回 footprint，footprint[i] 为只保留 snapshots[i:] 时历史额外占用的字节数
+	（随 i 单调不增）；非 CommandSnapshot 的条目按 0 计算。
+	"""
+	seen_records = set()
+	if document is not None:
+		# 当前文档的命令持有自己的记录，这部分内存与历史无关
+		seen_records.update(id(cmd._record) for cmd in document.commands if cmd._record is not None)
+	seen_nodes = set()
+	footprint = [0] * len(snapshots)
+	total = 0
+	for i in range(len(snapshots) - 1, -1, -1):
+		node = snapshots[i]
+		while isinstance(node, CommandSnapshot) and id(node) not in seen_nodes:
+			seen_nodes.add(id(node))
+			# 节点本身与 tail 元组（展平的节点只复制引用）
+			total += 64 + 8 * len(node.tail)
+			for record in node.tail:
+				if id(record) not in seen_records:
+					seen_records.add(id(record))
+					total += record.nbytes
+			node = node.base
+		footprint[i] = total
+	return footprint
+
+
+@dataclass
+class _OverlayCache:
+	"""某个目标尺寸下已渲染的底图与两张绘图层（normal / multiply）。
+
+	只记录已画到第几条命令；之后只追加了命令时，只把新命令画到缓存上。
+	"""
+
+	rewrite_version: int
+	base: QPixmap
+	normal: Optional[QPixmap] = None
+	multiply: Optional[QPixmap] = None
+	count: int = 0
+	last: Optional[VectorPaintCommand] = None
+
+
 class VectorLayerDocument:
 	"""维护单张原始图像以及对应的矢量绘制命令。"""
 
+	# 缓存渲染结果的目标尺寸个数（钉图显示尺寸 + 原始尺寸导出）
+	RENDER_CACHE_SIZES = 2
+
 	def __init__(self, base_pixmap: Optional[QPixmap] = None):
 		self._base_pixmap: Optional[QPixmap] = None
 		self._base_size = QSize(1, 1)
 		self.commands: List[VectorPaintCommand] = []
+		# 最近一次 snapshot()/restore() 对应的快照，以及与其一致的命令前缀长度
+		self._snapshot: Optional[CommandSnapshot] = None
+		self._synced = 0
+		# 空间索引，登记了 commands 的前 len(_index) 条；命令被替换时置为 None 重建
+		self._index: Optional[VectorSpatialIndex] = None
+		# 修改版本号：每次修改 +1；_rewrite_version 记录最近一次"非追加"修改（清空/撤销/替换底图等）
+		self._version = 0
+		self._rewrite_version = 0
+		self._render_cache: "OrderedDict[Tuple[int, int], _OverlayCache]" = OrderedDict()
+		self._composite_cache: Optional[Tuple[Tuple[int, int, int], QPixmap]] = None
+		# 底图缩放金字塔: [原图, 1/2, 1/4, ...]，按需生成
+		self._mip_levels: List[QPixmap] = []
+		# 底图的 QImage 副本（后台渲染快照共享），按需生成
+		self._base_image: Optional[QImage] = None
 		if base_pixmap is not None:
 			self.set_base_pixmap(base_pixmap)
 
@@ -80,16 +547,45 @@ class VectorLayerDocument:
 			raise ValueError("Base pixmap must be a valid QPixmap")
 		self._base_pixmap = pixmap.copy()
 		self._base_size = self._base_pixmap.size()
+		self._mip_levels = []
+		self._base_image = None
+		self._mark_rewritten()
 
 	@property
 	def base_size(self) -> QSize:
 		return QSize(self._base_size)
 
+	def base_pixmap(self) -> Optional[QPixmap]:
+		"""原始底图（隐式共享，调用方不要在其上绘制）"""
+		return QPixmap(self._base_pixmap) if self._base_pixmap is not None else None
+
+	@property
+	def version(self) -> int:
+		"""修改版本号，文档内容（命令或底图）每变化一次加一"""
+		return self._version
+
+	def invalidate_render_cache(self) -> None:
+		"""丢弃所有渲染缓存（直接改动了 commands 列表时调用）"""
+		self._mark_rewritten()
+
+	def _mark_rewritten(self) -> None:
+		self._version += 1
+		self._rewrite_version = self._version
+		self._render_cache.clear()
+		self._composite_cache = None
+
+	def _append(self, cmd: VectorPaintCommand) -> None:
+		self.commands.append(cmd)
+		self._version += 1
+
 	# ------------------------------------------------------------------
 	# 命令增删
 	# ------------------------------------------------------------------
 	def clear(self) -> None:
 		self.commands.clear()
+		self._synced = 0
+		self._index = None
+		self._mark_rewritten()
 
 	def add_stroke(
 		self,
@@ -112,13 +608,13 @@ class VectorLayerDocument:
 		extra_payload.setdefault("brush", brush_tag)
 		cmd = VectorPaintCommand(
 			kind="stroke",
-			points=list(points),
+			points=PointBuffer.coerce(points),
 			width_ratio=width_ratio,
 			color=_serialize_color(color),
 			blend=blend,
 			extra=extra_payload,
 		)
-		self.commands.append(cmd)
+		self._append(cmd)
 
 	def add_rect(
 		self,
@@ -127,7 +623,7 @@ class VectorLayerDocument:
 		color: QColor,
 		width_ratio: float,
 	) -> None:
-		self.commands.append(
+		self._append(
 			VectorPaintCommand(
 				kind="rect",
 				points=[start, end],
@@ -143,7 +639,7 @@ class VectorLayerDocument:
 		color: QColor,
 		width_ratio: float,
 	) -> None:
-		self.commands.append(
+		self._append(
 			VectorPaintCommand(
 				kind="circle",
 				points=[start, end],
@@ -159,7 +655,7 @@ class VectorLayerDocument:
 		color: QColor,
 		width_ratio: float,
 	) -> None:
-		self.commands.append(
+		self._append(
 			VectorPaintCommand(
 				kind="arrow",
 				points=[start, end],
@@ -191,7 +687,7 @@ class VectorLayerDocument:
 		if font_weight is not None:
 			extra_payload["weight"] = int(font_weight)
 		extra_payload["italic"] = bool(font_italic)
-		self.commands.append(
+		self._append(
 			VectorPaintCommand(
 				kind="text",
 				points=[anchor],
@@ -210,7 +706,7 @@ class VectorLayerDocument:
 		size_ratio: float,
 	) -> None:
 		"""添加序号标注（带圆形背景的数字）"""
-		self.commands.append(
+		self._append(
 			VectorPaintCommand(
 				kind="number",
 				points=[center],
@@ -235,7 +731,8 @@ class VectorLayerDocument:
 			exported.append(
 				{
 					"kind": cmd.kind,
-					"points": list(cmd.points),
+					# 点序列不可变，导出时直接共享
+					"points": cmd.points,
 					"width_ratio": cmd.width_ratio,
 					"color": tuple(cmd.color),
 					"blend": cmd.blend,
@@ -245,12 +742,19 @@ class VectorLayerDocument:
 		return exported
 
 	def import_state(self, snapshot: Iterable[Dict]) -> None:
+		if isinstance(snapshot, CommandSnapshot):
+			self.restore(snapshot)
+			return
 		self.commands = []
+		self._snapshot = None
+		self._synced = 0
+		self._index = None
+		self._mark_rewritten()
 		for raw in snapshot:
 			self.commands.append(
 				VectorPaintCommand(
 					kind=raw.get("kind", "stroke"),
-					points=[tuple(pt) for pt in raw.get("points", [])],
+					points=PointBuffer.coerce(raw.get("points", [])),
 					width_ratio=float(raw.get("width_ratio", 0)),
 					color=tuple(raw.get("color", (255, 0, 0, 255))),
 					blend=raw.get("blend", "normal"),
@@ -258,6 +762,77 @@ class VectorLayerDocument:
 				)
 			)
 
+	def snapshot(self) -> CommandSnapshot:
+		"""生成撤销快照，只记录相对上一快照的增量。
+
+		状态未变化时返回上一快照本身，调用方可以用 ``is`` 判断是否有变化。
+		"""
+		base = self._snapshot
+		count = len(self.commands)
+		keep = 0
+		if base is not None:
+			keep = min(self._synced, len(base), count)
+			if keep == len(base) == count:
+				return base
+		tail = tuple(_command_record(cmd) for cmd in self.commands[keep:])
+		snap = CommandSnapshot(base, keep, tail)
+		self._snapshot = snap
+		self._synced = count
+		return snap
+
+	def restore(self, snapshot: CommandSnapshot) -> None:
+		"""恢复到快照状态；相邻快照之间（撤销/重做一步）只替换变化的部分。"""
+		current = self._snapshot
+		common = 0
+		if current is not None and self._synced == len(current) == len(self.commands):
+			if snapshot is current:
+				common = len(current)
+			elif snapshot.base is current:
+				common = snapshot.keep
+			elif current.base is snapshot:
+				common = current.keep
+		if self._index is not None and len(self._index) > common:
+			self._index = None
+		if common < len(self.commands):
+			self._mark_rewritten()
+		elif len(snapshot) > common:
+			# 重做：只在末尾追加命令，渲染缓存可以增量更新
+			self._version += 1
+		del self.commands[common:]
+		self.commands.extend(record.command for record in snapshot.iter_range(common, len(snapshot)))
+		self._snapshot = snapshot
+		self._synced = len(snapshot)
+
+	def export_records(self, indices: Optional[Iterable[int]] = None) -> List[Dict]:
+		"""返回命令的共享导出记录（只读，格式与 export_state 相同，不复制点列表）"""
+		if indices is None:
+			return [_command_record(cmd) for cmd in self.commands]
+		return [_command_record(self.commands[i]) for i in indices]
+
+	# ------------------------------------------------------------------
+	# 空间查询
+	# ------------------------------------------------------------------
+	def spatial_index(self) -> VectorSpatialIndex:
+		"""返回与当前命令同步的空间索引（新增命令增量登记）"""
+		index = self._index
+		if index is None or len(index) > len(self.commands):
+			index = self._index = VectorSpatialIndex()
+		for cmd in self.commands[len(index):]:
+			index.add(command_bounds(cmd))
+		return index
+
+	def commands_in_rect(self, rect: QRectF) -> List[int]:
+		"""返回包围盒与归一化矩形相交的命令下标（按绘制顺序）"""
+		if not self.commands:
+			return []
+		return self.spatial_index().query(rect.left(), rect.top(), rect.right(), rect.bottom())
+
+	def hit_test(self, point: PointTuple, tolerance: float = 0.0) -> Optional[int]:
+		"""返回包围盒包含归一化坐标点的最上层命令下标，没有时返回 None"""
+		x, y = float(point[0]), float(point[1])
+		hits = self.commands_in_rect(QRectF(x - tolerance, y - tolerance, tolerance * 2, tolerance * 2))
+		return hits[-1] if hits else None
+
 	# ------------------------------------------------------------------
 	# 渲染
 	# ------------------------------------------------------------------
@@ -294,26 +869,190 @@ class VectorLayerDocument:
 		return overlay
 
 	def render_composited(self, size: Optional[QSize] = None) -> QPixmap:
-		base = self.render_base(size)
-		if not self.commands:
-			return base
+		"""底图 + 普通绘图层 + 正片叠底绘图层。
 
-		target_w = base.width()
-		target_h = base.height()
-		painter = QPainter(base)
-		painter.setRenderHint(QPainter.Antialiasing)
+		结果按 (尺寸, 版本号) 缓存；只追加了命令时只把新命令画到缓存的绘图层上，
+		尺寸变化或非追加修改（撤销、清空等）时才整体重绘。
+		返回的 QPixmap 与缓存隐式共享，调用方在其上绘制时会自动复制。
+		"""
+		if not self._base_pixmap:
+			raise RuntimeError("Base pixmap not set")
+		target_w, target_h = self._target_size(size)
+		key = (target_w, target_h, self._version)
+		if self._composite_cache is not None and self._composite_cache[0] == key:
+			return QPixmap(self._composite_cache[1])
+
+		entry = self._updated_render_cache(target_w, target_h)
+		composited = QPixmap(entry.base)
+		if entry.normal is not None or entry.multiply is not None:
+			composited = entry.base.copy()
+			painter = QPainter(composited)
+			if entry.normal is not None:
+				painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
+				painter.drawPixmap(0, 0, entry.normal)
+			if entry.multiply is not None:
+				painter.setCompositionMode(QPainter.CompositionMode_Multiply)
+				painter.drawPixmap(0, 0, entry.multiply)
+			painter.end()
+		self._composite_cache = (key, composited)
+		return QPixmap(composited)
 
-		normal = self.render_overlay(QSize(target_w, target_h), blend_filter=("normal",))
-		painter.setCompositionMode(QPainter.CompositionMode_SourceOver)
-		painter.drawPixmap(0, 0, normal)
+	def render_snapshot(self) -> "RenderSnapshot":
+		"""当前状态的只读快照（在 GUI 线程调用），之后可交给后台线程 render_image"""
+		if not self._base_pixmap:
+			raise RuntimeError("Base pixmap not set")
+		if self._base_image is None:
+			self._base_image = self._base_pixmap.toImage()
+		return RenderSnapshot(self._base_image, tuple(self.commands), self._version)
 
-		multiply_overlay = self.render_overlay(
-			QSize(target_w, target_h), blend_filter=("multiply",)
+	def render_region(self, size: Optional[QSize], rect: QRect) -> QPixmap:
+		"""只渲染目标尺寸图像中的 rect 区域（与 render_composited 的对应部分一致）
+
+		底图按源区域缩放绘制，命令由空间索引筛出与区域相交的部分，
+		内存只与 rect 大小有关，用于超大文档（长截图）的分块显示。
+		"""
+		if not self._base_pixmap:
+			raise RuntimeError("Base pixmap not set")
+		target_w, target_h = self._target_size(size)
+		rect = rect.intersected(QRect(0, 0, target_w, target_h))
+		if rect.isEmpty():
+			return QPixmap()
+		source = self._mip_level(target_w, target_h)
+		scale_x = source.width() / float(target_w)
+		scale_y = source.height() / float(target_h)
+		region = QPixmap(rect.size())
+		painter = QPainter(region)
+		painter.setRenderHint(QPainter.SmoothPixmapTransform)
+		painter.drawPixmap(
+			QRectF(0, 0, rect.width(), rect.height()),
+			source,
+			QRectF(rect.x() * scale_x, rect.y() * scale_y, rect.width() * scale_x, rect.height() * scale_y),
+		)
+		indices = self.commands_in_rect(
+			QRectF(
+				rect.x() / float(target_w),
+				rect.y() / float(target_h),
+				rect.width() / float(target_w),
+				rect.height() / float(target_h),
+			)
 		)
-		painter.setCompositionMode(QPainter.CompositionMode_Multiply)
-		painter.drawPixmap(0, 0, multiply_overlay)
+		for blend, mode in (
+			("normal", QPainter.CompositionMode_SourceOver),
+			("multiply", QPainter.CompositionMode_Multiply),
+		):
+			selected = [self.commands[i] for i in indices if self.commands[i].blend == blend]
+			if not selected:
+				continue
+			layer = QPixmap(rect.size())
+			layer.fill(Qt.transparent)
+			layer_painter = QPainter(layer)
+			layer_painter.setRenderHint(QPainter.Antialiasing)
+			layer_painter.translate(-rect.x(), -rect.y())
+			for cmd in selected:
+				self._render_command(layer_painter, cmd, target_w, target_h)
+			layer_painter.end()
+			painter.setCompositionMode(mode)
+			painter.drawPixmap(0, 0, layer)
+		painter.end()
+		return region
+
+	def _updated_render_cache(self, width: int, height: int) -> _OverlayCache:
+		"""取得目标尺寸的渲染缓存，并把缓存之后追加的命令画上去"""
+		cache = self._render_cache
+		entry = cache.get((width, height))
+		commands = self.commands
+		if entry is not None and (
+			entry.rewrite_version != self._rewrite_version
+			or entry.count > len(commands)
+			or (entry.count and commands[entry.count - 1] is not entry.last)
+		):
+			entry = None
+		if entry is None:
+			entry = _OverlayCache(self._rewrite_version, self._scaled_base(width, height))
+			cache[(width, height)] = entry
+			while len(cache) > self.RENDER_CACHE_SIZES:
+				cache.popitem(last=False)
+		cache.move_to_end((width, height))
+		if entry.count == len(commands):
+			return entry
+
+		painters: Dict[str, QPainter] = {}
+		for cmd in islice(commands, entry.count, None):
+			blend = cmd.blend
+			if blend not in ("normal", "multiply"):
+				continue
+			painter = painters.get(blend)
+			if painter is None:
+				layer = getattr(entry, blend)
+				if layer is None:
+					layer = QPixmap(width, height)
+					layer.fill(Qt.transparent)
+					setattr(entry, blend, layer)
+				painter = painters[blend] = QPainter(layer)
+				painter.setRenderHint(QPainter.Antialiasing)
+			self._render_command(painter, cmd, width, height)
+		for painter in painters.values():
+			painter.end()
+		entry.count = len(commands)
+		entry.last = commands[-1] if commands else None
+		return entry
+
+	def _scaled_base(self, width: int, height: int) -> QPixmap:
+		if QSize(width, height) == self._base_size:
+			return QPixmap(self._base_pixmap)
+		return self._base_pixmap.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+
+	def _mip_level(self, width: int, height: int) -> QPixmap:
+		"""不小于目标尺寸的最小金字塔层（之后最多再缩小 2 倍，双线性采样也不会产生锯齿）
+
+		每层由上一层减半得到，只生成实际用到的层。用于预览与分块显示；
+		高质量渲染 (render_composited) 仍从原图平滑缩放。
+		"""
+		levels = self._mip_levels
+		if not levels:
+			levels.append(self._base_pixmap)
+		index = 0
+		level = levels[0]
+		while level.width() // 2 >= width and level.height() // 2 >= height:
+			index += 1
+			if index == len(levels):
+				levels.append(level.scaled(
+					level.width() // 2, level.height() // 2, Qt.IgnoreAspectRatio, Qt.SmoothTransformation
+				))
+			level = levels[index]
+		return level
+
+	def render_preview(self, size: Optional[QSize] = None) -> QPixmap:
+		"""连续缩放时的快速预览
+
+		底图取最接近的金字塔层，绘图层沿用最近一次渲染缓存，都只做一次双线性缩放，
+		不重绘命令也不生成新的缓存。停止缩放后应调用 render_composited 得到高质量结果。
+		"""
+		if not self._base_pixmap:
+			raise RuntimeError("Base pixmap not set")
+		target_w, target_h = self._target_size(size)
+		if self._composite_cache is not None and self._composite_cache[0] == (target_w, target_h, self._version):
+			return QPixmap(self._composite_cache[1])
+		entry = None
+		if self._render_cache:
+			entry = self._updated_render_cache(*next(reversed(self._render_cache)))
+		source = self._mip_level(target_w, target_h)
+		target = QRectF(0, 0, target_w, target_h)
+		preview = QPixmap(target_w, target_h)
+		painter = QPainter(preview)
+		painter.setRenderHint(QPainter.SmoothPixmapTransform)
+		painter.drawPixmap(target, source, QRectF(source.rect()))
+		if entry is not None:
+			for blend, mode in (
+				("normal", QPainter.CompositionMode_SourceOver),
+				("multiply", QPainter.CompositionMode_Multiply),
+			):
+				layer = getattr(entry, blend)
+				if layer is not None:
+					painter.setCompositionMode(mode)
+					painter.drawPixmap(target, layer, QRectF(layer.rect()))
 		painter.end()
-		return base
+		return preview
 
 	# ------------------------------------------------------------------
 	# 内部渲染帮助函数
@@ -331,6 +1070,33 @@ class VectorLayerDocument:
 	def _pen_width(self, cmd: VectorPaintCommand, width: int, height: int) -> float:
 		return max(1.0, cmd.width_ratio * min(width, height))
 
+	def _shape_geometry(
+		self, cmd: VectorPaintCommand, width: int, height: int
+	) -> Optional[ShapeGeometry]:
+		"""箭头/矩形/椭圆的路径按 (命令, 目标尺寸) 缓存在命令上，重放时只需绘制缓存路径。
+
+		QPainterPath 绘制时会填充内部缓存，不能与 GUI 线程共用；后台线程（导出）
+		每次临时生成，不读写 cmd._shape。
+		"""
+
+		def build() -> Optional[ShapeGeometry]:
+			if len(cmd.points) < 2:
+				return None
+			(x0, y0), (x1, y1) = cmd.points[0], cmd.points[1]
+			return build_shape(
+				cmd.kind,
+				(x0 * width, y0 * height),
+				(x1 * width, y1 * height),
+				self._pen_width(cmd, width, height),
+			)
+
+		if threading.current_thread() is not threading.main_thread():
+			return build()
+		memo = cmd._shape
+		if memo is None:
+			memo = cmd._shape = ShapeMemo()
+		return memo.get((width, height), build)
+
 	def _render_command(
 		self, painter: QPainter, cmd: VectorPaintCommand, width: int, height: int
 	) -> None:
@@ -339,50 +1105,23 @@ class VectorLayerDocument:
 		color = _color_from_tuple(cmd.color)
 
 		if cmd.kind == "stroke":
-			scaled_points = [self._scaled_point(pt, width, height) for pt in cmd.points]
+			scaled_points = [QPointF(x, y) for x, y in cmd.points.transformed(width, height)]
 			stroke_width = self._pen_width(cmd, width, height)
-			StrokeStampRenderer.render(
+			StrokePathRenderer.render(
 				painter,
 				scaled_points,
 				stroke_width,
 				QColor(color),
 				cmd.extra.get("brush"),
 				cmd.extra.get("raw_alpha"),
+				cmd.extra.get("stamp_ratio", 1.0),
 			)
 			return
 
-		if cmd.kind in {"rect", "circle"}:
-			start = self._scaled_point(cmd.points[0], width, height)
-			end = self._scaled_point(cmd.points[1], width, height)
-			left = min(start.x(), end.x())
-			top = min(start.y(), end.y())
-			w = abs(start.x() - end.x())
-			h = abs(start.y() - end.y())
-			pen = QPen(color)
-			pen.setWidthF(self._pen_width(cmd, width, height))
-			painter.setPen(pen)
-			painter.setBrush(Qt.NoBrush)
-			if cmd.kind == "rect":
-				painter.drawRect(left, top, w, h)
-			else:
-				painter.drawEllipse(left, top, w, h)
-			return
-
-		if cmd.kind == "arrow":
-			start = self._scaled_point(cmd.points[0], width, height)
-			end = self._scaled_point(cmd.points[1], width, height)
-			from jietuba_drawing import PaintLayer  # 延迟导入避免循环
-
-			temp_layer = PaintLayer.__new__(PaintLayer)
-			try:
-				temp_layer._draw_optimized_arrow(
-					painter,
-					[[start.x(), start.y()], [end.x(), end.y()]],
-					color,
-					self._pen_width(cmd, width, height),
-				)
-			except Exception:
-				pass
+		if cmd.kind in SHAPE_KINDS:
+			geometry = self._shape_geometry(cmd, width, height)
+			if geometry is not None:
+				geometry.draw(painter, color)
 			return
 
 		if cmd.kind == "text":
@@ -399,15 +1138,11 @@ class VectorLayerDocument:
 					pass
 			if cmd.extra.get("italic"):
 				font.setItalic(True)
-			painter.setFont(font)
+			# 排版结果按 (文字, 字体, DPI) 缓存，缩放/撤销后的重放直接复用
+			layout = text_layout(cmd.extra.get("text", ""), font, painter.device())
 			painter.setPen(QPen(color))
-			text = cmd.extra.get("text", "")
 			line_ratio = float(cmd.extra.get("line", 1.8))
-			lines = text.split("\n")
-			metrics = painter.fontMetrics()
-			line_height = metrics.height() * line_ratio
-			for i, line in enumerate(lines):
-				painter.drawText(anchor.x(), anchor.y() + i * line_height, line)
+			layout.draw(painter, anchor.x(), anchor.y(), layout.height * line_ratio)
 			return
 
 		if cmd.kind == "number":
@@ -433,22 +1168,158 @@ class VectorLayerDocument:
 			
 			# 绘制数字
 			font = QFont("Arial", int(circle_radius * 0.8), QFont.Bold)
-			painter.setFont(font)
+			layout = text_layout(str(number), font, painter.device())
 			painter.setPen(QPen(color))
 			
-			# 计算文字居中位置
-			metrics = painter.fontMetrics()
-			text = str(number)
-			text_width = metrics.horizontalAdvance(text)
-			text_height = metrics.height()
-			text_x = center.x() - text_width / 2
-			text_y = center.y() + text_height / 3  # 微调垂直居中
+			# 计算文字居中位置（宽度取整，与 QFontMetrics.horizontalAdvance 一致）
+			text_x = center.x() - int(layout.width + 0.5) / 2
+			text_y = center.y() + layout.height / 3  # 微调垂直居中
 			
-			painter.drawText(int(text_x), int(text_y), text)
+			layout.draw(painter, int(text_x), int(text_y), layout.height)
 			return
 
+@dataclass(frozen=True)
+class RenderSnapshot:
+	"""文档某一时刻的只读快照
+
+	底图 QImage 与文档隐式共享、命令对象加入文档后不再修改，
+	因此快照可以交给后台线程渲染，GUI 线程同时继续编辑文档。
+	"""
+
+	base: QImage
+	commands: Tuple[VectorPaintCommand, ...]
+	version: int
+
+	@property
+	def size(self) -> QSize:
+		return self.base.size()
+
+	def render_image(self, size: Optional[QSize] = None) -> QImage:
+		"""合成底图与全部命令（结果与 render_composited 相同），只使用 QImage，可在任意线程调用"""
+		width = max(1, size.width()) if size is not None else self.base.width()
+		height = max(1, size.height()) if size is not None else self.base.height()
+		if width == self.base.width() and height == self.base.height():
+			image = self.base.copy()
+		else:
+			image = self.base.scaled(width, height, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+		if image.format() not in (QImage.Format_RGB32, QImage.Format_ARGB32_Premultiplied):
+			image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+		# 只借用命令绘制方法，不与原文档共享任何状态
+		renderer = VectorLayerDocument()
+		painter = QPainter(image)
+		for blend, mode in (
+			("normal", QPainter.CompositionMode_SourceOver),
+			("multiply", QPainter.CompositionMode_Multiply),
+		):
+			selected = [cmd for cmd in self.commands if cmd.blend == blend]
+			if not selected:
+				continue
+			layer = QImage(width, height, QImage.Format_ARGB32_Premultiplied)
+			layer.fill(Qt.transparent)
+			layer_painter = QPainter(layer)
+			layer_painter.setRenderHint(QPainter.Antialiasing)
+			for cmd in selected:
+				renderer._render_command(layer_painter, cmd, width, height)
+			layer_painter.end()
+			painter.setCompositionMode(mode)
+			painter.drawImage(0, 0, layer)
+		painter.end()
+		return image
+
+
+@dataclass
+class _Tile:
+	pixmap: QPixmap
+	rewrite_version: int
+	count: int
+	last: Optional[VectorPaintCommand]
+
+
+class VectorTileCache:
+	"""超大文档的分块显示缓存。
+
+	目标图像按 tile_size 切成固定大小的块，只渲染视口覆盖到的块，
+	按 LRU 最多保留 max_tiles 块，内存上限与视口大小相关而与文档大小无关。
+	文档只追加了命令时，只重绘与新命令包围盒相交的块。
+	"""
+
+	def __init__(self, document: VectorLayerDocument, tile_size: int = 512, max_tiles: int = 48):
+		self.document = document
+		self.tile_size = max(64, int(tile_size))
+		self.max_tiles = max(1, int(max_tiles))
+		self._tiles: "OrderedDict[Tuple[int, int, int, int], _Tile]" = OrderedDict()
+		self.rendered = 0  # 累计渲染的块数（统计用）
+
+	def __len__(self) -> int:
+		return len(self._tiles)
+
+	def clear(self) -> None:
+		self._tiles.clear()
+
+	def tiles_for(self, size: QSize, rect: QRect) -> List[Tuple[QRect, QPixmap]]:
+		"""返回覆盖 rect 的所有块 [(块在目标图像中的矩形, 块图像)]"""
+		target_w, target_h = self.document._target_size(size)
+		rect = rect.intersected(QRect(0, 0, target_w, target_h))
+		if rect.isEmpty():
+			return []
+		tile = self.tile_size
+		result = []
+		for ty in range(rect.top() // tile, rect.bottom() // tile + 1):
+			for tx in range(rect.left() // tile, rect.right() // tile + 1):
+				tile_rect = QRect(tx * tile, ty * tile, tile, tile).intersected(QRect(0, 0, target_w, target_h))
+				result.append((tile_rect, self._tile(target_w, target_h, tx, ty, tile_rect)))
+		# 视口可能需要比 max_tiles 更多的块，本次用到的块都保留到下一次
+		while len(self._tiles) > max(self.max_tiles, len(result)):
+			self._tiles.popitem(last=False)
+		return result
+
+	def paint(self, painter: QPainter, size: QSize, rect: QRect) -> int:
+		"""把覆盖 rect 的块画到 painter 上（目标图像坐标），返回块数"""
+		tiles = self.tiles_for(size, rect)
+		for tile_rect, pixmap in tiles:
+			painter.drawPixmap(tile_rect.topLeft(), pixmap)
+		return len(tiles)
+
+	def _tile(self, target_w: int, target_h: int, tx: int, ty: int, tile_rect: QRect) -> QPixmap:
+		doc = self.document
+		commands = doc.commands
+		key = (target_w, target_h, tx, ty)
+		entry = self._tiles.get(key)
+		if entry is not None:
+			if (
+				entry.rewrite_version != doc._rewrite_version
+				or entry.count > len(commands)
+				or (entry.count and commands[entry.count - 1] is not entry.last)
+			):
+				entry = None
+			elif entry.count < len(commands):
+				x0 = tile_rect.left() / float(target_w)
+				y0 = tile_rect.top() / float(target_h)
+				x1 = (tile_rect.right() + 1) / float(target_w)
+				y1 = (tile_rect.bottom() + 1) / float(target_h)
+				for cmd in islice(commands, entry.count, None):
+					bounds = command_bounds(cmd)
+					if bounds is not None and bounds[0] <= x1 and x0 <= bounds[2] and bounds[1] <= y1 and y0 <= bounds[3]:
+						entry = None
+						break
+				else:
+					entry.count = len(commands)
+					entry.last = commands[-1]
+		if entry is None:
+			entry = _Tile(
+				doc.render_region(QSize(target_w, target_h), tile_rect),
+				doc._rewrite_version,
+				len(commands),
+				commands[-1] if commands else None,
+			)
+			self._tiles[key] = entry
+			self.rendered += 1
+		self._tiles.move_to_end(key)
+		return entry.pixmap
+
+
 class StrokeStampRenderer:
-	"""统一的笔迹重放器，保证画笔与荧光笔渲染一致"""
+	"""逐点盖章的笔迹渲染器（实时绘制逐段增量使用），保证画笔与荧光笔渲染一致"""
 
 	@staticmethod
 	def render(
@@ -458,7 +1329,10 @@ class StrokeStampRenderer:
 		base_color: QColor,
 		brush_hint,
 		raw_alpha,
+		stamp_ratio: float = 1.0,
 	) -> None:
+		"""stamp_ratio: 原始采样与当前点的章密度之比（见 prepare_stroke），
+		简化过的笔迹按此调整每个章的透明度，使叠加后的透明度与原始笔迹相同"""
 		if not points:
 			return
 		brush_kind = StrokeStampRenderer._normalize_brush(brush_hint)
@@ -470,7 +1344,11 @@ class StrokeStampRenderer:
 			except Exception:
 				slider_alpha = alpha
 			alpha = StrokeStampRenderer._effective_alpha(slider_alpha, stroke_width)
-		color.setAlpha(int(round(min(255.0, alpha))))
+		alpha = min(255.0, alpha)
+		if stamp_ratio != 1.0 and alpha < 255.0:
+			# n 个章叠加后透明度为 1 - (1 - a)^n，章数变为 n / ratio 时每章取 1 - (1 - a)^ratio
+			alpha = 255.0 * (1.0 - (1.0 - alpha / 255.0) ** stamp_ratio)
+		color.setAlpha(int(round(alpha)))
 		half = stroke_width / 2.0
 		last_point = None
 		for point in points:
@@ -534,4 +1412,360 @@ class StrokeStampRenderer:
 		]
 
 
-__all__ = ["VectorLayerDocument", "VectorPaintCommand", "StrokeStampRenderer"]
+class StrokePathRenderer:
+	"""整条笔迹一次性绘制的重放器（替代逐像素盖章）
+
+	StrokeStampRenderer 每隔 1px 盖一个椭圆/方块，长笔迹要上千次抗锯齿绘制。
+	这里把笔迹扫过的区域一次填充：
+	- 圆头: 圆端点/圆连接的宽折线，与圆章扫过的区域相同
+	- 方头: 按单调段生成带状多边形，与方章扫过的区域相同
+
+	半透明笔迹（含荧光笔 _effective_alpha）逐点盖章时，笔宽中心的像素被 n 个章
+	叠加，透明度为 1 - (1 - a)^n。这里先把笔迹不透明地画到离屏层，再按该透明度
+	整体合成一次（合成模式沿用 painter 当前设置，荧光笔在正片叠底层中绘制）。
+	横竖方向的笔迹与盖章结果一致；斜向/曲线笔迹盖章时边缘的章数较少而渐淡，
+	这里边缘是实色，自身交叉处也不再加深（更接近真实荧光笔）。
+
+	实时绘制（逐段增量盖章）仍使用 StrokeStampRenderer。
+	"""
+
+	@staticmethod
+	def render(
+		painter: QPainter,
+		points: Sequence[QPointF],
+		stroke_width: float,
+		base_color: QColor,
+		brush_hint,
+		raw_alpha,
+		stamp_ratio: float = 1.0,
+	) -> None:
+		"""stamp_ratio: 原始采样与当前点的章密度之比（见 prepare_stroke），
+		简化过的笔迹据此还原半透明叠加次数"""
+		if not points:
+			return
+		color = QColor(base_color)
+		alpha = float(color.alpha())
+		if raw_alpha is not None:
+			try:
+				alpha = StrokeStampRenderer._effective_alpha(float(raw_alpha), stroke_width)
+			except Exception:
+				pass
+		color.setAlpha(255)
+		brush_kind = StrokeStampRenderer._normalize_brush(brush_hint)
+		samples = [(point.x(), point.y()) for point in points]
+		coords = StrokePathRenderer._thin(samples)
+		if alpha < 255.0:
+			opacity = StrokePathRenderer._layer_opacity(samples, stroke_width, alpha, brush_kind, stamp_ratio)
+			StrokePathRenderer._fill_layer(painter, coords, stroke_width, color, brush_kind, opacity)
+		else:
+			StrokePathRenderer._fill(painter, coords, stroke_width, color, brush_kind)
+		painter.setBrush(Qt.NoBrush)
+		painter.setPen(Qt.NoPen)
+
+	@staticmethod
+	def _fill(
+		painter: QPainter, coords: Sequence[Tuple[float, float]], size: float, color: QColor, brush_kind: str
+	) -> None:
+		if brush_kind == "square":
+			painter.setPen(Qt.NoPen)
+			painter.setBrush(color)
+			for polygon in StrokePathRenderer._square_polygons(coords, size / 2.0):
+				painter.drawPolygon(polygon, Qt.WindingFill)
+		else:
+			StrokePathRenderer._draw_round(painter, coords, size, color)
+
+	@staticmethod
+	def _layer_opacity(
+		samples: Sequence[Tuple[float, float]],
+		stroke_width: float,
+		alpha: float,
+		brush_kind: str,
+		stamp_ratio: float,
+	) -> float:
+		"""盖章重放时笔宽中心的叠加透明度 1 - (1 - a)^n
+
+		章沿切比雪夫距离排列，原始笔迹的章密度为 当前密度 * stamp_ratio；
+		方章在移动方向上覆盖 stroke_width 个切比雪夫单位，圆章覆盖 stroke_width 的欧氏弦长。
+		"""
+		stamps, length, cheb_length = StrokePathRenderer._stamp_stats(samples)
+		coverage = 1.0
+		if cheb_length > 0.0:
+			coverage = stroke_width * stamps / cheb_length * stamp_ratio
+			if brush_kind == "round":
+				coverage *= cheb_length / length
+		# 与 StrokeStampRenderer 相同，每个章的透明度取整到 8 位
+		stamp_alpha = int(round(min(255.0, alpha))) / 255.0
+		return 1.0 - (1.0 - stamp_alpha) ** max(1.0, coverage)
+
+	@staticmethod
+	def _fill_layer(
+		painter: QPainter,
+		coords: Sequence[Tuple[float, float]],
+		size: float,
+		color: QColor,
+		brush_kind: str,
+		opacity: float,
+	) -> None:
+		"""不透明地画到只覆盖笔迹范围的离屏层，再按 opacity 合成一次"""
+		margin = size / 2.0 + 2.0
+		xs = [x for x, _ in coords]
+		ys = [y for _, y in coords]
+		bounds = QRectF(
+			min(xs) - margin, min(ys) - margin, max(xs) - min(xs) + margin * 2.0, max(ys) - min(ys) + margin * 2.0
+		)
+		transform = painter.transform()
+		device = painter.device()
+		area = transform.mapRect(bounds).toAlignedRect().intersected(QRect(0, 0, device.width(), device.height()))
+		if painter.hasClipping():
+			area = area.intersected(transform.mapRect(painter.clipBoundingRect()).toAlignedRect())
+		if area.isEmpty():
+			return
+		# QImage 可在后台导出线程使用
+		layer = QImage(area.size(), QImage.Format_ARGB32_Premultiplied)
+		layer.fill(Qt.transparent)
+		layer_painter = QPainter(layer)
+		layer_painter.setRenderHints(painter.renderHints())
+		layer_painter.setTransform(transform * QTransform.fromTranslate(-area.x(), -area.y()))
+		StrokePathRenderer._fill(layer_painter, coords, size, color, brush_kind)
+		layer_painter.end()
+		painter.save()
+		painter.resetTransform()
+		painter.setOpacity(painter.opacity() * opacity)
+		painter.drawImage(area.topLeft(), layer)
+		painter.restore()
+
+	@staticmethod
+	def _thin(samples: Sequence[Tuple[float, float]], tolerance: float = 0.5) -> List[Tuple[float, float]]:
+		"""去掉与上一个保留点距离不足 tolerance 的采样点（亚像素，肉眼不可见），终点总是保留"""
+		coords = [samples[0]]
+		last_x, last_y = samples[0]
+		limit = tolerance * tolerance
+		for x, y in samples:
+			if (x - last_x) * (x - last_x) + (y - last_y) * (y - last_y) >= limit:
+				coords.append((x, y))
+				last_x, last_y = x, y
+		if coords[-1] != samples[-1]:
+			coords.append(samples[-1])
+		return coords
+
+	@staticmethod
+	def _stamp_stats(samples: Sequence[Tuple[float, float]]) -> Tuple[float, float, float]:
+		"""盖章重放时的章数、折线长度与切比雪夫长度（按原始采样点计算）"""
+		stamps = 1
+		length = 0.0
+		cheb_length = 0.0
+		for (x0, y0), (x1, y1) in zip(samples, islice(samples, 1, None)):
+			dx = abs(x1 - x0)
+			dy = abs(y1 - y0)
+			if not dx and not dy:
+				continue
+			# 与 _interpolate 一致: 每段按切比雪夫距离逐像素盖章
+			stamps += max(1, int(max(dx, dy)))
+			length += math.hypot(dx, dy)
+			cheb_length += max(dx, dy)
+		return stamps, length, cheb_length
+
+	@staticmethod
+	def _draw_round(
+		painter: QPainter, coords: Sequence[Tuple[float, float]], size: float, color: QColor
+	) -> None:
+		"""圆章沿折线扫过的区域 = 圆端点/圆连接的宽线，宽线整体只填充一次"""
+		if len(coords) == 1:
+			x, y = coords[0]
+			half = size / 2.0
+			painter.setPen(Qt.NoPen)
+			painter.setBrush(color)
+			painter.drawEllipse(QRectF(x - half, y - half, size, size))
+			return
+		painter.setPen(QPen(color, size, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+		painter.setBrush(Qt.NoBrush)
+		painter.drawPolyline(QPolygonF([QPointF(x, y) for x, y in coords]))
+
+	@staticmethod
+	def _square_polygons(coords: Sequence[Tuple[float, float]], half: float) -> List[QPolygonF]:
+		"""方章沿折线扫过的区域（多个可能相互重叠的多边形）
+
+		把折线按移动方向（x、y 各自的增减）切成单调段: 单调段上方章扫过的区域
+		正好是折线分别平移到两个侧角 (sx, -sy)、(-sx, sy) 后夹出的带状多边形，
+		每段只需一个多边形。以不透明颜色逐个填充即为并集，不必让 Qt 计算整条路径的
+		非零环绕（鼠标抖动产生大量短段时快得多）。
+		"""
+		if len(coords) == 1:
+			x, y = coords[0]
+			return [QPolygonF(QRectF(x - half, y - half, half * 2.0, half * 2.0))]
+		polygons = []
+		run = [coords[0]]
+		sign_x = sign_y = 0
+		for prev, point in zip(coords, coords[1:]):
+			dx = point[0] - prev[0]
+			dy = point[1] - prev[1]
+			step_x = (dx > 0) - (dx < 0)
+			step_y = (dy > 0) - (dy < 0)
+			if (step_x and sign_x and step_x != sign_x) or (step_y and sign_y and step_y != sign_y):
+				polygons.append(StrokePathRenderer._square_run(run, sign_x, sign_y, half))
+				run = [prev]
+				sign_x = sign_y = 0
+			sign_x = sign_x or step_x
+			sign_y = sign_y or step_y
+			run.append(point)
+		polygons.append(StrokePathRenderer._square_run(run, sign_x, sign_y, half))
+		return polygons
+
+	@staticmethod
+	def _square_run(
+		run: Sequence[Tuple[float, float]], sign_x: int, sign_y: int, half: float
+	) -> QPolygonF:
+		sx = half if sign_x >= 0 else -half
+		sy = half if sign_y >= 0 else -half
+		x0, y0 = run[0]
+		x1, y1 = run[-1]
+		outline = [QPointF(x0 - sx, y0 - sy)]
+		outline.extend(QPointF(x + sx, y - sy) for x, y in run)
+		outline.append(QPointF(x1 + sx, y1 + sy))
+		outline.extend(QPointF(x - sx, y + sy) for x, y in reversed(run))
+		return QPolygonF(outline)
+
+def _segment_distance_sq(point: PointTuple, start: PointTuple, end: PointTuple) -> float:
+	px, py = point
+	x0, y0 = start
+	dx = end[0] - x0
+	dy = end[1] - y0
+	length_sq = dx * dx + dy * dy
+	if length_sq > 0.0:
+		t = _clamp(((px - x0) * dx + (py - y0) * dy) / length_sq, 0.0, 1.0)
+		x0 += t * dx
+		y0 += t * dy
+	return (px - x0) * (px - x0) + (py - y0) * (py - y0)
+
+
+def simplify_stroke(points: Sequence[PointTuple], tolerance: float) -> List[PointTuple]:
+	"""Ramer–Douglas–Peucker 折线简化（首尾点总是保留）
+
+	去掉的点到保留折线的距离都不超过 tolerance。用显式栈迭代，长笔迹不会递归过深。
+	"""
+	points = [(float(x), float(y)) for x, y in points]
+	if len(points) < 3 or tolerance <= 0.0:
+		return points
+	keep = [False] * len(points)
+	keep[0] = keep[-1] = True
+	limit = tolerance * tolerance
+	stack = [(0, len(points) - 1)]
+	while stack:
+		first, last = stack.pop()
+		start = points[first]
+		end = points[last]
+		worst = 0.0
+		index = 0
+		for i in range(first + 1, last):
+			distance = _segment_distance_sq(points[i], start, end)
+			if distance > worst:
+				worst = distance
+				index = i
+		if worst > limit:
+			keep[index] = True
+			stack.append((first, index))
+			stack.append((index, last))
+	return [point for point, kept in zip(points, keep) if kept]
+
+
+def smooth_stroke(points: Sequence[PointTuple], iterations: int = 2) -> List[PointTuple]:
+	"""Chaikin 割角平滑（逼近二次 B 样条），首尾点保持不动"""
+	points = [(float(x), float(y)) for x, y in points]
+	for _ in range(max(0, int(iterations))):
+		if len(points) < 3:
+			break
+		smoothed = [points[0]]
+		for (x0, y0), (x1, y1) in zip(points, islice(points, 1, None)):
+			smoothed.append((0.75 * x0 + 0.25 * x1, 0.75 * y0 + 0.25 * y1))
+			smoothed.append((0.25 * x0 + 0.75 * x1, 0.25 * y0 + 0.75 * y1))
+		smoothed[1] = points[0]
+		smoothed[-1] = points[-1]
+		points = smoothed[1:]
+	return points
+
+
+def stroke_tolerance(pen_width: float) -> float:
+	"""简化容差（像素）: 随笔宽增大，限制在 0.5~0.8px
+
+	鼠标采样本身是整数像素，0.5px 以内的台阶正是取整误差，去掉后边缘仍在亚像素范围内。
+	"""
+	return _clamp(float(pen_width) * 0.04, 0.5, 0.8)
+
+
+_stroke_options: Optional[Tuple[bool, bool]] = None
+
+
+def stroke_commit_options() -> Tuple[bool, bool]:
+	"""笔迹提交设置: (是否简化, 是否平滑)；首次调用时读取 QSettings，之后使用缓存"""
+	global _stroke_options
+	if _stroke_options is None:
+		settings = QSettings('Fandes', 'jietuba')
+		_stroke_options = (
+			settings.value('paint/simplify_strokes', True, type=bool),
+			settings.value('paint/smooth_strokes', False, type=bool),
+		)
+	return _stroke_options
+
+
+def reload_stroke_commit_options() -> None:
+	"""设置变更后调用，下次提交笔迹时重新读取"""
+	global _stroke_options
+	_stroke_options = None
+
+
+def prepare_stroke(
+	points: Sequence[PointTuple],
+	pen_width: float,
+	*,
+	simplify: bool = True,
+	smooth: bool = False,
+) -> Tuple[List[PointTuple], Dict[str, float]]:
+	"""笔迹提交前的处理: RDP 简化 + 可选 Chaikin 平滑
+
+	points 与 pen_width 使用同一像素坐标（绘制时的窗口坐标）。
+	半透明笔迹重放时的叠加次数取决于原始采样的章密度，点数减少后由
+	meta["stamp_ratio"] 补偿（传给 add_stroke 的 extra_meta），颜色深浅保持不变。
+
+	Returns:
+		(处理后的点列表, 需写入命令 extra 的元数据)
+	"""
+	raw = [(float(x), float(y)) for x, y in points]
+	if len(raw) < 3 or not (simplify or smooth):
+		return raw, {}
+	tolerance = stroke_tolerance(pen_width)
+	result = simplify_stroke(raw, tolerance)
+	if smooth:
+		# 先简化再割角，割角后再去掉近似共线的点
+		result = simplify_stroke(smooth_stroke(result), tolerance * 0.5)
+	if len(result) == len(raw):
+		return raw, {}
+	meta: Dict[str, float] = {}
+	# 半透明重放逐点盖章，章沿切比雪夫距离逐像素排列，密度按切比雪夫长度计
+	raw_stamps, _raw_length, raw_cheb = StrokePathRenderer._stamp_stats(raw)
+	stamps, _length, cheb = StrokePathRenderer._stamp_stats(result)
+	if raw_cheb > 0.0 and cheb > 0.0:
+		ratio = (raw_stamps / raw_cheb) / (stamps / cheb)
+		if abs(ratio - 1.0) > 1e-3:
+			meta["stamp_ratio"] = round(ratio, 4)
+	return result, meta
+
+
+__all__ = [
+	"VectorLayerDocument",
+	"VectorPaintCommand",
+	"PointBuffer",
+	"CommandSnapshot",
+	"history_footprint",
+	"RenderSnapshot",
+	"VectorSpatialIndex",
+	"VectorTileCache",
+	"StrokeStampRenderer",
+	"StrokePathRenderer",
+	"command_bounds",
+	"record_bounds",
+	"simplify_stroke",
+	"smooth_stroke",
+	"prepare_stroke",
+	"stroke_commit_options",
+	"reload_stroke_commit_options",
+]
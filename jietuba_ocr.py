@@ -185,7 +185,8 @@ class OCRManager:
         Returns:
             处理后的 QPixmap
         """
-        image = pixmap.toImage()
+        # 后台线程直接传入 QImage（QPixmap 只能在 GUI 线程使用）
+        image = pixmap if isinstance(pixmap, QImage) else pixmap.toImage()
         
         # 1. 灰度转换(可选, ~5ms)
         if enable_grayscale:
@@ -0,0 +1,146 @@
+"""
+jietuba_resource_loader.py - Qt 资源延迟注册模块
+
+jietuba_resource.py 是 pyrcc5 生成的 5 万多行模块,所有图标都以 bytes 字面量
+内嵌其中,导入时要反序列化并常驻数 MB 数据。本模块改为:
+
+- 优先注册二进制资源文件 jietuba_resource.rcc (QResource.registerResource,
+  Qt 直接内存映射文件,不经过 Python 对象)
+- 找不到 .rcc 时才回退到导入 jietuba_resource 模块
+- 只在第一次需要 ":/" 资源时注册 (ensure_resources),启动阶段不再导入资源模块
+
+.rcc 由 build_rcc() 从 jietuba_resource 模块的数据直接生成,与 pyrcc5 输出完全一致,
+打包脚本在调用 PyInstaller 之前生成。
+
+使用方法:
+    from jietuba_resource_loader import ensure_resources
+    ensure_resources()
+    icon = QIcon(":/saveicon.png")
+
+命令行:
+    python jietuba_resource_loader.py --build     # 生成 jietuba_resource.rcc
+    python jietuba_resource_loader.py --report    # 对比两种加载方式的耗时
+"""
+
+import os
+import struct
+import sys
+import time
+
+from PyQt5.QtCore import QResource
+
+
+RCC_NAME = "jietuba_resource.rcc"
+
+_loaded_from = ""
+
+
+def _rcc_path() -> str:
+    from jietuba_public import resource_path
+    return resource_path(RCC_NAME)
+
+
+def ensure_resources() -> str:
+    """确保 ":/" 资源已注册（可重复调用）
+
+    Returns:
+        资源来源: "rcc" / "module"；都不可用时返回 ""
+    """
+    global _loaded_from
+    if _loaded_from:
+        return _loaded_from
+    start = time.perf_counter()
+    path = _rcc_path()
+    if os.path.isfile(path) and QResource.registerResource(path):
+        _loaded_from = "rcc"
+    else:
+        try:
+            import jietuba_resource  # noqa: F401  导入时自动注册
+            _loaded_from = "module"
+        except Exception as e:
+            print(f"❌ [资源] 资源注册失败: {e}")
+            return ""
+    print(f"🖼️ [资源] 已注册资源 ({_loaded_from})，用时 {(time.perf_counter() - start) * 1000:.1f}ms")
+    return _loaded_from
+
+
+def build_rcc(output_path: str = "") -> str:
+    """从 jietuba_resource 模块生成二进制 .rcc 文件
+
+    文件格式与 `rcc -binary` 相同: "qres" + 版本 + 树/数据/名称偏移，之后依次为数据、名称、树。
+
+    Returns:
+        生成的文件路径
+    """
+    import jietuba_resource as res
+
+    output_path = output_path or os.path.join(os.path.dirname(os.path.abspath(__file__)), RCC_NAME)
+    version = 2
+    header_size = 4 + 4 * 4
+    data = res.qt_resource_data
+    names = res.qt_resource_name
+    tree = res.qt_resource_struct_v2
+    data_offset = header_size
+    names_offset = data_offset + len(data)
+    tree_offset = names_offset + len(names)
+    header = b"qres" + struct.pack(">iiii", version, tree_offset, data_offset, names_offset)
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(data)
+        f.write(names)
+        f.write(tree)
+    os.replace(tmp_path, output_path)
+    print(f"✅ [资源] 已生成 {output_path} ({os.path.getsize(output_path) / 1024:.0f} KB)")
+    return output_path
+
+
+_REPORT_SCRIPT = r"""
+import sys, time
+start = time.perf_counter()
+from PyQt5.QtCore import QResource
+base = time.perf_counter()
+if sys.argv[1] == "module":
+    import jietuba_resource
+else:
+    assert QResource.registerResource(sys.argv[2])
+done = time.perf_counter()
+from PyQt5.QtCore import QFile
+ok = QFile.exists(":/saveicon.png")
+print(f"{(done - base) * 1000:.1f} {int(ok)}")
+"""
+
+
+def import_report(rcc_path: str = "") -> None:
+    """在独立进程中分别测量导入资源模块与注册 .rcc 的耗时"""
+    import subprocess
+
+    rcc_path = rcc_path or _rcc_path()
+    if not os.path.isfile(rcc_path):
+        rcc_path = build_rcc(rcc_path)
+    here = os.path.dirname(os.path.abspath(__file__))
+    print("📊 [资源] 加载耗时（独立进程，各 3 次）")
+    for mode in ("module", "rcc"):
+        results = []
+        for _ in range(3):
+            out = subprocess.run(
+                [sys.executable, "-c", _REPORT_SCRIPT, mode, rcc_path],
+                cwd=here, capture_output=True, text=True,
+            )
+            line = out.stdout.strip().splitlines()[-1] if out.stdout.strip() else ""
+            try:
+                ms, ok = line.split()
+                results.append((float(ms), ok == "1"))
+            except ValueError:
+                print(f"⚠️ [资源] {mode} 测量失败: {out.stderr.strip()[-200:]}")
+                break
+        if results:
+            best = min(ms for ms, _ok in results)
+            print(f"   {mode:<6} 最快 {best:7.1f}ms  资源可用={all(ok for _ms, ok in results)}")
+
+
+if __name__ == "__main__":
+    if "--build" in sys.argv:
+        build_rcc()
+    if "--report" in sys.argv:
+        import_report()
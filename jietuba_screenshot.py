@@ -28,11 +28,11 @@ from PyQt5.QtGui import QCursor, QBrush, QScreen, QWindow
 from PyQt5.QtGui import QPixmap, QPainter, QPen, QIcon, QFont, QImage, QColor, QPolygon
 from PyQt5.QtWidgets import *  # 包含 QFrame 以支持透明输入框无边框设置
 from jietuba_widgets import Freezer
-from jietuba_layer_system import VectorLayerDocument
+from jietuba_layer_system import VectorLayerDocument, PointBuffer, record_bounds, history_footprint
+from jietuba_smart_region import ImageRegionFinder
 
 from jietuba_public import Commen_Thread, TipsShower, PLATFORM_SYS,CONFIG_DICT, get_screenshot_save_dir
-import jietuba_resource
-from pynput.mouse import Controller
+from jietuba_resource_loader import ensure_resources
 
 # 导入重构后的模块
 from jietuba_ui_components import (
@@ -59,6 +59,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         super().__init__()
         # self.ready_flag = False
         self.parent = parent
+        ensure_resources()  # 注册 ":/" 图标资源（优先内存映射 .rcc）
         
         # 使用新的截图保存目录（桌面上的スクショ文件夹）
         self.screenshot_save_dir = get_screenshot_save_dir()
@@ -197,6 +198,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         self.lastbtn = QPushButton("", self.botton_box)  # 移动到底部导航栏
         self.nextbtn = QPushButton("", self.botton_box)  # 移动到底部导航栏
         self.finder = Finder(self)  # 智能选区的寻找器
+        self.region_finder = ImageRegionFinder()  # 基于截图画面的界面元素检测（补充窗口级选区）
         self.Tipsshower = TipsShower("  ", targetarea=(100, 70, 0, 0), parent=self)  # 左上角的大字提示
         self.Tipsshower.hide()
         # 移除了信号连接以避免显示提示
@@ -340,6 +342,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
 
         # 矢量捕获（截图 -> 钉图传输使用）
         self.vector_document = None
+        self._crop_conversion_cache = None
         self._vector_dirty = False
 
     # ====================== 矢量捕获与转换 ======================
@@ -352,6 +355,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                 self.vector_document = VectorLayerDocument(base)
             except Exception as e:
                 self.vector_document = None
+                self._crop_conversion_cache = None
                 print(f"⚠️ [矢量捕获] 初始化失败: {e}")
         return self.vector_document
 
@@ -400,6 +404,8 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                     extra_meta["raw_alpha"] = float(item["raw_alpha"])
                 except Exception:
                     pass
+            if item.get("stamp_ratio") is not None:
+                extra_meta["stamp_ratio"] = float(item["stamp_ratio"])
             doc.add_stroke(
                 points,
                 qcolor,
@@ -505,7 +511,18 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         base = self.originalPix.copy(crop_x, crop_y, crop_w, crop_h) if hasattr(self, 'originalPix') else None
         if base is None or base.isNull():
             return None
-        snapshot = doc.export_state()
+        # 先用空间索引筛出包围盒与裁剪区域相交的命令，再做逐点判断
+        base_size = doc.base_size
+        base_w = float(max(1, base_size.width()))
+        base_h = float(max(1, base_size.height()))
+        margin = 2.0
+        query = QRectF(
+            (crop_x - margin) / base_w,
+            (crop_y - margin) / base_h,
+            (crop_w + margin * 2) / base_w,
+            (crop_h + margin * 2) / base_h,
+        )
+        snapshot = doc.export_records(doc.commands_in_rect(query))
         filtered = self._extract_vector_state_for_crop(snapshot, crop_x, crop_y, crop_w, crop_h)
         if not filtered:
             return None
@@ -526,48 +543,65 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         top = float(crop_y)
         right = left + float(crop_w)
         bottom = top + float(crop_h)
+        margin = 2.0  # 容错，允许少量越界
         filtered = []
 
-        def _point_inside(px, py):
-            margin = 2.0  # 容错，允许少量越界
-            return (left - margin) <= px <= (right + margin) and (top - margin) <= py <= (bottom + margin)
+        # 共享记录（撤销快照中的命令）在各历史节点间是同一对象，
+        # 复制整段历史时同一裁剪区域下每条命令只转换一次
+        cache_key = (crop_x, crop_y, crop_w, crop_h, base_w, base_h)
+        cache = getattr(self, '_crop_conversion_cache', None)
+        if cache is None or cache[0] != cache_key:
+            cache = (cache_key, {})
+            self._crop_conversion_cache = cache
+        converted_cache = cache[1]
+        # 包围盒的快速排除：点集都在包围盒内，包围盒不相交则不可能有点落在裁剪区域
+        norm_left = (left - margin) / base_w
+        norm_top = (top - margin) / base_h
+        norm_right = (right + margin) / base_w
+        norm_bottom = (bottom + margin) / base_h
 
         for raw in snapshot:
+            shared = getattr(raw, 'command', None) is not None
+            if shared:
+                hit = converted_cache.get(id(raw))
+                if hit is not None:
+                    if hit[1] is not None:
+                        filtered.append(hit[1])
+                    continue
             pts = raw.get("points") or []
             if not pts:
                 continue
-            absolute = []
-            intersects = False
-            for norm in pts:
-                abs_x = float(norm[0]) * base_w
-                abs_y = float(norm[1]) * base_h
-                absolute.append((abs_x, abs_y))
-                if _point_inside(abs_x, abs_y):
-                    intersects = True
-            if not intersects:
+            bounds = record_bounds(raw)
+            if bounds is not None and (
+                bounds[2] < norm_left or bounds[0] > norm_right
+                or bounds[3] < norm_top or bounds[1] > norm_bottom
+            ):
+                if shared:
+                    converted_cache[id(raw)] = (raw, None)
                 continue
-            converted = []
-            for abs_x, abs_y in absolute:
-                local_x = (abs_x - left) / float(crop_w)
-                local_y = (abs_y - top) / float(crop_h)
-                converted.append(
-                    (
-                        max(0.0, min(1.0, local_x)),
-                        max(0.0, min(1.0, local_y)),
-                    )
-                )
+            # 点坐标整体变换：归一化 → 底图像素 → 裁剪区域内归一化（截断到 [0, 1]）
+            absolute = PointBuffer.coerce(pts).transformed(base_w, base_h)
+            if not absolute.any_inside(left - margin, top - margin, right + margin, bottom + margin):
+                if shared:
+                    converted_cache[id(raw)] = (raw, None)
+                continue
+            converted = absolute.transformed(
+                1.0 / crop_w, 1.0 / crop_h, -left / crop_w, -top / crop_h, clamp=(0.0, 1.0)
+            )
             width_px = float(raw.get("width_ratio", 0)) * min_base
             width_ratio = width_px / min_crop if min_crop > 0 else 0.0
-            filtered.append(
-                {
-                    "kind": raw.get("kind", "stroke"),
-                    "points": converted,
-                    "width_ratio": width_ratio,
-                    "color": tuple(raw.get("color", (255, 0, 0, 255))),
-                    "blend": raw.get("blend", "normal"),
-                    "extra": dict(raw.get("extra", {})),
-                }
-            )
+            entry = {
+                "kind": raw.get("kind", "stroke"),
+                "points": converted,
+                "width_ratio": width_ratio,
+                "color": tuple(raw.get("color", (255, 0, 0, 255))),
+                "blend": raw.get("blend", "normal"),
+                "extra": dict(raw.get("extra", {})),
+            }
+            if shared:
+                # 缓存同时持有原记录，保证 id 在缓存有效期内不会被复用
+                converted_cache[id(raw)] = (raw, entry)
+            filtered.append(entry)
         return filtered
 
     def _build_highlighter_icon(self, icon_size: QSize = QSize(24, 24)) -> QIcon:
@@ -998,6 +1032,68 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         except Exception as e:
             print(f"重置文字输入框时出错: {e}")
 
+    def refine_background(self):
+        """低延迟模式：用缓冲帧显示截图界面后，重新截取一张最新的背景
+
+        依赖 Windows 10 2004+ 的 SetWindowDisplayAffinity(WDA_EXCLUDEFROMCAPTURE)，
+        让截图界面本身不出现在截屏中；不支持时保留缓冲帧。
+        用户已经开始选区或绘制时不再替换背景。
+
+        Returns:
+            bool: 是否替换了背景
+        """
+        if PLATFORM_SYS != "win32" or not self.isVisible():
+            return False
+        if self.choicing or self.backup_ssid != 0:
+            return False
+        try:
+            import ctypes
+            user32 = ctypes.windll.user32
+            hwnd = int(self.winId())
+            WDA_NONE, WDA_EXCLUDEFROMCAPTURE = 0x0, 0x11
+            if not user32.SetWindowDisplayAffinity(hwnd, WDA_EXCLUDEFROMCAPTURE):
+                _debug_print("系统不支持 WDA_EXCLUDEFROMCAPTURE，保留缓冲帧")
+                return False
+            try:
+                from jietuba_capture import DesktopCapture
+                capture = DesktopCapture.grab()
+            finally:
+                user32.SetWindowDisplayAffinity(hwnd, WDA_NONE)
+        except Exception as e:
+            print(f"⚠️ [低延迟] 刷新背景失败: {e}")
+            return False
+
+        # 截取期间用户可能已经开始操作
+        if self.choicing or self.backup_ssid != 0 or QApplication.mouseButtons() != Qt.NoButton:
+            return False
+        bounds = capture.bounds
+        if bounds.width() != self.virtual_desktop_width or bounds.height() != self.virtual_desktop_height:
+            # 显示器布局发生变化，不替换
+            return False
+
+        pixmap = capture.compose()
+        if not pixmap.hasAlphaChannel() or pixmap.devicePixelRatio() != 1:
+            base = QPixmap(pixmap.width(), pixmap.height())
+            base.fill(Qt.transparent)
+            painter = QPainter(base)
+            painter.drawPixmap(0, 0, pixmap)
+            painter.end()
+            pixmap = base
+        capture.release()
+
+        self.originalPix = pixmap.copy()
+        self.vector_document = None
+        self._crop_conversion_cache = None
+        self._ensure_vector_document()
+        self.setPixmap(pixmap)
+        self._screenshot_pix = pixmap
+        self._smart_selection_initialized = False
+        self.region_finder.clear_setup()
+        self.backup_pic_list = [self._capture_backup_snapshot()]
+        self.update()
+        print("🎞️ [低延迟] 背景已刷新为最新截图")
+        return True
+
     def setoriginalpix(self):
         self.change_tools_fun("")
         self.setCursor(Qt.ArrowCursor)
@@ -1469,6 +1565,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             self.show_paint_tools_menu()
 
     def search_in_which_screen(self):
+        from pynput.mouse import Controller
         mousepos=Controller().position
         screens = QApplication.screens()
         secondscreen = QApplication.primaryScreen()
@@ -1515,8 +1612,12 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             
         return x, y
 
-    def capture_all_screens(self):
-        """捕获所有显示器截图并拼接成虚拟桌面 (含调试输出)"""
+    def capture_all_screens(self, capture=None):
+        """捕获所有显示器截图并拼接成虚拟桌面 (含调试输出)
+
+        Args:
+            capture: 已截取好的 DesktopCapture（低延迟模式的缓冲帧），为 None 时立即截取
+        """
         try:
             screens = QApplication.screens()
             _debug_print(f"Qt 检测到 {len(screens)} 个 QScreen")
@@ -1531,58 +1632,39 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             if len(screens) != len(win_monitors) and win_monitors:
                 _debug_print("⚠️ Qt 与 Win32 显示器数量不一致，可能 Qt 未感知外接屏 (DPI/权限/会话)")
 
-            # 汇总边界
-            min_x = min_y = float('inf')
-            max_x = max_y = float('-inf')
-            captures = []
-
-            for i, screen in enumerate(screens):
-                pm = screen.grabWindow(0)
-                geo = screen.geometry()
-                try:
-                    name = screen.name()
-                except Exception:
-                    name = f"Screen{i+1}"
-                _debug_print(f"QScreen {i+1}: 名称={name} 分辨率={geo.width()}x{geo.height()} 位置=({geo.x()},{geo.y()}) dpr={screen.devicePixelRatio():.2f}")
-                _debug_print(f"  抓取Pixmap={pm.width()}x{pm.height()}")
-
-                captures.append({
-                    'pixmap': pm,
-                    'x': geo.x(),
-                    'y': geo.y(),
-                    'w': geo.width(),
-                    'h': geo.height(),
-                })
-                min_x = min(min_x, geo.x())
-                min_y = min(min_y, geo.y())
-                max_x = max(max_x, geo.x() + geo.width())
-                max_y = max(max_y, geo.y() + geo.height())
-
-            total_width = max_x - min_x
-            total_height = max_y - min_y
+            # 各屏幕在主线程依次截取，再由 compose() 合成虚拟桌面
+            from jietuba_capture import DesktopCapture
+            if capture is None:
+                capture = DesktopCapture.grab(screens)
+            for i, (screen, tile) in enumerate(zip(screens, capture.tiles)):
+                geo = tile.geometry
+                _debug_print(f"QScreen {i+1}: 名称={tile.name} 分辨率={geo.width()}x{geo.height()} 位置=({geo.x()},{geo.y()}) dpr={tile.dpr:.2f}")
+                _debug_print(f"  抓取Pixmap={tile.pixmap.width()}x{tile.pixmap.height()}")
+            _debug_print(f"截屏耗时: {capture.grab_ms:.1f}ms ({len(capture.tiles)} 个屏幕)")
+
+            bounds = capture.bounds
+            min_x, min_y = bounds.x(), bounds.y()
+            max_x, max_y = bounds.x() + bounds.width(), bounds.y() + bounds.height()
+            total_width = bounds.width()
+            total_height = bounds.height()
             _debug_print(f"虚拟桌面: size={total_width}x{total_height} offset=({min_x},{min_y})")
 
-            if len(captures) == 1:
+            if len(capture.tiles) == 1:
                 _debug_print("只有一个显示器 -> 直接返回")
+                tile = capture.tiles[0]
                 self.virtual_desktop_offset_x = 0
                 self.virtual_desktop_offset_y = 0
-                self.virtual_desktop_width = captures[0]['w']
-                self.virtual_desktop_height = captures[0]['h']
+                self.virtual_desktop_width = tile.geometry.width()
+                self.virtual_desktop_height = tile.geometry.height()
                 self.virtual_desktop_min_x = 0
                 self.virtual_desktop_min_y = 0
-                self.virtual_desktop_max_x = captures[0]['w']
-                self.virtual_desktop_max_y = captures[0]['h']
-                return captures[0]['pixmap']
-
-            combined = QPixmap(total_width, total_height)
-            combined.fill(Qt.black)
-            painter = QPainter(combined)
-            for i, cap in enumerate(captures):
-                rx = cap['x'] - min_x
-                ry = cap['y'] - min_y
-                painter.drawPixmap(rx, ry, cap['pixmap'])
-                _debug_print(f"合成: Screen{i+1} -> ({rx},{ry}) size={cap['w']}x{cap['h']}")
-            painter.end()
+                self.virtual_desktop_max_x = tile.geometry.width()
+                self.virtual_desktop_max_y = tile.geometry.height()
+                return capture.compose()
+
+            # 合成结果本身带透明通道，screen_shot 可直接使用，无需再复制一份
+            combined = capture.compose()
+            capture.release()
 
             # 保存位置信息
             self.virtual_desktop_offset_x = min_x
@@ -1609,8 +1691,9 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             self.virtual_desktop_max_y = primary.height()
             return primary
 
-    def screen_shot(self, pix=None,mode = "screenshot"):
-        """mode: screenshot、set_area、getpix。screenshot普通截屏;非截屏模式: set_area用于设置区域、getpix提取区域"""
+    def screen_shot(self, pix=None,mode = "screenshot", capture=None):
+        """mode: screenshot、set_area、getpix。screenshot普通截屏;非截屏模式: set_area用于设置区域、getpix提取区域
+        capture: 低延迟模式下预先截好的 DesktopCapture，传入时不再重新截屏"""
         # 截屏函数,功能有二:当有传入pix时直接显示pix中的图片作为截屏背景,否则截取当前屏幕作为背景;前者用于重置所有修改
         # if PLATFORM_SYS=="darwin":
         self.sshoting = True
@@ -1634,19 +1717,24 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             self.setMaximumSize(16777215, 16777215)  # Qt最大尺寸
             
             # 修改：现在截取所有显示器而不是单个显示器
-            get_pix = self.capture_all_screens()
+            get_pix = self.capture_all_screens(capture)
             # get_pix.setDevicePixelRatio(pixRat)  # 注释掉这行，避免DPI缩放
             
-        pixmap = QPixmap(get_pix.width(), get_pix.height())
-        # pixmap.setDevicePixelRatio(pixRat)  # 注释掉这行，避免DPI缩放
-        pixmap.fill(Qt.transparent)  # 填充透明色,不然没有透明通道
+        if get_pix.hasAlphaChannel() and get_pix.devicePixelRatio() == 1:
+            # 多屏合成结果已带透明通道，直接使用，避免再分配一整张虚拟桌面
+            pixmap = get_pix
+        else:
+            pixmap = QPixmap(get_pix.width(), get_pix.height())
+            # pixmap.setDevicePixelRatio(pixRat)  # 注释掉这行，避免DPI缩放
+            pixmap.fill(Qt.transparent)  # 填充透明色,不然没有透明通道
 
-        painter = QPainter(pixmap)
-        # painter.setRenderHint(QPainter.Antialiasing)
-        painter.drawPixmap(0, 0, get_pix)
-        painter.end()  # 一定要end
+            painter = QPainter(pixmap)
+            # painter.setRenderHint(QPainter.Antialiasing)
+            painter.drawPixmap(0, 0, get_pix)
+            painter.end()  # 一定要end
         self.originalPix = pixmap.copy()
         self.vector_document = None
+        self._crop_conversion_cache = None
         self._ensure_vector_document()
         
         # 关键修复3: 确保QLabel图像显示属性正确，避免DPI缩放和自动缩放
@@ -1775,6 +1863,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         # self.init_ss_thread_fun(get_pix)  # 注释掉自动初始化
         self._screenshot_pix = get_pix  # 保存截图数据，用于延迟初始化
         self._smart_selection_initialized = False  # 标记智能选区是否已初始化
+        self.region_finder.clear_setup()
         
         self.paintlayer.pixpng = QPixmap(":/msk.jpg")
         self.text_box.setTextColor(self.pencolor)
@@ -1814,7 +1903,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                 
                 try:
                     # 立即计算智能选区
-                    self.x0, self.y0, self.x1, self.y1 = self.finder.find_targetrect((self.mouse_posx, self.mouse_posy))
+                    self.x0, self.y0, self.x1, self.y1 = self._find_smart_rect(self.mouse_posx, self.mouse_posy)
                     print(f"🔍 [智能选区] 截图窗口打开时立即计算选区: 鼠标位置({self.mouse_posx}, {self.mouse_posy}) -> 选区({self.x0}, {self.y0}, {self.x1}, {self.y1})")
                     self.setCursor(QCursor(QPixmap(":/smartcursor.png").scaled(32, 32, Qt.KeepAspectRatio), 16, 16))
                     self.update()  # 更新显示
@@ -1834,7 +1923,20 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         self.qimg = get_pix.toImage()
         # 使用 Windows API 枚举窗口，不需要图片数据
         self.finder.find_contours_setup()
+        # 可选：在后台线程从截图画面检测界面元素，完成后悬停可选中窗口内的面板/按钮等
+        if self.settings.value("screenshot/smart_image_regions", False, type=bool):
+            ratio = get_pix.devicePixelRatio() or 1.0
+            self.region_finder.start(self.qimg, logical_width=int(round(get_pix.width() / ratio)))
         QApplication.processEvents()
+
+    def _find_smart_rect(self, x, y):
+        """智能选区查找：窗口矩形内若已检测到更精细的界面元素则优先使用"""
+        rect = self.finder.find_targetrect((x, y))
+        if self.region_finder.ready:
+            element = self.region_finder.find_targetrect((x, y), within=rect)
+            if element is not None:
+                return element
+        return rect
     
     def _lazy_init_smart_selection(self):
         """延迟初始化智能选区，避免启动时卡顿"""
@@ -1857,7 +1959,8 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         if not doc:
             return None
         try:
-            return doc.export_state()
+            # 增量快照：只记录相对上一步新增的命令，命令对象在各步之间共享
+            return doc.snapshot()
         except Exception as e:
             print(f"⚠️ 撤销系统: 导出矢量状态失败 {e}")
             return None
@@ -2032,18 +2135,26 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
             self.backup_pic_list = self.backup_pic_list[:self.backup_ssid + 1]
             print(f"撤销系统: 清除后列表长度:{len(self.backup_pic_list)}")
         
-        # 限制历史记录长度为50步
-        while len(self.backup_pic_list) >= 50:
-            self.backup_pic_list.pop(0)
-            if self.backup_ssid > 0:
-                self.backup_ssid -= 1
-            print(f"撤销系统: 达到最大长度(50步)，移除最旧记录，当前位置调整为:{self.backup_ssid}")
-            
         snapshot = self._capture_backup_snapshot()
         if snapshot is None:
             print("⚠️ 撤销系统: 快照创建失败，跳过备份")
             return
 
+        # 限制历史记录：最多50步，且丢弃旧步骤后历史实际占用的内存不超过预算
+        budget = QSettings('Fandes', 'jietuba').value('paint/undo_budget_mb', 32, type=int) * 1024 * 1024
+        entries = self.backup_pic_list + [snapshot]
+        footprint = history_footprint(
+            [e.get("vector") if isinstance(e, dict) else None for e in entries],
+            getattr(self, 'vector_document', None),
+        )
+        drop = max(0, len(self.backup_pic_list) - 49)
+        while drop < len(self.backup_pic_list) - 1 and footprint[drop] > budget:
+            drop += 1
+        if drop:
+            del self.backup_pic_list[:drop]
+            self.backup_ssid = max(0, self.backup_ssid - drop)
+            print(f"撤销系统: 达到历史上限(50步/{budget // (1024 * 1024)}MB)，移除最旧的{drop}条记录，当前位置调整为:{self.backup_ssid}")
+
         try:
             self.backup_pic_list.append(snapshot)
             self.backup_ssid = len(self.backup_pic_list) - 1
@@ -2518,6 +2629,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                 print(f"🧹 清理原始图片")
             self.originalPix = None
             self.vector_document = None
+            self._crop_conversion_cache = None
         
         # 3. 清理主窗口显示的图片（QLabel的pixmap）
         if self.pixmap() and not self.pixmap().isNull():
@@ -2605,6 +2717,10 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         """复制钉图窗口的图片（包含绘画内容）"""
         if hasattr(self, 'mode') and self.mode == "pinned" and hasattr(self, 'current_pinned_window'):
             try:
+                # 后台线程合成，完成后写入剪贴板
+                if hasattr(self.current_pinned_window, 'copy_merged_image_async'):
+                    self.current_pinned_window.copy_merged_image_async()
+                    return
                 # 使用钉图窗口的合并图像方法
                 if hasattr(self.current_pinned_window, '_create_merged_image'):
                     final_img = self.current_pinned_window._create_merged_image()
@@ -2828,6 +2944,16 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
         
         # 在钉图模式下，直接使用钉图窗口的内容
         if hasattr(self, 'mode') and self.mode == "pinned" and hasattr(self, 'current_pinned_window'):
+            if save_as == 1 and hasattr(self.current_pinned_window, 'layer_document'):
+                # 另存为：先选路径，合成与保存都在后台线程完成
+                path, l = QFileDialog.getSaveFileName(self, "保存为", QStandardPaths.writableLocation(
+                    QStandardPaths.PicturesLocation), "img Files (*.PNG *.jpg *.JPG *.JPEG *.BMP *.ICO)"
+                                                      ";;all files(*.*)")
+                if path:
+                    from jietuba_export import export_async
+                    print(f"钉图模式保存: {path}")
+                    export_async(self.current_pinned_window.layer_document.render_snapshot(), path=path)
+                return
             # 钉图模式：使用矢量系统获取完整内容（包括绘画层）
             if hasattr(self.current_pinned_window, 'layer_document'):
                 self.final_get_img = self.current_pinned_window.layer_document.render_composited()
@@ -2926,6 +3052,14 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                 if hasattr(self.parent, '_was_visible') and self.parent._was_visible:
                     self.parent.show()
         else:
+            # 记录本次截图区域（真实桌面坐标），供"前回範囲"快捷键直接截取
+            try:
+                from jietuba_capture import save_last_region
+                save_last_region(QRect(x0 + self.virtual_desktop_offset_x,
+                                       y0 + self.virtual_desktop_offset_y, w, h))
+            except Exception as e:
+                print(f"⚠️ 保存截图区域失败: {e}")
+
             # 异步处理保存和剪贴板，不阻塞UI
             if hasattr(self.parent, 'handle_screenshot_completion'):
                 self.parent.handle_screenshot_completion(self.final_get_img)
@@ -3899,7 +4033,7 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                     self._lazy_init_smart_selection()
                 
                 # 查找目标窗口矩形
-                self.x0, self.y0, self.x1, self.y1 = self.finder.find_targetrect((self.mouse_posx, self.mouse_posy))
+                self.x0, self.y0, self.x1, self.y1 = self._find_smart_rect(self.mouse_posx, self.mouse_posy)
                 self.setCursor(QCursor(QPixmap(":/smartcursor.png").scaled(32, 32, Qt.KeepAspectRatio), 16, 16))
                 # print(self.x0, self.y0, self.x1, self.y1 )
                 # print("findtime {}".format(time.process_time()-st))
@@ -4086,7 +4220,15 @@ class Slabel(ToolbarManager, QLabel):  # 区域截图功能
                             self.y0 = event.y() + self.by
                             self.y1 = self.y0 - dy
             # print("movetime{}".format(time.process_time()-st))
-            self.update()  # 更新界面
+            if 1 in self.painter_tools.values():
+                self.update()  # 更新界面
+            else:
+                # 选区/放大镜：只重绘新旧覆盖范围，不重绘整张虚拟桌面
+                dirty = self.mask.dirty_region()
+                if dirty is None:
+                    self.update()
+                else:
+                    self.update(dirty)
             
             # 如果是钉图模式，也需要更新钉图窗口
             if hasattr(self, 'mode') and self.mode == "pinned" and hasattr(self, 'current_pinned_window'):
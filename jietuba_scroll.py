@@ -8,6 +8,10 @@ jietuba_scroll.py - 滚动截图窗口模块
 - 监听鼠标滚轮事件自动触发截图
 - 实时显示已捕获的截图数量
 - 支持手动/自动截图控制
+- 帧存储带内存预算，超出部分换出到临时文件（jietuba_frame_store）
+- 可选录制会话，供离线重放与性能回归（jietuba_scroll_recording）
+- 自动滚动模式：按步长滚动并截图，画面不再变化时停止（jietuba_scroll_driver）
+- 会话日志：增量记录拼接条带，崩溃或误取消后可恢复（jietuba_scroll_journal）
 
 主要类:
 - ScrollCaptureWindow: 滚动截图窗口类
@@ -60,6 +64,10 @@ from jietuba_long_stitch_unified import (
     configure as long_stitch_configure,
     normalize_engine_value,
 )
+from jietuba_frame_store import FrameStore
+from jietuba_scroll_recording import ScrollSessionRecorder, snapshot_stitch_config
+from jietuba_scroll_driver import AutoScrollController, create_default_driver
+from jietuba_scroll_journal import ScrollSessionJournal, find_resumable_journal, prune_journals
 
 # 长截图调试日志控制
 _initial_settings = QSettings('Fandes', 'jietuba')
@@ -179,6 +187,7 @@ class FloatingToolbar(QWidget):
     
     # 信号定义
     direction_changed = pyqtSignal()
+    auto_scroll_clicked = pyqtSignal()
     manual_capture = pyqtSignal()
     finish_clicked = pyqtSignal()
     cancel_clicked = pyqtSignal()
@@ -264,6 +273,27 @@ class FloatingToolbar(QWidget):
         self.direction_btn.clicked.connect(self.direction_changed.emit)
         toolbar_layout.addWidget(self.direction_btn)
         
+        # 自动滚动按钮
+        self.auto_btn = QPushButton("自動")
+        self.auto_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #FF9800;
+                color: white;
+                border: none;
+                padding: 5px 10px;
+                font-size: 9pt;
+                border-radius: 3px;
+                font-weight: bold;
+                min-width: 50px;
+            }
+            QPushButton:hover {
+                background-color: #F57C00;
+            }
+        """)
+        self.auto_btn.setToolTip("自動スクロールでスクリーンショット")
+        self.auto_btn.clicked.connect(self.auto_scroll_clicked.emit)
+        toolbar_layout.addWidget(self.auto_btn)
+        
         # 提示文字标签
         self.tip_label = QLabel("上から下へゆっくりスクロール")
         self.tip_label.setStyleSheet("color: #FFD700; font-size: 8pt; font-weight: bold;")
@@ -350,9 +380,19 @@ class FloatingToolbar(QWidget):
         self.manual_capture.emit()
         QTimer.singleShot(200, lambda: self.count_label.setStyleSheet(original_style))
         
-    def update_count(self, count):
-        """更新截图计数"""
-        self.count_label.setText(f"スクショ: {count} 枚")
+    def update_count(self, count, resumed=0):
+        """更新截图计数
+
+        Args:
+            count: 本次会话新截取的张数
+            resumed: 从会话日志恢复的条带数
+        """
+        if not resumed:
+            self.count_label.setText(f"スクショ: {count} 枚")
+        elif count:
+            self.count_label.setText(f"復元 {resumed} 区間 + スクショ: {count} 枚")
+        else:
+            self.count_label.setText(f"復元 {resumed} 区間")
         
     def update_direction(self, direction):
         """更新方向显示"""
@@ -363,6 +403,11 @@ class FloatingToolbar(QWidget):
             self.direction_btn.setText("↕️ 縦")
             self.tip_label.setText(" 上から下へゆっくりスクロール")
     
+    def update_auto_scroll(self, running):
+        """更新自动滚动按钮状态"""
+        self.auto_btn.setText("停止" if running else "自動")
+        self.direction_btn.setEnabled(not running)
+    
     def mousePressEvent(self, event):
         """鼠标按下事件 - 开始拖动或调整大小"""
         if event.button() == Qt.LeftButton:
@@ -527,8 +572,16 @@ class ScrollCaptureWindow(QWidget):
         super().__init__(parent)
         
         self.capture_rect = capture_rect
-        self.screenshots = []  # 存储截图的列表
+        settings = QSettings('Fandes', 'jietuba')
+        # 存储截图的帧存储（超出内存预算的旧帧换出到临时文件，按需换入）
+        self.screenshots = FrameStore(
+            ram_budget_bytes=settings.value('screenshot/frame_store_ram_mb', 256, type=int) * 1024 * 1024,
+            spill_mode=settings.value('screenshot/frame_store_spill_mode', FrameStore.SPILL_RAW, type=str),
+        )
         self.scroll_distances = []  # 存储每次滚动的距离（像素）
+        # 从会话日志恢复时，条带已并入 stitched_result，不放入 screenshots
+        self.resumed_frames = 0  # 恢复前会话已采纳的帧数（决定首帧/横向旋转判断）
+        self.resumed_strips = 0  # 恢复的条带数（工具栏显示）
         self.current_scroll_distance = 0  # 当前累积的滚动距离
         
         # 🆕 截图方向: "vertical"(竖向) 或 "horizontal"(横向)
@@ -554,7 +607,6 @@ class ScrollCaptureWindow(QWidget):
         # 滚动检测相关
         self.last_scroll_time = 0  # 最后一次滚动的时间戳
         # 从配置读取滚动冷却时间
-        settings = QSettings('Fandes', 'jietuba')
         self.scroll_cooldown = settings.value('screenshot/scroll_cooldown', 0.15, type=float)
         self.capture_mode = "immediate"  # 截图模式: "immediate"立即 或 "wait"等待停止
         
@@ -562,6 +614,39 @@ class ScrollCaptureWindow(QWidget):
         self.last_screenshot_hash = None  # 上一张截图的哈希值（用于去重）
         self.duplicate_threshold = 0.95  # 相似度阈值（95%以上认为重复）
         
+        # 🆕 会话录制（用于离线重放/回归，默认关闭）
+        self.session_recorder = None
+        if settings.value('screenshot/long_stitch_record', False, type=bool):
+            try:
+                self.session_recorder = ScrollSessionRecorder.create(
+                    settings.value('screenshot/long_stitch_record_dir', '', type=str) or None,
+                    direction=self.scroll_direction,
+                    engine_config=snapshot_stitch_config(),
+                    capture_rect=capture_rect.getRect(),
+                )
+                print(f"📼 长截图会话录制已开启: {self.session_recorder.path}")
+            except Exception as e:
+                print(f"⚠️ 创建会话录制失败: {e}", force=True)
+                self.session_recorder = None
+        
+        # 🆕 会话日志（增量写入拼接条带，崩溃/误取消后可恢复）
+        # 默认关闭：每帧都要逐行比较拼接结果并编码写入 PNG，且在主线程进行
+        self.session_journal = None
+        self.journal_enabled = settings.value('screenshot/long_stitch_journal', False, type=bool)
+        
+        # 🆕 滚动驱动与自动滚动（驱动负责发送滚轮，控制器负责 滚动→截图→停止判断 循环）
+        try:
+            self.scroll_driver = create_default_driver(
+                settings.value('screenshot/auto_scroll_notch_px', 100, type=int)
+            )
+        except RuntimeError as e:
+            print(f"⚠️ 滚动驱动不可用，自动滚动/横向滚动已禁用: {e}")
+            self.scroll_driver = None
+        self.auto_scroll_controller = None
+        self.auto_scroll_interval = settings.value('screenshot/auto_scroll_interval', 0.4, type=float)
+        self.auto_scroll_timer = QTimer(self)
+        self.auto_scroll_timer.timeout.connect(self._auto_scroll_tick)
+        
         # 定时器
         self.capture_timer = QTimer(self)  # 截图定时器
         self.capture_timer.setSingleShot(True)
@@ -584,12 +669,112 @@ class ScrollCaptureWindow(QWidget):
         # 创建实时拼接预览面板
         self._setup_preview_panel()
         
+        # 🆕 检查可恢复的会话并开启会话日志
+        if self.journal_enabled:
+            self._setup_session_journal()
+        
         # 添加强制窗口定位修复定时器（作为最后的保险）
         self._position_fix_timer = QTimer()
         self._position_fix_timer.setSingleShot(True)
         self._position_fix_timer.timeout.connect(self._force_fix_window_position)
         self._position_fix_timer.start(200)  # 200ms后再次检查并修复
     
+    def _setup_session_journal(self):
+        """开启会话日志；若存在上次未完成的会话，询问是否恢复继续"""
+        try:
+            prune_journals()
+            recovered = find_resumable_journal(
+                width=self.capture_rect.width(),
+                height=self.capture_rect.height(),
+            )
+            if recovered is not None:
+                from PyQt5.QtWidgets import QMessageBox
+                answer = QMessageBox.question(
+                    None,
+                    "長スクショの復元",
+                    f"前回の長スクリーンショット（{recovered.frame_count} 枚）が残っています。\n"
+                    "復元して続けますか？",
+                    QMessageBox.Yes | QMessageBox.No,
+                    QMessageBox.Yes,
+                )
+                if answer == QMessageBox.Yes and self._resume_from_journal(recovered):
+                    return
+                recovered.discard()
+            self.session_journal = ScrollSessionJournal.create(
+                capture_rect=self.capture_rect.getRect(),
+                direction=self.scroll_direction,
+                engine_config=snapshot_stitch_config(),
+            )
+            print(f"📒 长截图会话日志: {self.session_journal.directory}")
+        except Exception as e:
+            print(f"⚠️ 开启会话日志失败: {e}", force=True)
+            self.session_journal = None
+    
+    def _resume_from_journal(self, recovered):
+        """按日志中的切割点重建拼接结果，并在同一日志目录中继续记录
+        
+        Returns:
+            bool: 是否恢复成功
+        """
+        try:
+            result = recovered.rebuild()
+            if result is None:
+                return False
+            self.resumed_frames = max(1, recovered.frame_count)
+            self.resumed_strips = len(recovered.entries)
+            self.stitched_result = result
+            # 特征匹配的索引无法恢复，续拼改用哈希匹配
+            self.session_engine = "hash_rust" if recovered.engine in (None, "rust") else recovered.engine
+            if recovered.direction != self.scroll_direction:
+                self.scroll_direction = recovered.direction
+                self.toolbar.update_direction(self.scroll_direction)
+                if self.scroll_direction == "horizontal":
+                    self._start_keyboard_listener()
+            self.session_journal = ScrollSessionJournal(
+                recovered.directory,
+                capture_rect=self.capture_rect.getRect(),
+                direction=self.scroll_direction,
+                engine_config=snapshot_stitch_config(),
+            )
+            self.session_journal.seed(result, recovered.next_seq)
+            self._update_toolbar_count()
+            self._refresh_preview_panel()
+            print(f"♻️ 已从日志恢复长截图: {self.resumed_strips} 个条带（{self.resumed_frames} 帧），结果尺寸 {result.size[0]}x{result.size[1]}", force=True)
+            return True
+        except Exception as e:
+            print(f"❌ 从日志恢复失败: {e}", force=True)
+            self.resumed_frames = 0
+            self.resumed_strips = 0
+            self.stitched_result = None
+            self.session_engine = None
+            return False
+    
+    def _journal_stitched_result(self, frame_height):
+        """拼接成功后把新增条带写入会话日志"""
+        if self.session_journal is None or self.stitched_result is None:
+            return
+        try:
+            self.session_journal.record_result(
+                self.stitched_result,
+                frame_height,
+                direction=self.scroll_direction,
+                engine=self.session_engine,
+                frame_count=self._frame_total(),
+            )
+        except Exception as e:
+            print(f"⚠️ 写入会话日志失败，已停止记录: {e}", force=True)
+            self.session_journal.close()
+            self.session_journal = None
+
+    def _frame_total(self):
+        """已采纳的总帧数（含从会话日志恢复的帧）"""
+        return self.resumed_frames + len(self.screenshots)
+
+    def _update_toolbar_count(self):
+        """刷新工具栏计数（恢复的会话显示条带数，而非帧数）"""
+        if hasattr(self, 'toolbar') and self.toolbar:
+            self.toolbar.update_count(len(self.screenshots), self.resumed_strips)
+    
     def _get_correct_window_position(self, border_width):
         """获取正确的窗口位置，修复多显示器环境下的定位问题"""
         try:
@@ -727,6 +912,7 @@ class ScrollCaptureWindow(QWidget):
         
         # 连接工具栏信号
         self.toolbar.direction_changed.connect(self._toggle_direction)
+        self.toolbar.auto_scroll_clicked.connect(self._toggle_auto_scroll)
         self.toolbar.manual_capture.connect(self._on_manual_capture)
         self.toolbar.finish_clicked.connect(self._on_finish)
         self.toolbar.cancel_clicked.connect(self._on_cancel)
@@ -791,7 +977,7 @@ class ScrollCaptureWindow(QWidget):
         """将最新拼接结果渲染到预览面板"""
         if not hasattr(self, 'preview_panel') or self.preview_panel is None:
             return
-        screenshot_count = len(self.screenshots)
+        screenshot_count = self._frame_total()
         display_image = None
         if self.stitched_result is not None:
             display_image = self.stitched_result
@@ -822,8 +1008,7 @@ class ScrollCaptureWindow(QWidget):
         print(f"🛑 {message}")
         if self.screenshots:
             self.screenshots.pop()
-        if hasattr(self, 'toolbar') and self.toolbar:
-            self.toolbar.update_count(len(self.screenshots))
+        self._update_toolbar_count()
         self.current_scroll_distance = 0
         self._show_preview_warning(message)
 
@@ -836,8 +1021,7 @@ class ScrollCaptureWindow(QWidget):
                 self.screenshots.pop()
             except Exception:
                 pass
-        if hasattr(self, 'toolbar') and self.toolbar:
-            self.toolbar.update_count(len(self.screenshots))
+        self._update_toolbar_count()
         self._show_preview_warning(message)
         
     def _setup_mouse_hook(self):
@@ -913,6 +1097,10 @@ class ScrollCaptureWindow(QWidget):
         # 重新配置拼接引擎
         self._reconfigure_stitch_engine()
         self._refresh_preview_panel()
+        if self.session_recorder is not None:
+            self.session_recorder.set_direction(self.scroll_direction, snapshot_stitch_config())
+        if self.session_journal is not None:
+            self.session_journal.set_direction(self.scroll_direction)
         
         # 🆕 切换键盘监听器状态
         if self.scroll_direction == "horizontal":
@@ -922,20 +1110,11 @@ class ScrollCaptureWindow(QWidget):
     
     def _send_horizontal_scroll(self):
         """发送横向滚动指令（向右滚动）"""
+        if self.scroll_driver is None:
+            return
         try:
-            import win32api
-            import win32con
-            
-            # 使用Windows API发送横向滚动事件
-            # MOUSEEVENTF_HWHEEL: 横向滚动事件
-            # amount * 120: WHEEL_DELTA标准值
             amount = 1  # 向右滚动
-            win32api.mouse_event(
-                win32con.MOUSEEVENTF_HWHEEL,
-                0, 0,
-                amount * 120,  # WHEEL_DELTA
-                0
-            )
+            self.scroll_driver.scroll(amount, horizontal=True)
             print(f"✅ 发送横向滚动指令: 向右滚动 {amount} 格")
             
         except Exception as e:
@@ -999,6 +1178,82 @@ class ScrollCaptureWindow(QWidget):
             except Exception as e:
                 print(f"⚠️ 停止键盘监听器时出错: {e}")
     
+    def _toggle_auto_scroll(self):
+        """开始/停止自动滚动截图"""
+        if self.auto_scroll_controller is not None and self.auto_scroll_controller.running:
+            self._stop_auto_scroll("user")
+        else:
+            self._start_auto_scroll()
+    
+    def _start_auto_scroll(self):
+        """启动自动滚动：按计算出的步长滚动并截图，画面不再变化时自动停止"""
+        if self.scroll_driver is None:
+            print("⚠️ 当前平台没有可用的滚动驱动，无法自动滚动", force=True)
+            return
+        horizontal = self.scroll_direction == "horizontal"
+        viewport_length = self.capture_rect.width() if horizontal else self.capture_rect.height()
+        self.auto_scroll_controller = AutoScrollController(
+            self.scroll_driver,
+            self._grab_capture_image,
+            self._auto_scroll_consume,
+            viewport_length,
+            horizontal=horizontal,
+            skip_first_frame=self._frame_total() > 0,
+        )
+        try:
+            self.scroll_driver.prepare(self.capture_rect.getRect())
+        except Exception as e:
+            print(f"⚠️ 滚动驱动准备失败: {e}")
+        self.auto_scroll_controller.start()
+        self.toolbar.update_auto_scroll(True)
+        self.auto_scroll_timer.start(int(self.auto_scroll_interval * 1000))
+        print(f"🤖 自动滚动已启动（驱动: {self.scroll_driver.name}，间隔 {self.auto_scroll_interval}s）")
+        self._auto_scroll_tick()
+    
+    def _stop_auto_scroll(self, reason):
+        """停止自动滚动"""
+        self.auto_scroll_timer.stop()
+        controller = self.auto_scroll_controller
+        if controller is None:
+            return
+        controller.stop(reason)
+        self.auto_scroll_controller = None
+        try:
+            self.scroll_driver.release()
+        except Exception:
+            pass
+        if hasattr(self, 'toolbar') and self.toolbar:
+            self.toolbar.update_auto_scroll(False)
+        print(f"🤖 自动滚动已停止（原因: {controller.stop_reason}，新增 {controller.frames} 帧）", force=True)
+    
+    def _auto_scroll_tick(self):
+        """自动滚动定时回调"""
+        controller = self.auto_scroll_controller
+        if controller is None:
+            return
+        try:
+            if not controller.tick():
+                self._stop_auto_scroll(controller.stop_reason)
+        except Exception as e:
+            print(f"❌ 自动滚动出错: {e}", force=True)
+            self._stop_auto_scroll("error")
+    
+    def _stitched_length(self):
+        """当前拼接结果在拼接方向上的长度（横向只有1张时尚未旋转）"""
+        if self.stitched_result is None:
+            return 0
+        if self.scroll_direction == "horizontal" and self._frame_total() < 2:
+            return self.stitched_result.size[0]
+        return self.stitched_result.size[1]
+    
+    def _auto_scroll_consume(self, pil_image):
+        """自动滚动得到的新帧交给拼接流程，返回拼接结果的增长像素数"""
+        before = self._stitched_length()
+        self.current_scroll_distance += int(self.auto_scroll_controller.last_notches
+                                            * self.auto_scroll_controller.pixels_per_notch)
+        self._do_capture(pil_image)
+        return self._stitched_length() - before
+    
     def _reconfigure_stitch_engine(self):
         """重新配置拼接引擎方向"""
         try:
@@ -1194,6 +1449,10 @@ class ScrollCaptureWindow(QWidget):
         """
         import time
         
+        # 自动滚动期间由控制器负责截图（忽略自身发出的滚轮事件）
+        if self.auto_scroll_controller is not None:
+            return
+        
         # 累积滚动距离
         self.current_scroll_distance += scroll_distance
         
@@ -1262,48 +1521,50 @@ class ScrollCaptureWindow(QWidget):
         
         return similarity >= self.duplicate_threshold
     
-    def _do_capture(self):
-        """执行截图并实时拼接"""
+    def _grab_capture_image(self):
+        """截取 capture_rect 区域并返回 PIL RGB 图片（失败返回 None）"""
+        from jietuba_capture import grab_region
+        
+        # 只截取指定区域（精确使用原始capture_rect，不包含边框），
+        # 由区域所在的屏幕负责截取，副屏上的区域也能正确截到
+        pixmap = grab_region(self.capture_rect)
+        
+        if pixmap.isNull():
+            print("❌ 截图失败", force=True)
+            return None
+        
+        # 将QPixmap转换为PIL Image
+        qimage = pixmap.toImage()
+        buffer = qimage.bits().asstring(qimage.byteCount())
+        return Image.frombytes(
+            'RGBA',
+            (qimage.width(), qimage.height()),
+            buffer,
+            'raw',
+            'BGRA'
+        ).convert('RGB')
+    
+    def _do_capture(self, pil_image=None):
+        """执行截图并实时拼接
+        
+        Args:
+            pil_image: 已截取的图片（自动滚动时传入），为 None 时立即截图
+        """
         stitch_successful = True
         try:
             current_count = len(self.screenshots) + 1
             print(f"\n📸 截取第 {current_count} 张图片")
             print(f"   区域: x={self.capture_rect.x()}, y={self.capture_rect.y()}, w={self.capture_rect.width()}, h={self.capture_rect.height()}")
             
-            # 使用Qt截取屏幕
-            screen = QGuiApplication.primaryScreen()
-            if screen is None:
-                print("❌ 无法获取屏幕", force=True)
-                return
-            
-            # 截取指定区域（精确使用原始capture_rect，不包含边框）
-            pixmap = screen.grabWindow(
-                0,
-                self.capture_rect.x(),
-                self.capture_rect.y(),
-                self.capture_rect.width(),
-                self.capture_rect.height()
-            )
-            
-            if pixmap.isNull():
-                print("❌ 截图失败", force=True)
-                return
-            
-            # 将QPixmap转换为PIL Image
-            qimage = pixmap.toImage()
-            buffer = qimage.bits().asstring(qimage.byteCount())
-            pil_image = Image.frombytes(
-                'RGBA',
-                (qimage.width(), qimage.height()),
-                buffer,
-                'raw',
-                'BGRA'
-            ).convert('RGB')
+            if pil_image is None:
+                pil_image = self._grab_capture_image()
+                if pil_image is None:
+                    return
             
             # 🆕 横向模式：从第2张图片开始旋转90度（顺时针）以便使用竖向拼接算法
             # 第1张图片不旋转（如果只截1张就不需要拼接和旋转）
             # 第2张及以后的图片旋转后进行竖向拼接
-            is_first_image = len(self.screenshots) == 0
+            is_first_image = self._frame_total() == 0
             if self.scroll_direction == "horizontal" and not is_first_image:
                 print(f"🔄 横向模式：将图片顺时针旋转90度（第{len(self.screenshots)+1}张）")
                 pil_image = pil_image.rotate(-90, expand=True)  # -90度 = 顺时针90度
@@ -1316,6 +1577,7 @@ class ScrollCaptureWindow(QWidget):
             
             # 🆕 智能拼接策略：会话级别的引擎选择
             screenshot_count = len(self.screenshots)
+            stitch_start = time.perf_counter()
             
             try:
                 from jietuba_long_stitch_unified import stitch_images, get_active_engine
@@ -1393,6 +1655,7 @@ class ScrollCaptureWindow(QWidget):
                             try:
                                 temp_result = stitch_images([self.stitched_result, pil_image])
                             except AllOverlapShrinkError:
+                                self._record_session_frame(pil_image, False, stitch_start)
                                 self._handle_shrink_abort(current_count)
                                 return
                             if temp_result:
@@ -1419,7 +1682,7 @@ class ScrollCaptureWindow(QWidget):
                         print(f"🔗 增量拼接第 {screenshot_count} 张图片（哈希匹配）...")
                         
                         # 🆕 横向模式：如果是第2张图片，需要先将第1张图片也旋转
-                        if self.scroll_direction == "horizontal" and screenshot_count == 2:
+                        if self.scroll_direction == "horizontal" and self._frame_total() == 2:
                             print(f"🔄 横向模式：第2张图片拼接前，先将第1张图片也旋转90度")
                             print(f"   第1张原尺寸: {self.stitched_result.size[0]}x{self.stitched_result.size[1]}")
                             self.stitched_result = self.stitched_result.rotate(-90, expand=True)
@@ -1429,6 +1692,7 @@ class ScrollCaptureWindow(QWidget):
                         try:
                             result = stitch_images([self.stitched_result, pil_image])
                         except AllOverlapShrinkError:
+                            self._record_session_frame(pil_image, False, stitch_start)
                             self._handle_shrink_abort(current_count)
                             return
                         if result:
@@ -1451,18 +1715,22 @@ class ScrollCaptureWindow(QWidget):
                     self.stitched_result = pil_image
                     print("⚠️ 使用当前截图作为初始结果")
             
+            self._record_session_frame(pil_image, stitch_successful, stitch_start)
+            
             if stitch_successful:
                 # 记录滚动距离（第一张截图距离为0，后续为累积距离）
-                if len(self.screenshots) == 1:
+                if self._frame_total() == 1:
                     self.scroll_distances.append(0)
                 else:
                     self.scroll_distances.append(self.current_scroll_distance)
                     print(f"📏 记录滚动距离: {self.current_scroll_distance}px")
                 self.current_scroll_distance = 0
+                
+                # 记录新增条带（崩溃后可按切割点恢复）
+                self._journal_stitched_result(max(pil_image.size))
 
                 # 更新工具栏计数
-                if hasattr(self, 'toolbar') and self.toolbar:
-                    self.toolbar.update_count(len(self.screenshots))
+                self._update_toolbar_count()
 
                 print(f"✅ 第 {len(self.screenshots)} 张截图完成 (尺寸: {pil_image.size[0]}x{pil_image.size[1]})")
                 self._clear_preview_warning()
@@ -1477,6 +1745,35 @@ class ScrollCaptureWindow(QWidget):
             import traceback
             traceback.print_exc()
     
+    def _record_session_frame(self, pil_image, accepted, stitch_start):
+        """把送入拼接引擎的帧写入会话录制（未开启录制时不做任何事）"""
+        if self.session_recorder is None:
+            return
+        try:
+            self.session_recorder.record_frame(
+                pil_image,
+                scroll_distance=self.current_scroll_distance,
+                accepted=accepted,
+                stitch_ms=(time.perf_counter() - stitch_start) * 1000,
+                engine=self.session_engine,
+            )
+        except Exception as e:
+            print(f"⚠️ 录制帧失败: {e}")
+    
+    def _close_session_recorder(self, cancelled=False):
+        """结束会话录制并写入清单"""
+        if getattr(self, 'session_recorder', None) is None:
+            return
+        recorder = self.session_recorder
+        self.session_recorder = None
+        try:
+            result_size = self.stitched_result.size if self.stitched_result is not None else None
+            path = recorder.close(result_size=result_size, cancelled=cancelled)
+            if path:
+                print(f"📼 长截图会话录制已保存: {path}", force=True)
+        except Exception as e:
+            print(f"⚠️ 保存会话录制失败: {e}", force=True)
+    
     def paintEvent(self, event):
         """绘制窗口边框"""
         painter = QPainter(self)
@@ -1530,14 +1827,19 @@ class ScrollCaptureWindow(QWidget):
         # 如果只有1张图片，不需要旋转（第1张图片没有被旋转）
         if (self.scroll_direction == "horizontal" and 
             self.stitched_result is not None and 
-            len(self.screenshots) >= 2):
-            print(f"🔄 横向模式：将拼接结果逆时针旋转90度还原（共{len(self.screenshots)}张）")
+            self._frame_total() >= 2):
+            print(f"🔄 横向模式：将拼接结果逆时针旋转90度还原（共{self._frame_total()}张）")
             print(f"   旋转前尺寸: {self.stitched_result.size[0]}x{self.stitched_result.size[1]}")
             self.stitched_result = self.stitched_result.rotate(90, expand=True)  # 90度 = 逆时针90度
             print(f"   旋转后尺寸: {self.stitched_result.size[0]}x{self.stitched_result.size[1]}")
-        elif self.scroll_direction == "horizontal" and len(self.screenshots) == 1:
+        elif self.scroll_direction == "horizontal" and self._frame_total() == 1:
             print(f"📸 横向模式：只有1张图片，无需旋转")
         
+        # 正常完成，删除会话日志
+        if self.session_journal is not None:
+            self.session_journal.discard()
+            self.session_journal = None
+        
         self._cleanup()
         self.finished.emit()
         self.close()
@@ -1556,6 +1858,10 @@ class ScrollCaptureWindow(QWidget):
     def _on_cancel(self):
         """取消按钮点击"""
         print("❌ 取消长截图", force=True)
+        self._close_session_recorder(cancelled=True)
+        # 保留会话日志，下次开启长截图时可恢复
+        if self.session_journal is not None:
+            self.session_journal.mark("cancelled")
         self.screenshots.clear()
         self._cleanup()
         self.cancelled.emit()
@@ -1564,6 +1870,10 @@ class ScrollCaptureWindow(QWidget):
     def _cleanup(self):
         """清理资源"""
         try:
+            self._close_session_recorder()
+            if getattr(self, 'session_journal', None) is not None:
+                self.session_journal.close()
+                self.session_journal = None
             if self._original_cancel_on_shrink is not None:
                 from jietuba_long_stitch_unified import config as long_config
                 long_config.cancel_on_shrink = self._original_cancel_on_shrink
@@ -1596,6 +1906,10 @@ class ScrollCaptureWindow(QWidget):
                 finally:
                     self.preview_panel = None
 
+            # 停止自动滚动
+            if hasattr(self, 'auto_scroll_timer'):
+                self._stop_auto_scroll("cleanup")
+            
             # 停止所有定时器
             if hasattr(self, 'capture_timer'):
                 self.capture_timer.stop()
@@ -1614,6 +1928,12 @@ class ScrollCaptureWindow(QWidget):
             # 🆕 停止键盘监听器
             self._stop_keyboard_listener()
             
+            # 🧹 释放帧存储（删除换出的临时文件）
+            if hasattr(self, 'screenshots') and self.screenshots is not None:
+                if self.screenshots.spilled_count:
+                    print(f"🧹 帧存储: 清理 {self.screenshots.spilled_count} 张换出帧 ({self.screenshots.spilled_bytes / 1024 / 1024:.1f}MB)")
+                self.screenshots.close()
+            
         except Exception as e:
             print(f"⚠️ 清理资源时出错: {e}")
     
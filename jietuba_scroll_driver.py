@@ -0,0 +1,306 @@
+"""
+jietuba_scroll_driver.py - 长截图滚动驱动模块
+
+把"让页面滚动"和"自动滚动截图循环"从 ScrollCaptureWindow 中抽离出来,
+使自动长截图的整个循环可以在没有 Windows / 没有界面的环境下运行和测试。
+
+主要功能:
+- ScrollDriver 抽象基类 (abc): 按滚轮格数滚动页面
+- Win32ScrollDriver: 通过 win32api.mouse_event 发送真实滚轮事件
+- SimulatedScrollDriver: 在一张合成长页面图片上模拟滚动,同时充当截图源
+- AutoScrollController: 自动滚动截图循环 (按计算出的步长滚动 → 截图 →
+  画面不再变化时停止),步长根据实际拼接增长量自动校准
+
+使用方法:
+    driver = SimulatedScrollDriver(page_image, (400, 300))
+    controller = AutoScrollController(driver, driver.grab, on_frame, viewport_length=300)
+    controller.run()   # 无界面环境下直接跑完整个循环
+
+    # 在 Qt 界面中则由 QTimer 定时调用 controller.tick()
+"""
+
+import sys
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Optional, Tuple
+
+from PIL import Image
+
+
+WHEEL_DELTA = 120
+
+
+def frame_signature(image: Image.Image, size: int = 16) -> bytes:
+    """计算用于判断画面是否变化的缩略灰度签名"""
+    return image.convert("L").resize((size, size), Image.BILINEAR).tobytes()
+
+
+def frames_similar(sig1: Optional[bytes], sig2: Optional[bytes], tolerance: int = 2,
+                   threshold: float = 0.99) -> bool:
+    """比较两个签名，逐像素误差不超过 tolerance 的比例达到 threshold 即认为相同"""
+    if sig1 is None or sig2 is None or len(sig1) != len(sig2):
+        return False
+    same = sum(1 for a, b in zip(sig1, sig2) if abs(a - b) <= tolerance)
+    return same / len(sig1) >= threshold
+
+
+class ScrollDriver(ABC):
+    """滚动驱动接口
+
+    子类实现 scroll()：正数 notches 表示向下（竖向）或向右（横向）滚动。
+    pixels_per_notch 是每格滚轮大约滚动的像素数，仅作为自动滚动的初始估计。
+    """
+
+    name = "base"
+    pixels_per_notch = 100
+
+    @abstractmethod
+    def scroll(self, notches: int, horizontal: bool = False) -> None:
+        """滚动 notches 格滚轮"""
+
+    def prepare(self, rect: Optional[Tuple[int, int, int, int]] = None) -> None:
+        """自动滚动开始前调用（例如把光标移入截图区域）"""
+
+    def release(self) -> None:
+        """自动滚动结束后调用"""
+
+
+class Win32ScrollDriver(ScrollDriver):
+    """通过 win32api.mouse_event 发送滚轮事件（作用于光标下方的窗口）"""
+
+    name = "win32"
+
+    def __init__(self, pixels_per_notch: int = 100):
+        self.pixels_per_notch = pixels_per_notch
+        self._saved_cursor = None
+
+    def prepare(self, rect: Optional[Tuple[int, int, int, int]] = None) -> None:
+        if rect is None:
+            return
+        import win32api
+        x, y, w, h = rect
+        try:
+            self._saved_cursor = win32api.GetCursorPos()
+        except Exception:
+            self._saved_cursor = None
+        win32api.SetCursorPos((int(x + w // 2), int(y + h // 2)))
+
+    def release(self) -> None:
+        if self._saved_cursor is None:
+            return
+        try:
+            import win32api
+            win32api.SetCursorPos(self._saved_cursor)
+        except Exception:
+            pass
+        self._saved_cursor = None
+
+    def scroll(self, notches: int, horizontal: bool = False) -> None:
+        import win32api
+        import win32con
+        if horizontal:
+            # MOUSEEVENTF_HWHEEL: 正值向右
+            win32api.mouse_event(win32con.MOUSEEVENTF_HWHEEL, 0, 0, notches * WHEEL_DELTA, 0)
+        else:
+            # MOUSEEVENTF_WHEEL: 正值向上，向下滚动需取负
+            win32api.mouse_event(win32con.MOUSEEVENTF_WHEEL, 0, 0, -notches * WHEEL_DELTA, 0)
+
+
+class SimulatedScrollDriver(ScrollDriver):
+    """在合成长页面上模拟滚动的驱动，同时提供 grab() 作为截图源
+
+    到达页面末尾后继续滚动不会再改变画面，与真实网页的表现一致。
+    """
+
+    name = "simulated"
+
+    def __init__(self, page: Image.Image, viewport: Tuple[int, int], pixels_per_notch: int = 40):
+        """
+        Args:
+            page: 完整的长页面图片
+            viewport: 可视区域尺寸 (w, h)
+            pixels_per_notch: 每格滚轮实际滚动的像素数
+        """
+        self.page = page.convert("RGB")
+        self.viewport = (min(viewport[0], page.size[0]), min(viewport[1], page.size[1]))
+        self.pixels_per_notch = pixels_per_notch
+        self.offset_x = 0
+        self.offset_y = 0
+        self.scroll_calls = 0
+
+    @property
+    def max_offset(self) -> Tuple[int, int]:
+        return (self.page.size[0] - self.viewport[0], self.page.size[1] - self.viewport[1])
+
+    def scroll(self, notches: int, horizontal: bool = False) -> None:
+        self.scroll_calls += 1
+        delta = notches * self.pixels_per_notch
+        max_x, max_y = self.max_offset
+        if horizontal:
+            self.offset_x = max(0, min(max_x, self.offset_x + delta))
+        else:
+            self.offset_y = max(0, min(max_y, self.offset_y + delta))
+
+    def grab(self) -> Image.Image:
+        x, y = self.offset_x, self.offset_y
+        return self.page.crop((x, y, x + self.viewport[0], y + self.viewport[1]))
+
+
+class AutoScrollController:
+    """自动滚动截图循环
+
+    每次 tick()：截取一帧 → 与上一帧比较 → 画面有变化则交给 on_frame 拼接，
+    否则累计"静止"次数 → 未结束则按步长继续滚动。
+    调用方在两次 tick() 之间留出页面滚动/重绘的时间。
+
+    on_frame(image) 可返回本帧拼接后结果增长的像素数，
+    控制器据此校准每格滚轮的像素数，使步长保持在可视长度的 step_ratio 左右。
+    """
+
+    STATE_IDLE = "idle"
+    STATE_RUNNING = "running"
+    STATE_FINISHED = "finished"
+
+    def __init__(
+        self,
+        driver: ScrollDriver,
+        grab: Callable[[], Optional[Image.Image]],
+        on_frame: Callable[[Image.Image], Optional[int]],
+        viewport_length: int,
+        *,
+        horizontal: bool = False,
+        step_ratio: float = 0.6,
+        stop_after_still: int = 2,
+        max_frames: int = 200,
+        skip_first_frame: bool = False,
+    ):
+        """
+        Args:
+            driver: 滚动驱动
+            grab: 截图函数，返回 PIL 图片（失败返回 None）
+            on_frame: 处理新帧的回调，可返回拼接增长像素数
+            viewport_length: 滚动方向上的可视长度（像素）
+            horizontal: 是否横向滚动
+            step_ratio: 每步滚动距离占可视长度的比例（保留重叠供拼接匹配）
+            stop_after_still: 连续多少次画面不变后停止
+            max_frames: 最多截取的帧数
+            skip_first_frame: 首帧已由调用方截取时为 True（首帧只用作比较基准）
+        """
+        self.driver = driver
+        self.grab = grab
+        self.on_frame = on_frame
+        self.viewport_length = max(1, int(viewport_length))
+        self.horizontal = horizontal
+        self.step_ratio = step_ratio
+        self.stop_after_still = max(1, stop_after_still)
+        self.max_frames = max_frames
+        self.skip_first_frame = skip_first_frame
+
+        self.pixels_per_notch = float(max(1, driver.pixels_per_notch))
+        self.state = self.STATE_IDLE
+        self.frames = 0
+        self.still_count = 0
+        self.last_notches = 0
+        self.stop_reason = ""
+        self._last_signature: Optional[bytes] = None
+
+    @property
+    def running(self) -> bool:
+        return self.state == self.STATE_RUNNING
+
+    def compute_notches(self) -> int:
+        """根据当前每格像素估计计算下一步的滚轮格数"""
+        target = self.viewport_length * self.step_ratio
+        return max(1, int(target // self.pixels_per_notch))
+
+    def start(self) -> None:
+        self.state = self.STATE_RUNNING
+        self.frames = 0
+        self.still_count = 0
+        self.stop_reason = ""
+        self._last_signature = None
+
+    def stop(self, reason: str = "stopped") -> None:
+        if self.state == self.STATE_RUNNING:
+            self.state = self.STATE_FINISHED
+            self.stop_reason = reason
+
+    def tick(self) -> bool:
+        """执行一步：截图/比较/拼接/滚动
+
+        Returns:
+            True 表示循环仍在进行，False 表示已结束
+        """
+        if self.state == self.STATE_IDLE:
+            self.start()
+        if self.state != self.STATE_RUNNING:
+            return False
+
+        image = self.grab()
+        if image is None:
+            self.stop("grab_failed")
+            return False
+
+        signature = frame_signature(image)
+        if frames_similar(self._last_signature, signature):
+            self.still_count += 1
+            if self.still_count >= self.stop_after_still:
+                self.stop("content_unchanged")
+                return False
+        else:
+            self.still_count = 0
+            self._last_signature = signature
+            if self.frames == 0 and self.skip_first_frame:
+                self.frames = 1
+            else:
+                advance = self.on_frame(image)
+                self.frames += 1
+                self._calibrate(advance)
+            if self.frames >= self.max_frames:
+                self.stop("max_frames")
+                return False
+
+        self.last_notches = self.compute_notches()
+        self.driver.scroll(self.last_notches, horizontal=self.horizontal)
+        return True
+
+    def _calibrate(self, advance: Optional[int]) -> None:
+        """根据拼接增长量修正每格像素估计（指数平滑）"""
+        if not advance or advance <= 0 or self.last_notches <= 0:
+            return
+        measured = advance / float(self.last_notches)
+        self.pixels_per_notch = max(1.0, 0.5 * self.pixels_per_notch + 0.5 * measured)
+
+    def run(self, settle_seconds: float = 0.0) -> str:
+        """同步跑完整个循环（无界面/模拟驱动场景）
+
+        Returns:
+            结束原因
+        """
+        self.start()
+        while self.tick():
+            if settle_seconds > 0:
+                time.sleep(settle_seconds)
+        return self.stop_reason
+
+
+def create_default_driver(pixels_per_notch: int = 100) -> ScrollDriver:
+    """返回发送真实滚轮事件的驱动（目前只有 Windows 的 Win32ScrollDriver）
+
+    Raises:
+        RuntimeError: 非 Windows 平台（无界面/测试环境请直接使用 SimulatedScrollDriver）
+    """
+    if not sys.platform.startswith("win"):
+        raise RuntimeError(f"自动滚动只支持 Windows，当前平台: {sys.platform}")
+    return Win32ScrollDriver(pixels_per_notch=pixels_per_notch)
+
+
+__all__ = [
+    "ScrollDriver",
+    "Win32ScrollDriver",
+    "SimulatedScrollDriver",
+    "AutoScrollController",
+    "create_default_driver",
+    "frame_signature",
+    "frames_similar",
+]
@@ -0,0 +1,330 @@
+"""
+jietuba_scroll_journal.py - 长截图会话日志(可恢复)模块
+
+滚动长截图会话可能持续数分钟,程序崩溃或误按 Esc 取消都会丢失全部结果。
+本模块把会话的拼接进度增量写入磁盘,之后的新会话可以继续拼接,
+或者直接恢复出拼接结果,无需重新截图。
+
+记录方式(与拼接引擎无关):
+- 每次拼接成功后,比较拼接前后的结果图,找出公共前缀行数 keep
+- 只把新增的条带 new_result[keep:] 存为 PNG,并在 journal.jsonl 追加一行
+  {"seq", "keep", "strip", "height", "direction", "engine", ...}
+- 恢复时按顺序执行 result = result[:keep] + strip,只重放切割点,不做任何匹配
+
+开启方式:
+- 默认关闭(每帧在主线程比较并写盘),设置 QSettings 'screenshot/long_stitch_journal' 为 true 开启
+
+崩溃安全:
+- 条带先写临时文件再 os.replace,随后追加日志行并 fsync
+- 读取时忽略最后一行不完整的记录以及条带文件缺失的记录
+
+主要类/函数:
+- ScrollSessionJournal: 会话日志写入器
+- find_resumable_journal(): 查找最近一次可恢复的会话
+- RecoveredSession: 恢复出的会话(拼接结果/条带/方向/引擎)
+"""
+
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image
+
+
+JOURNAL_VERSION = 1
+_HEADER_NAME = "session.json"
+_LOG_NAME = "journal.jsonl"
+
+
+def default_journal_root() -> str:
+    """默认日志目录: ~/.jietuba/scroll_journal"""
+    return os.path.join(os.path.expanduser("~"), ".jietuba", "scroll_journal")
+
+
+def _row_bytes(image: Image.Image, top: int, bottom: int) -> bytes:
+    return image.crop((0, top, image.width, bottom)).tobytes()
+
+
+def common_prefix_rows(old: Optional[Image.Image], new: Image.Image, window: int) -> int:
+    """计算新旧拼接结果相同的前缀行数
+
+    拼接只会改动旧结果末尾附近的行，因此只在最后 window 行内逐行比较；
+    若窗口起点处已经不同（例如缩短回退），则从第 0 行重新比较。
+    宽度或模式不同（例如横向模式首次旋转）时返回 0，即整张结果作为条带保存。
+    """
+    if old is None or old.width != new.width or old.mode != new.mode:
+        return 0
+    limit = min(old.height, new.height)
+    start = max(0, limit - max(1, window))
+    if start > 0 and _row_bytes(old, start - 1, start) != _row_bytes(new, start - 1, start):
+        start = 0
+    for row in range(start, limit):
+        if _row_bytes(old, row, row + 1) != _row_bytes(new, row, row + 1):
+            return row
+    return limit
+
+
+class ScrollSessionJournal:
+    """长截图会话日志写入器"""
+
+    def __init__(self, directory: str, capture_rect=None, direction: str = "vertical",
+                 engine_config: Optional[Dict] = None):
+        """
+        Args:
+            directory: 本次会话的日志目录（不存在时创建）
+            capture_rect: 截图区域 (x, y, w, h)
+            direction: 截图方向
+            engine_config: 拼接引擎配置快照
+        """
+        self.directory = directory
+        os.makedirs(os.path.join(directory, "strips"), exist_ok=True)
+        self.seq = 0
+        self.height = 0
+        self._last_result: Optional[Image.Image] = None
+        header = {
+            "version": JOURNAL_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "capture_rect": list(capture_rect) if capture_rect else None,
+            "direction": direction,
+            "engine_config": dict(engine_config or {}),
+            "state": "active",
+        }
+        self._write_header(header)
+        self._log = open(os.path.join(directory, _LOG_NAME), "a", encoding="utf-8")
+
+    @classmethod
+    def create(cls, root: Optional[str] = None, **kwargs) -> "ScrollSessionJournal":
+        """在日志根目录下按时间戳新建会话目录"""
+        root = root or default_journal_root()
+        name = f"session_{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+        return cls(os.path.join(root, name), **kwargs)
+
+    def _write_header(self, header: Dict) -> None:
+        path = os.path.join(self.directory, _HEADER_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(header, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _update_header(self, **changes) -> None:
+        header = _read_json(os.path.join(self.directory, _HEADER_NAME)) or {}
+        header.update(changes)
+        self._write_header(header)
+
+    def seed(self, result: Optional[Image.Image], seq: int) -> None:
+        """从恢复的会话继续记录（之后的条带接在 result 之后）"""
+        self._last_result = result
+        self.seq = seq
+        self.height = result.height if result is not None else 0
+
+    def record_result(self, result: Image.Image, frame_height: int,
+                      direction: str = "vertical", engine: Optional[str] = None,
+                      frame_count: int = 0) -> Tuple[int, int]:
+        """记录一次成功拼接后的结果
+
+        Args:
+            result: 拼接后的完整结果
+            frame_height: 本帧高度（决定比较窗口）
+            direction: 当前截图方向
+            engine: 当前会话引擎
+            frame_count: 当前已采纳的帧数
+
+        Returns:
+            (keep, strip_height)
+        """
+        keep = common_prefix_rows(self._last_result, result, frame_height * 2)
+        strip = result.crop((0, keep, result.width, result.height))
+        name = f"strips/{self.seq:05d}.png"
+        path = os.path.join(self.directory, name)
+        tmp_path = path + ".tmp"
+        strip.save(tmp_path, "PNG", compress_level=1)
+        os.replace(tmp_path, path)
+        entry = {
+            "seq": self.seq,
+            "keep": keep,
+            "strip": name,
+            "height": result.height,
+            "width": result.width,
+            "direction": direction,
+            "engine": engine,
+            "frames": frame_count,
+            "timestamp": round(time.time(), 3),
+        }
+        self._log.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._log.flush()
+        os.fsync(self._log.fileno())
+        self.seq += 1
+        self.height = result.height
+        self._last_result = result
+        return keep, strip.height
+
+    def set_direction(self, direction: str) -> None:
+        self._update_header(direction=direction)
+
+    def mark(self, state: str) -> None:
+        """更新会话状态: active / cancelled / finished"""
+        self._update_header(state=state)
+
+    def close(self) -> None:
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._last_result = None
+
+    def discard(self) -> None:
+        """删除本次会话的日志（正常完成后调用）"""
+        self.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def _read_json(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def read_journal_entries(directory: str) -> List[Dict]:
+    """读取日志记录，忽略不完整的尾行和条带缺失的记录（之后的记录也一并丢弃）"""
+    entries: List[Dict] = []
+    try:
+        with open(os.path.join(directory, _LOG_NAME), "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except OSError:
+        return entries
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            break
+        if not os.path.exists(os.path.join(directory, entry.get("strip", ""))):
+            break
+        entries.append(entry)
+    return entries
+
+
+class RecoveredSession:
+    """从日志中恢复的长截图会话"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.header = _read_json(os.path.join(directory, _HEADER_NAME)) or {}
+        self.entries = read_journal_entries(directory)
+
+    @property
+    def valid(self) -> bool:
+        return self.header.get("version", 0) == JOURNAL_VERSION and bool(self.entries)
+
+    @property
+    def state(self) -> str:
+        return self.header.get("state", "active")
+
+    @property
+    def capture_rect(self) -> Optional[List[int]]:
+        return self.header.get("capture_rect")
+
+    @property
+    def direction(self) -> str:
+        if self.entries:
+            return self.entries[-1].get("direction", "vertical")
+        return self.header.get("direction", "vertical")
+
+    @property
+    def engine(self) -> Optional[str]:
+        return self.entries[-1].get("engine") if self.entries else None
+
+    @property
+    def frame_count(self) -> int:
+        return self.entries[-1].get("frames", len(self.entries)) if self.entries else 0
+
+    @property
+    def next_seq(self) -> int:
+        return self.entries[-1]["seq"] + 1 if self.entries else 0
+
+    def load_strip(self, entry: Dict) -> Image.Image:
+        with Image.open(os.path.join(self.directory, entry["strip"])) as image:
+            return image.convert("RGB")
+
+    def strips(self) -> List[Image.Image]:
+        return [self.load_strip(entry) for entry in self.entries]
+
+    def rebuild(self) -> Optional[Image.Image]:
+        """按切割点重放条带，重建拼接结果"""
+        result: Optional[Image.Image] = None
+        for entry in self.entries:
+            strip = self.load_strip(entry)
+            keep = int(entry.get("keep", 0))
+            if result is None or keep <= 0:
+                result = strip
+                continue
+            keep = min(keep, result.height)
+            merged = Image.new("RGB", (result.width, keep + strip.height))
+            merged.paste(result.crop((0, 0, result.width, keep)), (0, 0))
+            merged.paste(strip, (0, keep))
+            result = merged
+        return result
+
+    def discard(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def list_journals(root: Optional[str] = None) -> List[str]:
+    """按时间倒序列出日志目录"""
+    root = root or default_journal_root()
+    try:
+        names = [n for n in os.listdir(root) if n.startswith("session_")]
+    except OSError:
+        return []
+    return [os.path.join(root, n) for n in sorted(names, reverse=True)]
+
+
+def find_resumable_journal(root: Optional[str] = None,
+                           width: Optional[int] = None,
+                           height: Optional[int] = None) -> Optional[RecoveredSession]:
+    """查找最近一次未完成的会话
+
+    Args:
+        root: 日志根目录
+        width: 新会话截图区域宽度（竖向恢复要求宽度一致，不一致的会话会被跳过）
+        height: 新会话截图区域高度（横向恢复要求高度一致，不一致的会话会被跳过）
+    """
+    for directory in list_journals(root):
+        session = RecoveredSession(directory)
+        if not session.valid or session.state == "finished":
+            continue
+        rect = session.capture_rect
+        if rect:
+            if session.direction == "horizontal":
+                if height is not None and rect[3] != height:
+                    continue
+            elif width is not None and rect[2] != width:
+                continue
+        return session
+    return None
+
+
+def prune_journals(root: Optional[str] = None, keep: int = 3, max_age_days: float = 7.0) -> None:
+    """清理旧日志：只保留最近 keep 个，且删除超过 max_age_days 的会话"""
+    now = time.time()
+    for index, directory in enumerate(list_journals(root)):
+        try:
+            too_old = now - os.path.getmtime(directory) > max_age_days * 86400
+        except OSError:
+            continue
+        if index >= keep or too_old:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+__all__ = [
+    "ScrollSessionJournal",
+    "RecoveredSession",
+    "find_resumable_journal",
+    "prune_journals",
+    "common_prefix_rows",
+]
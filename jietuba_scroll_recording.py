@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+jietuba_scroll_recording.py - 长截图会话录制与离线重放模块
+
+把一次滚动长截图会话录制为紧凑的 .jtrec 文件,之后可以在没有界面的
+环境下用任意拼接引擎重放,用于复现拼接错误、对比引擎性能和积累回归语料。
+
+录制文件格式 (zip 容器):
+- manifest.json : 版本、拼接方向、引擎配置、每帧的滚动距离/时间戳/是否被采纳
+- frames/00000.png ... : 送入拼接引擎的帧 (横向模式下为旋转后的帧)
+
+主要类/函数:
+- ScrollSessionRecorder: 会话录制器,后台线程编码帧,不阻塞截图
+- ScrollRecording: 录制文件读取器,帧按需解码
+- replay_recording(): 用指定引擎重放录制,返回耗时统计与拼接结果
+
+命令行用法:
+    python jietuba_scroll_recording.py session.jtrec --engine hash_python
+    python jietuba_scroll_recording.py session.jtrec --engine hash_rust --output out.png
+"""
+
+import argparse
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import zipfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+
+RECORDING_VERSION = 1
+RECORDING_SUFFIX = ".jtrec"
+_MANIFEST_NAME = "manifest.json"
+
+
+def default_recording_dir() -> str:
+    """默认录制目录: ~/.jietuba/recordings"""
+    return os.path.join(os.path.expanduser("~"), ".jietuba", "recordings")
+
+
+def snapshot_stitch_config() -> Dict:
+    """导出当前长截图拼接配置（jietuba_long_stitch_unified.config）"""
+    from jietuba_long_stitch_unified import config
+    return {key: value for key, value in vars(config).items() if not key.startswith("_")}
+
+
+class ScrollSessionRecorder:
+    """长截图会话录制器
+
+    特性：
+    - record_frame() 只把帧放入队列，PNG 编码和写盘在后台线程完成
+    - close() 时写入 manifest.json，之前异常退出的录制没有 manifest，读取时会被拒绝
+    """
+
+    def __init__(self, path: str, direction: str = "vertical",
+                 engine_config: Optional[Dict] = None, capture_rect=None):
+        """
+        Args:
+            path: 录制文件路径（.jtrec）
+            direction: 截图方向 "vertical" / "horizontal"
+            engine_config: 拼接引擎配置快照
+            capture_rect: 截图区域 (x, y, w, h)
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED)
+        self._start_time = time.time()
+        self._manifest = {
+            "version": RECORDING_VERSION,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "direction": direction,
+            "engine_config": dict(engine_config or {}),
+            "capture_rect": list(capture_rect) if capture_rect else None,
+            "frames": [],
+            "events": [],
+        }
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._worker = threading.Thread(target=self._write_loop, daemon=True)
+        self._worker.start()
+
+    @classmethod
+    def create(cls, directory: Optional[str] = None, **kwargs) -> "ScrollSessionRecorder":
+        """在目录下按时间戳生成录制文件"""
+        directory = directory or default_recording_dir()
+        filename = f"scroll_{datetime.now():%Y%m%d_%H%M%S}{RECORDING_SUFFIX}"
+        return cls(os.path.join(directory, filename), **kwargs)
+
+    def _elapsed(self) -> float:
+        return round(time.time() - self._start_time, 4)
+
+    def record_frame(self, image: Image.Image, scroll_distance: int = 0,
+                     accepted: bool = True, stitch_ms: Optional[float] = None,
+                     engine: Optional[str] = None) -> None:
+        """记录一帧（送入拼接引擎的图片）
+
+        Args:
+            image: PIL 图片
+            scroll_distance: 与上一帧之间累积的滚动距离（像素）
+            accepted: 拼接是否采纳了该帧
+            stitch_ms: 本帧在线拼接耗时（毫秒）
+            engine: 本帧实际使用的引擎
+        """
+        if self._closed:
+            return
+        index = len(self._manifest["frames"])
+        name = f"frames/{index:05d}.png"
+        self._manifest["frames"].append({
+            "name": name,
+            "timestamp": self._elapsed(),
+            "scroll_distance": int(scroll_distance),
+            "accepted": bool(accepted),
+            "stitch_ms": None if stitch_ms is None else round(float(stitch_ms), 3),
+            "engine": engine,
+            "size": list(image.size),
+        })
+        self._queue.put((name, image))
+
+    def record_event(self, kind: str, **payload) -> None:
+        """记录会话事件（如方向切换、引擎切换）"""
+        if self._closed:
+            return
+        event = {"kind": kind, "timestamp": self._elapsed()}
+        event.update(payload)
+        self._manifest["events"].append(event)
+
+    def set_direction(self, direction: str, engine_config: Optional[Dict] = None) -> None:
+        """记录方向切换（在线拼接会在切换时重置，重放以最终方向为准）"""
+        self._manifest["direction"] = direction
+        if engine_config is not None:
+            self._manifest["engine_config"] = dict(engine_config)
+        self.record_event("direction", direction=direction, frame=len(self._manifest["frames"]))
+
+    def _write_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            name, image = item
+            try:
+                buffer = io.BytesIO()
+                image.save(buffer, "PNG", compress_level=1)
+                self._zip.writestr(name, buffer.getvalue())
+            except Exception as e:
+                print(f"⚠️ [录制] 写入帧 {name} 失败: {e}")
+
+    def close(self, result_size=None, cancelled: bool = False) -> Optional[str]:
+        """结束录制并写入 manifest
+
+        Returns:
+            录制文件路径；没有任何帧时删除文件并返回 None
+        """
+        if self._closed:
+            return self.path
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+        self._manifest["duration"] = self._elapsed()
+        self._manifest["cancelled"] = bool(cancelled)
+        self._manifest["result_size"] = list(result_size) if result_size else None
+        try:
+            self._zip.writestr(_MANIFEST_NAME, json.dumps(self._manifest, ensure_ascii=False, indent=1))
+        finally:
+            self._zip.close()
+        if not self._manifest["frames"]:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return None
+        return self.path
+
+
+class ScrollRecording:
+    """长截图录制文件读取器（帧按需解码）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._zip = zipfile.ZipFile(path, "r")
+        try:
+            self.manifest = json.loads(self._zip.read(_MANIFEST_NAME).decode("utf-8"))
+        except KeyError:
+            self._zip.close()
+            raise ValueError(f"录制文件不完整（缺少 {_MANIFEST_NAME}）: {path}")
+        if self.manifest.get("version", 0) > RECORDING_VERSION:
+            self._zip.close()
+            raise ValueError(f"不支持的录制文件版本: {self.manifest.get('version')}")
+
+    @property
+    def direction(self) -> str:
+        return self.manifest.get("direction", "vertical")
+
+    @property
+    def engine_config(self) -> Dict:
+        return dict(self.manifest.get("engine_config") or {})
+
+    @property
+    def frames(self) -> List[Dict]:
+        return self.manifest.get("frames", [])
+
+    @property
+    def scroll_distances(self) -> List[int]:
+        return [frame.get("scroll_distance", 0) for frame in self.frames]
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def load_frame(self, index: int) -> Image.Image:
+        name = self.frames[index]["name"]
+        image = Image.open(io.BytesIO(self._zip.read(name)))
+        image.load()
+        return image
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def replay_recording(recording: ScrollRecording, engine: Optional[str] = None,
+                     accepted_only: bool = False, verbose: bool = False) -> Dict:
+    """用指定引擎重放录制的会话（与 ScrollCaptureWindow 相同的增量拼接方式）
+
+    Args:
+        recording: ScrollRecording 实例
+        engine: 引擎名（None 表示使用录制时的引擎）
+        accepted_only: 只重放在线拼接时被采纳的帧
+        verbose: 是否输出拼接引擎的调试日志
+
+    Returns:
+        dict: engine / frames / failures / total_ms / per_frame_ms / result (PIL.Image 或 None)
+    """
+    from jietuba_long_stitch import AllOverlapShrinkError
+    from jietuba_long_stitch_unified import (
+        config, configure, get_active_engine, normalize_engine_value, stitch_images,
+    )
+
+    saved_config = dict(vars(config))
+    recorded = recording.engine_config
+    params = {key: recorded[key] for key in (
+        "direction", "ignore_right_pixels", "sample_rate", "min_sample_size",
+        "max_sample_size", "corner_threshold", "descriptor_patch_size",
+        "min_size_delta", "try_rollback", "distance_threshold", "ef_search",
+        "cancel_on_shrink",
+    ) if key in recorded}
+    engine_name = normalize_engine_value(engine or recorded.get("engine", "hash_python"))
+
+    per_frame_ms: List[Optional[float]] = []
+    failures: List[int] = []
+    result = None
+    rust_stitcher = None
+    start = time.perf_counter()
+    try:
+        configure(engine=engine_name, verbose=verbose, **params)
+        active = get_active_engine()
+        horizontal = recording.direction == "horizontal"
+        fed = 0
+        for index, frame in enumerate(recording.frames):
+            if accepted_only and not frame.get("accepted", True):
+                per_frame_ms.append(None)
+                continue
+            image = recording.load_frame(index)
+            t0 = time.perf_counter()
+            if active == "rust":
+                if rust_stitcher is None:
+                    from jietuba_long_stitch_rust import RustLongStitch
+                    rust_stitcher = RustLongStitch(
+                        direction=config.direction,
+                        sample_rate=config.sample_rate,
+                        min_sample_size=config.min_sample_size,
+                        max_sample_size=config.max_sample_size,
+                        corner_threshold=config.corner_threshold,
+                        descriptor_patch_size=config.descriptor_patch_size,
+                        min_size_delta=config.min_size_delta,
+                        try_rollback=config.try_rollback,
+                        distance_threshold=config.distance_threshold,
+                        ef_search=config.ef_search,
+                    )
+                overlap = rust_stitcher.add_image(image, direction=1, debug=verbose)
+                if fed > 0 and overlap is None:
+                    failures.append(index)
+            elif result is None:
+                result = image
+            else:
+                # 横向录制的第1帧未旋转，与在线拼接保持一致
+                if horizontal and fed == 1:
+                    result = result.rotate(-90, expand=True)
+                try:
+                    stitched = stitch_images([result, image])
+                except AllOverlapShrinkError:
+                    stitched = None
+                if stitched is None:
+                    failures.append(index)
+                else:
+                    result = stitched
+            per_frame_ms.append((time.perf_counter() - t0) * 1000)
+            fed += 1
+        if rust_stitcher is not None:
+            result = rust_stitcher.export()
+        if result is not None and horizontal and fed >= 2:
+            result = result.rotate(90, expand=True)
+    finally:
+        if rust_stitcher is not None:
+            rust_stitcher.clear()
+        for key, value in saved_config.items():
+            setattr(config, key, value)
+
+    timed = [ms for ms in per_frame_ms if ms is not None]
+    return {
+        "engine": active,
+        "frames": len(timed),
+        "failures": failures,
+        "total_ms": (time.perf_counter() - start) * 1000,
+        "stitch_ms": sum(timed),
+        "per_frame_ms": per_frame_ms,
+        "result": result,
+    }
+
+
+def _format_report(recording: ScrollRecording, report: Dict) -> str:
+    timed = [ms for ms in report["per_frame_ms"] if ms is not None]
+    lines = [
+        f"📼 录制: {recording.path}",
+        f"   方向: {recording.direction}, 帧数: {len(recording)}, 录制引擎: {recording.engine_config.get('engine')}",
+        f"🚀 重放引擎: {report['engine']}",
+        f"   送入帧数: {report['frames']}, 失败帧: {report['failures'] or '无'}",
+        f"   拼接总耗时: {report['stitch_ms']:.1f} ms (含解码 {report['total_ms']:.1f} ms)",
+    ]
+    if timed:
+        lines.append(f"   单帧耗时: 平均 {sum(timed) / len(timed):.1f} ms, 最大 {max(timed):.1f} ms")
+    recorded_ms = [f.get("stitch_ms") for f in recording.frames if f.get("stitch_ms") is not None]
+    if recorded_ms:
+        lines.append(f"   录制时在线拼接耗时: {sum(recorded_ms):.1f} ms")
+    result = report["result"]
+    if result is not None:
+        lines.append(f"   结果尺寸: {result.size[0]}x{result.size[1]}")
+        expected = recording.manifest.get("result_size")
+        if expected:
+            same = list(result.size) == list(expected)
+            lines.append(f"   录制时结果尺寸: {expected[0]}x{expected[1]} {'✅ 一致' if same else '⚠️ 不一致'}")
+    else:
+        lines.append("   结果: 无")
+    return "\n".join(lines)
+
+
+def main():
+    """
+    主函数 - 无界面重放录制文件
+    """
+    parser = argparse.ArgumentParser(
+        description="长截图录制重放工具 - 用任意拼接引擎离线重放 .jtrec 录制",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+示例用法:
+  python jietuba_scroll_recording.py session.jtrec
+  python jietuba_scroll_recording.py session.jtrec --engine hash_python --output out.png
+  python jietuba_scroll_recording.py a.jtrec b.jtrec --engine hash_rust --accepted-only
+        """,
+    )
+    parser.add_argument("recordings", nargs="+", help="录制文件路径 (.jtrec)")
+    parser.add_argument("--engine", help="拼接引擎 (hash_python / hash_rust / rust)，默认使用录制时的引擎")
+    parser.add_argument("--output", help="保存拼接结果 (多个录制时自动追加序号)")
+    parser.add_argument("--accepted-only", action="store_true", help="只重放在线拼接时被采纳的帧")
+    parser.add_argument("--verbose", action="store_true", help="输出拼接引擎调试日志")
+    args = parser.parse_args()
+
+    exit_code = 0
+    for i, path in enumerate(args.recordings):
+        try:
+            with ScrollRecording(path) as recording:
+                report = replay_recording(
+                    recording,
+                    engine=args.engine,
+                    accepted_only=args.accepted_only,
+                    verbose=args.verbose,
+                )
+                print(_format_report(recording, report))
+                if args.output and report["result"] is not None:
+                    output = args.output
+                    if len(args.recordings) > 1:
+                        root, ext = os.path.splitext(args.output)
+                        output = f"{root}_{i + 1}{ext or '.png'}"
+                    report["result"].save(output)
+                    print(f"💾 已保存: {output}")
+                if report["failures"]:
+                    exit_code = 2
+        except Exception as e:
+            print(f"❌ 重放失败 {path}: {e}")
+            exit_code = 1
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
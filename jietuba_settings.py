@@ -282,6 +282,24 @@ class SettingsDialog(QDialog):
         card1.layout.addLayout(row1)
         card1.layout.addWidget(HLine())
 
+        # 前回範囲ホットキー（全画面オーバーレイを出さずに前回の範囲を直接キャプチャ）
+        row_repeat = QHBoxLayout()
+        repeat_lbl = QLabel("前回範囲ホットキー")
+        repeat_lbl.setStyleSheet("background-color: transparent;")
+        repeat_lbl.setToolTip("前回と同じ範囲を選択画面なしで即座にキャプチャします。空欄で無効。")
+        self.repeat_hotkey_input = QLineEdit()
+        self.repeat_hotkey_input.setText(self.config_manager.get_repeat_region_hotkey())
+        self.repeat_hotkey_input.setPlaceholderText("例: ctrl+shift+r（空欄で無効）")
+        self.repeat_hotkey_input.setFixedWidth(200)
+        self.repeat_hotkey_input.setStyleSheet(self._get_input_style())
+
+        row_repeat.addWidget(repeat_lbl)
+        row_repeat.addStretch()
+        row_repeat.addWidget(self.repeat_hotkey_input)
+
+        card1.layout.addLayout(row_repeat)
+        card1.layout.addWidget(HLine())
+
         # 任务栏按钮
         self.taskbar_toggle = ToggleSwitch()
         row2 = self._create_toggle_row(
@@ -439,6 +457,18 @@ class SettingsDialog(QDialog):
         )
         
         card.layout.addLayout(row)
+
+        card.layout.addWidget(HLine())
+
+        self.smart_image_toggle = ToggleSwitch()
+        row_image = self._create_toggle_row(
+            "ウィンドウ内の要素も認識する",
+            "画面の画像からパネル・ボタン・画像などの領域を検出し、\n"
+            "ウィンドウ内の要素を選択できるようにします。",
+            self.config_manager.get_smart_image_regions(),
+            self.smart_image_toggle
+        )
+        card.layout.addLayout(row_image)
         layout.addWidget(card)
         
         # 图文说明区域（可以用 QLabel 贴图，这里用文字模拟）
@@ -788,6 +818,43 @@ class SettingsDialog(QDialog):
             self.pin_auto_toolbar_toggle
         )
         card.layout.addLayout(row_pin_toolbar)
+
+        card.layout.addWidget(HLine())
+
+        # 低延迟截图模式
+        self.low_latency_toggle = ToggleSwitch()
+        row_low_latency = self._create_toggle_row(
+            "低遅延キャプチャ",
+            "バックグラウンドで画面を定期的に取得し、ホットキー押下時にすぐ選択画面を表示します。\n"
+            "CPU 使用率が少し上がります。",
+            self.config_manager.get_low_latency_capture(),
+            self.low_latency_toggle
+        )
+        card.layout.addLayout(row_low_latency)
+
+        card.layout.addWidget(HLine())
+
+        # 笔迹简化
+        self.simplify_strokes_toggle = ToggleSwitch()
+        row_simplify = self._create_toggle_row(
+            "ペンの線を軽量化する",
+            "描き終えた線の余分な点を間引きます。見た目は変わらず、再描画と保存が速くなります。",
+            self.config_manager.get_simplify_strokes(),
+            self.simplify_strokes_toggle
+        )
+        card.layout.addLayout(row_simplify)
+
+        card.layout.addWidget(HLine())
+
+        # 笔迹平滑
+        self.smooth_strokes_toggle = ToggleSwitch()
+        row_smooth = self._create_toggle_row(
+            "ペンの線をなめらかにする",
+            "描き終えた線の手ぶれを補正し、曲線に整えます。",
+            self.config_manager.get_smooth_strokes(),
+            self.smooth_strokes_toggle
+        )
+        card.layout.addLayout(row_smooth)
         
         layout.addWidget(card)
         
@@ -918,6 +985,7 @@ class SettingsDialog(QDialog):
     def _reset_hotkey_page(self):
         """重置快捷键设置页面"""
         self.hotkey_input.setText("ctrl+shift+a")
+        self.repeat_hotkey_input.setText("")
         self.taskbar_toggle.setChecked(False)
     
     def _reset_long_screenshot_page(self):
@@ -930,6 +998,7 @@ class SettingsDialog(QDialog):
     def _reset_smart_selection_page(self):
         """重置智能选择页面"""
         self.smart_toggle.setChecked(False)
+        self.smart_image_toggle.setChecked(False)
     
     def _reset_screenshot_save_page(self):
         """重置截图保存设置页面"""
@@ -950,12 +1019,17 @@ class SettingsDialog(QDialog):
         """重置杂项设置页面"""
         self.show_main_window_toggle.setChecked(True)
         self.pin_auto_toolbar_toggle.setChecked(True)
+        self.low_latency_toggle.setChecked(False)
+        self.simplify_strokes_toggle.setChecked(True)
+        self.smooth_strokes_toggle.setChecked(False)
 
     def accept(self):
         """保存所有设置"""
         # 1. 基础设置
+        self.config_manager.set_repeat_region_hotkey(self.repeat_hotkey_input.text().strip())
         self.config_manager.set_taskbar_button(self.taskbar_toggle.isChecked())
         self.config_manager.set_smart_selection(self.smart_toggle.isChecked())
+        self.config_manager.set_smart_image_regions(self.smart_image_toggle.isChecked())
         self.config_manager.set_log_enabled(self.log_toggle.isChecked())
         
         # 2. 截图保存设置
@@ -978,6 +1052,9 @@ class SettingsDialog(QDialog):
         # 4. 杂项设置
         self.config_manager.set_show_main_window(self.show_main_window_toggle.isChecked())
         self.config_manager.set_pinned_auto_toolbar(self.pin_auto_toolbar_toggle.isChecked())
+        self.config_manager.set_low_latency_capture(self.low_latency_toggle.isChecked())
+        self.config_manager.set_simplify_strokes(self.simplify_strokes_toggle.isChecked())
+        self.config_manager.set_smooth_strokes(self.smooth_strokes_toggle.isChecked())
         
         # 5. 引擎和长截图参数
         self.config_manager.set_long_stitch_engine(self.engine_combo.currentData())
@@ -1010,10 +1087,14 @@ if __name__ == "__main__":
     class MockConfig:
         def __init__(self):
             self.settings = QSettings("TestApp", "Settings")
+        def get_repeat_region_hotkey(self): return ""
+        def set_repeat_region_hotkey(self, v): pass
         def get_taskbar_button(self): return False
         def set_taskbar_button(self, v): pass
         def get_smart_selection(self): return False
         def set_smart_selection(self, v): pass
+        def get_smart_image_regions(self): return False
+        def set_smart_image_regions(self, v): pass
         def get_log_enabled(self): return True
         def set_log_enabled(self, v): pass
         def get_log_dir(self): return os.path.expanduser("~")
@@ -1027,6 +1108,12 @@ if __name__ == "__main__":
         def get_screenshot_save_path(self): return os.path.join(os.path.expanduser("~"), "Desktop", "スクショ")
         def set_screenshot_save_path(self, v): pass
         def get_show_main_window(self): return True
+        def get_low_latency_capture(self): return False
+        def set_low_latency_capture(self, v): pass
+        def get_simplify_strokes(self): return True
+        def set_simplify_strokes(self, v): pass
+        def get_smooth_strokes(self): return False
+        def set_smooth_strokes(self, v): pass
         def set_show_main_window(self, v): pass
 
     app = QApplication(sys.argv)
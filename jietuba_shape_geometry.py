@@ -0,0 +1,205 @@
+"""
+jietuba_shape_geometry.py - 箭头/矩形/椭圆的几何路径模块
+
+原先箭头只实现在 PaintLayer._draw_optimized_arrow 中，文档重放与钉图绘制都要
+PaintLayer.__new__(PaintLayer) 借用该方法，每次重放每个箭头都重新计算轮廓。
+这里把形状几何独立出来，只依赖 QtGui:
+
+- build_shape(kind, start, end, width) 生成 ShapeGeometry（填充路径 + 描边路径 + 线宽）
+- ShapeGeometry.draw(painter, color) 绘制，外观与原实现一致
+- ShapeMemo 按目标尺寸缓存一条命令的几何（文档重放时每个形状只剩一次缓存路径绘制）
+
+使用方法:
+    from jietuba_shape_geometry import draw_shape
+    draw_shape(painter, "arrow", (10, 10), (200, 120), QColor("red"), 3)
+"""
+
+import math
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from PyQt5.QtCore import QPointF, QRectF, Qt
+from PyQt5.QtGui import QBrush, QColor, QPainter, QPainterPath, QPen
+
+SHAPE_KINDS = ("arrow", "rect", "circle")
+
+# 箭头长度小于该值时不绘制（与原实现一致）
+MIN_ARROW_LENGTH = 5
+
+
+class ShapeGeometry:
+    """一个形状的几何：箭头为填充路径（箭杆、箭头），矩形/椭圆为描边路径"""
+
+    __slots__ = ("kind", "fills", "outline", "pen_width")
+
+    def __init__(
+        self,
+        kind: str,
+        fills: Tuple[QPainterPath, ...] = (),
+        outline: Optional[QPainterPath] = None,
+        pen_width: float = 1.0,
+    ):
+        self.kind = kind
+        self.fills = fills
+        self.outline = outline
+        self.pen_width = pen_width
+
+    def draw(self, painter: QPainter, color: QColor) -> None:
+        if self.fills:
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(QBrush(color))
+            for path in self.fills:
+                painter.drawPath(path)
+            painter.setBrush(Qt.NoBrush)
+        if self.outline is not None:
+            pen = QPen(color)
+            pen.setWidthF(self.pen_width)
+            painter.setPen(pen)
+            painter.setBrush(Qt.NoBrush)
+            painter.drawPath(self.outline)
+
+
+def arrow_paths(
+    start: Sequence[float], end: Sequence[float], width: float
+) -> Optional[Tuple[QPainterPath, QPainterPath]]:
+    """箭头轮廓（尖细尾巴+渐变箭杆+后弯曲箭头），返回 (箭杆, 箭头)；过短时返回 None"""
+    dx = end[0] - start[0]
+    dy = end[1] - start[1]
+    length = math.sqrt(dx * dx + dy * dy)
+    if length < MIN_ARROW_LENGTH:
+        return None
+
+    # 单位向量和垂直向量
+    unit_x = dx / length
+    unit_y = dy / length
+    perp_x = -unit_y
+    perp_y = unit_x
+
+    # 箭头三角形参数
+    head_length = min(length * 0.25, max(20, width * 4.5))
+    head_width = max(width * 1.8, 7)  # 箭头要宽一些
+    neck_width = head_width * 0.85  # 颈部比箭头窄
+
+    # 箭杆结束点（箭头颈部位置）
+    neck_x = end[0] - head_length * unit_x
+    neck_y = end[1] - head_length * unit_y
+
+    # 尾巴非常尖细，最粗处在 70% 位置
+    tail_width = width * 0.15
+    mid_x = start[0] + dx * 0.7
+    mid_y = start[1] + dy * 0.7
+    mid_width = width * 0.9
+
+    shaft = QPainterPath()
+    shaft.moveTo(QPointF(start[0] + perp_x * tail_width / 2, start[1] + perp_y * tail_width / 2))
+    shaft.lineTo(QPointF(mid_x + perp_x * mid_width / 2, mid_y + perp_y * mid_width / 2))
+    shaft.lineTo(QPointF(neck_x + perp_x * neck_width / 2, neck_y + perp_y * neck_width / 2))
+    shaft.lineTo(QPointF(neck_x - perp_x * neck_width / 2, neck_y - perp_y * neck_width / 2))
+    shaft.lineTo(QPointF(mid_x - perp_x * mid_width / 2, mid_y - perp_y * mid_width / 2))
+    shaft.lineTo(QPointF(start[0] - perp_x * tail_width / 2, start[1] - perp_y * tail_width / 2))
+    shaft.closeSubpath()
+
+    # 箭头底边向后凹陷：二次贝塞尔曲线的控制点在颈部后方
+    notch_depth = head_length * 0.2
+    notch = QPointF(neck_x - unit_x * notch_depth, neck_y - unit_y * notch_depth)
+    tip = QPointF(end[0], end[1])
+
+    head = QPainterPath()
+    head.moveTo(tip)
+    head.lineTo(QPointF(neck_x + perp_x * head_width, neck_y + perp_y * head_width))
+    head.quadTo(notch, QPointF(neck_x - perp_x * head_width, neck_y - perp_y * head_width))
+    head.lineTo(tip)
+    head.closeSubpath()
+    return shaft, head
+
+
+def _bounding_rect(start: Sequence[float], end: Sequence[float]) -> QRectF:
+    return QRectF(
+        min(start[0], end[0]),
+        min(start[1], end[1]),
+        abs(start[0] - end[0]),
+        abs(start[1] - end[1]),
+    )
+
+
+def rect_path(start: Sequence[float], end: Sequence[float]) -> QPainterPath:
+    path = QPainterPath()
+    path.addRect(_bounding_rect(start, end))
+    return path
+
+
+def ellipse_path(start: Sequence[float], end: Sequence[float]) -> QPainterPath:
+    path = QPainterPath()
+    path.addEllipse(_bounding_rect(start, end))
+    return path
+
+
+def build_shape(
+    kind: str, start: Sequence[float], end: Sequence[float], width: float
+) -> Optional[ShapeGeometry]:
+    """按两个端点（像素坐标）与线宽生成形状几何；无需绘制时返回 None"""
+    if kind == "arrow":
+        paths = arrow_paths(start, end, width)
+        if paths is None:
+            return None
+        return ShapeGeometry(kind, fills=paths)
+    if kind == "rect":
+        return ShapeGeometry(kind, outline=rect_path(start, end), pen_width=width)
+    if kind == "circle":
+        return ShapeGeometry(kind, outline=ellipse_path(start, end), pen_width=width)
+    raise ValueError(f"未知的形状类型: {kind}")
+
+
+def draw_shape(
+    painter: QPainter,
+    kind: str,
+    start: Sequence[float],
+    end: Sequence[float],
+    color: QColor,
+    width: float,
+) -> None:
+    """实时绘制用：直接生成并绘制形状（不缓存）"""
+    geometry = build_shape(kind, start, end, width)
+    if geometry is not None:
+        geometry.draw(painter, color)
+
+
+class ShapeMemo:
+    """按目标尺寸缓存一条命令的几何；只保留最近几个尺寸（显示/缩放预览/导出）
+
+    QPainterPath 可重入但不是线程安全的（绘制时会懒填充内部缓存），
+    ShapeMemo 及其中的几何只能在 GUI 线程使用。
+    """
+
+    __slots__ = ("_entries",)
+
+    MAX_SIZES = 4
+
+    def __init__(self):
+        self._entries: Dict[Tuple[int, int], Optional[ShapeGeometry]] = {}
+
+    def get(
+        self, size: Tuple[int, int], factory: Callable[[], Optional[ShapeGeometry]]
+    ) -> Optional[ShapeGeometry]:
+        entries = self._entries
+        try:
+            return entries[size]
+        except KeyError:
+            pass
+        geometry = factory()
+        if len(entries) >= self.MAX_SIZES:
+            # 尺寸很少变化，超出时整体清空
+            entries.clear()
+        entries[size] = geometry
+        return geometry
+
+
+__all__ = [
+    "SHAPE_KINDS",
+    "ShapeGeometry",
+    "ShapeMemo",
+    "arrow_paths",
+    "rect_path",
+    "ellipse_path",
+    "build_shape",
+    "draw_shape",
+]
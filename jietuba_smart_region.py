@@ -0,0 +1,397 @@
+"""
+jietuba_smart_region.py - 基于图像的智能选区模块
+
+Finder 只能拿到 Win32 顶层窗口的矩形,本模块直接从截图画面中检测
+界面元素(面板、按钮、图片、文字块)的矩形,作为窗口级智能选区的补充。
+不依赖 Windows API,可以在任何平台上用合成截图测试。
+
+检测方法(全部为 numpy 向量化运算):
+- 灰度图相邻像素差超过阈值处记为边缘,建立边缘图的积分图
+- 递归 XY-cut: 区域内按行/列统计边缘数(积分图 O(1) 求和),
+  连续 min_gap 行/列没有边缘即为分隔带,按分隔带切成子区域
+- 每个子区域收缩到边缘的包围盒;四周是整条边缘线(边框/色块边界)
+  时剥掉边框后继续向内切分
+
+检测结果是一棵区域树: 同一节点的子区域沿切分方向互不重叠且有序,
+悬停查询时每层二分查找,开销为 O(深度 × log 子节点数)。
+
+主要类/函数:
+- qimage_to_gray(): QImage → 灰度 numpy 数组
+- build_region_tree(): 从灰度图构建区域树
+- RegionNode: 区域树节点 (find_path 查询包含某点的节点链)
+- ImageRegionFinder: 在后台线程检测,提供与 Finder 相同的 find_targetrect 接口
+
+numpy 在后台检测线程首次运行时才导入,启动和主线程都不加载 numpy;
+numpy 不可用时(例如排除了 numpy 的无 OCR 打包版本)只禁用本功能。
+
+使用方法:
+    finder = ImageRegionFinder()
+    finder.start(qimg, logical_width=widget.width())
+    rect = finder.find_targetrect((x, y))   # 检测未完成时返回 None
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_right
+from typing import List, Optional, Sequence, Tuple
+
+from PyQt5.QtGui import QImage
+
+# 延迟导入：由 _numpy() 在首次检测时加载
+np = None
+
+
+def _numpy():
+    """导入 numpy 并返回（不可用时返回 None）"""
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
+
+
+RectTuple = Tuple[int, int, int, int]  # (x1, y1, x2, y2)，右/下边界不包含
+
+
+def qimage_to_gray(qimg: QImage) -> np.ndarray:
+    """把 QImage 转为 (H, W) uint8 灰度数组（复制数据）"""
+    _numpy()
+    gray = qimg.convertToFormat(QImage.Format_Grayscale8)
+    width, height = gray.width(), gray.height()
+    if width <= 0 or height <= 0:
+        return np.zeros((0, 0), dtype=np.uint8)
+    stride = gray.bytesPerLine()
+    buffer = gray.constBits()
+    buffer.setsize(stride * height)
+    return np.frombuffer(buffer, dtype=np.uint8).reshape(height, stride)[:, :width].copy()
+
+
+def edge_map(gray: np.ndarray, threshold: int = 12) -> np.ndarray:
+    """相邻像素灰度差超过阈值的位置（边界两侧的像素都标记）"""
+    _numpy()
+    data = gray.astype(np.int16)
+    edges = np.zeros(gray.shape, dtype=bool)
+    dx = np.abs(np.diff(data, axis=1)) > threshold
+    dy = np.abs(np.diff(data, axis=0)) > threshold
+    edges[:, :-1] |= dx
+    edges[:, 1:] |= dx
+    edges[:-1, :] |= dy
+    edges[1:, :] |= dy
+    return edges
+
+
+class RegionNode:
+    """区域树节点
+
+    children 沿 axis（"y" 按行切分 / "x" 按列切分）排列且互不重叠，
+    _starts 为子节点在该方向上的起点，用于二分查找。
+    """
+
+    __slots__ = ("rect", "axis", "children", "_starts")
+
+    def __init__(self, rect: RectTuple):
+        self.rect = rect
+        self.axis: Optional[str] = None
+        self.children: List["RegionNode"] = []
+        self._starts: List[int] = []
+
+    @property
+    def width(self) -> int:
+        return self.rect[2] - self.rect[0]
+
+    @property
+    def height(self) -> int:
+        return self.rect[3] - self.rect[1]
+
+    def contains(self, x: float, y: float) -> bool:
+        x1, y1, x2, y2 = self.rect
+        return x1 <= x < x2 and y1 <= y < y2
+
+    def set_children(self, axis: str, children: List["RegionNode"]) -> None:
+        key = 1 if axis == "y" else 0
+        self.axis = axis
+        self.children = sorted(children, key=lambda node: node.rect[key])
+        self._starts = [node.rect[key] for node in self.children]
+
+    def find_path(self, x: float, y: float) -> List["RegionNode"]:
+        """返回从本节点到包含该点的最深节点的路径（本节点不包含该点时为空）"""
+        if not self.contains(x, y):
+            return []
+        path = [self]
+        node = self
+        while node.children:
+            coord = y if node.axis == "y" else x
+            index = bisect_right(node._starts, coord) - 1
+            if index < 0 or not node.children[index].contains(x, y):
+                break
+            node = node.children[index]
+            path.append(node)
+        return path
+
+    def count(self) -> int:
+        return 1 + sum(child.count() for child in self.children)
+
+
+class _RegionBuilder:
+    """递归 XY-cut，边缘计数全部通过积分图求得"""
+
+    def __init__(self, edges: np.ndarray, min_gap: int, min_size: int, max_depth: int, max_nodes: int):
+        height, width = edges.shape
+        integral = np.zeros((height + 1, width + 1), dtype=np.int32)
+        np.cumsum(np.cumsum(edges, axis=0, dtype=np.int32), axis=1, out=integral[1:, 1:])
+        self.integral = integral
+        self.min_gap = max(1, int(min_gap))
+        self.min_size = max(1, int(min_size))
+        self.max_depth = max_depth
+        self.max_nodes = max_nodes
+        self.nodes = 0
+
+    def _row_counts(self, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+        s = self.integral
+        return s[y1 + 1:y2 + 1, x2] - s[y1 + 1:y2 + 1, x1] - s[y1:y2, x2] + s[y1:y2, x1]
+
+    def _col_counts(self, x1: int, y1: int, x2: int, y2: int) -> np.ndarray:
+        s = self.integral
+        return s[y2, x1 + 1:x2 + 1] - s[y1, x1 + 1:x2 + 1] - s[y2, x1:x2] + s[y1, x1:x2]
+
+    def _trim(self, rect: RectTuple) -> Optional[RectTuple]:
+        """收缩到区域内边缘的包围盒"""
+        x1, y1, x2, y2 = rect
+        if x2 <= x1 or y2 <= y1:
+            return None
+        rows = np.flatnonzero(self._row_counts(x1, y1, x2, y2))
+        if rows.size == 0:
+            return None
+        y1, y2 = y1 + int(rows[0]), y1 + int(rows[-1]) + 1
+        cols = np.flatnonzero(self._col_counts(x1, y1, x2, y2))
+        return x1 + int(cols[0]), y1, x1 + int(cols[-1]) + 1, y2
+
+    def _strip_frame(self, rect: RectTuple, limit: int = 4) -> RectTuple:
+        """四条边都是整条边缘线（边框或色块边界）时向内剥掉，最多 limit 像素"""
+        x1, y1, x2, y2 = rect
+        for _ in range(limit):
+            w, h = x2 - x1, y2 - y1
+            if w <= 2 or h <= 2:
+                break
+            rows = self._row_counts(x1, y1, x2, y2)
+            cols = self._col_counts(x1, y1, x2, y2)
+            dense_w, dense_h = 0.9 * w, 0.9 * h
+            if rows[0] >= dense_w and rows[-1] >= dense_w and cols[0] >= dense_h and cols[-1] >= dense_h:
+                x1, y1, x2, y2 = x1 + 1, y1 + 1, x2 - 1, y2 - 1
+            else:
+                break
+        return x1, y1, x2, y2
+
+    def _segments(self, counts: np.ndarray) -> List[Tuple[int, int]]:
+        """按连续 min_gap 个零切分，返回非空段 [(start, stop)]"""
+        empty = counts == 0
+        if not empty.any():
+            return [(0, counts.size)]
+        padded = np.concatenate(([False], empty, [False]))
+        changes = np.flatnonzero(padded[1:] != padded[:-1])
+        starts, stops = changes[0::2], changes[1::2]
+        cuts = [(int(a), int(b)) for a, b in zip(starts, stops) if b - a >= self.min_gap]
+        segments = []
+        position = 0
+        for a, b in cuts:
+            if a > position:
+                segments.append((position, a))
+            position = b
+        if position < counts.size:
+            segments.append((position, counts.size))
+        return segments
+
+    def build(self, rect: RectTuple, depth: int = 0) -> Optional[RegionNode]:
+        rect = self._trim(rect)
+        if rect is None:
+            return None
+        x1, y1, x2, y2 = rect
+        if x2 - x1 < self.min_size and y2 - y1 < self.min_size:
+            return None
+        node = RegionNode(rect)
+        self.nodes += 1
+        if depth >= self.max_depth or self.nodes >= self.max_nodes:
+            return node
+
+        inner = self._strip_frame(rect)
+        ix1, iy1, ix2, iy2 = inner
+        if ix2 - ix1 < self.min_size or iy2 - iy1 < self.min_size:
+            return node
+        rows = self._segments(self._row_counts(ix1, iy1, ix2, iy2))
+        cols = self._segments(self._col_counts(ix1, iy1, ix2, iy2))
+        if len(rows) > 1:
+            axis = "y"
+            parts = [(ix1, iy1 + a, ix2, iy1 + b) for a, b in rows]
+        elif len(cols) > 1:
+            axis = "x"
+            parts = [(ix1 + a, iy1, ix1 + b, iy2) for a, b in cols]
+        elif inner != rect:
+            # 有边框但内部无法再切分：内容整体作为唯一子节点
+            axis = "y"
+            parts = [inner]
+        else:
+            return node
+
+        children = []
+        for part in parts:
+            child = self.build(part, depth + 1)
+            if child is not None and child.rect != rect:
+                children.append(child)
+        if children:
+            node.set_children(axis, children)
+        return node
+
+
+def build_region_tree(
+    gray: np.ndarray,
+    *,
+    threshold: int = 12,
+    min_gap: int = 3,
+    min_size: int = 4,
+    max_depth: int = 12,
+    max_nodes: int = 20000,
+) -> Optional[RegionNode]:
+    """从灰度图构建区域树
+
+    Args:
+        gray: (H, W) uint8 灰度图
+        threshold: 边缘判定的灰度差阈值
+        min_gap: 至少连续多少行/列没有边缘才作为分隔带
+        min_size: 宽高都小于该值的区域视为噪点丢弃
+        max_depth: 最大递归深度
+        max_nodes: 节点数上限（防止噪声画面产生过多节点）
+
+    Returns:
+        根节点（画面完全没有边缘时为 None）
+    """
+    _numpy()
+    if gray.ndim != 2 or gray.size == 0:
+        return None
+    edges = edge_map(gray, threshold)
+    builder = _RegionBuilder(edges, min_gap, min_size, max_depth, max_nodes)
+    height, width = gray.shape
+    return builder.build((0, 0, width, height))
+
+
+class ImageRegionFinder:
+    """基于截图画面的智能选区查找器
+
+    start() 在主线程把截图转为灰度 QImage，转数组与检测都在后台线程进行；
+    检测完成前 find_targetrect() 返回 None，调用方回退到窗口级选区。
+    坐标与 Finder 一致（截图窗口的逻辑坐标），内部按图像/窗口宽度比例换算。
+    """
+
+    def __init__(self, min_pick: int = 16):
+        """
+        Args:
+            min_pick: 悬停时选取的区域宽高都不小于该值（逻辑像素），避免选中单个字符
+        """
+        self.min_pick = min_pick
+        self.root: Optional[RegionNode] = None
+        self.scale = 1.0
+        self.detect_ms = 0.0
+        self._generation = 0
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.root is not None
+
+    def start(self, qimg: QImage, logical_width: Optional[int] = None, **options) -> None:
+        """开始检测（会取消尚未完成的上一次检测的结果）"""
+        self.clear_setup()
+        if qimg is None or qimg.isNull():
+            return
+        # 转换结果是独立的 QImage，交给后台线程读取
+        gray_image = qimg.convertToFormat(QImage.Format_Grayscale8)
+        if logical_width:
+            self.scale = gray_image.width() / float(logical_width)
+        with self._lock:
+            generation = self._generation
+        self._thread = threading.Thread(
+            target=self._run, args=(gray_image, generation, options), name="jietuba-smart-region", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, gray_image: QImage, generation: int, options) -> None:
+        if _numpy() is None:
+            print("⚠️ [图像选区] numpy 不可用，跳过图像选区检测")
+            return
+        start = time.perf_counter()
+        try:
+            root = build_region_tree(qimage_to_gray(gray_image), **options)
+        except Exception as e:
+            print(f"⚠️ [图像选区] 区域检测失败: {e}")
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        with self._lock:
+            if generation != self._generation:
+                return
+            self.root = root
+            self.detect_ms = elapsed
+        count = root.count() if root is not None else 0
+        print(f"🧩 [图像选区] 检测到 {count} 个区域，用时 {elapsed:.1f}ms")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待后台检测结束（测试/同步场景使用）"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def find_path(self, point) -> List[RegionNode]:
+        root = self.root
+        if root is None:
+            return []
+        x, y = point
+        return root.find_path(x * self.scale, y * self.scale)
+
+    def find_targetrect(self, point, within: Optional[Sequence[int]] = None) -> Optional[List[int]]:
+        """返回鼠标位置处最精细的界面元素矩形 [x1, y1, x2, y2]
+
+        Args:
+            point: 截图窗口坐标
+            within: 可选的外层矩形（例如 Finder 找到的窗口），只选取完全位于其中的元素
+
+        Returns:
+            没有合适元素或检测未完成时返回 None
+        """
+        path = self.find_path(point)
+        if not path:
+            return None
+        min_size = self.min_pick * self.scale
+        if within is not None:
+            bounds = [v * self.scale for v in within]
+        for node in reversed(path):
+            if node.width < min_size or node.height < min_size:
+                continue
+            x1, y1, x2, y2 = node.rect
+            if within is not None and not (
+                x1 >= bounds[0] and y1 >= bounds[1] and x2 <= bounds[2] and y2 <= bounds[3]
+            ):
+                continue
+            scale = self.scale
+            return [int(round(x1 / scale)), int(round(y1 / scale)), int(round(x2 / scale)), int(round(y2 / scale))]
+        return None
+
+    def clear_setup(self) -> None:
+        """丢弃检测结果（正在进行的检测完成后也不会再写入）"""
+        with self._lock:
+            self._generation += 1
+            self.root = None
+        self.scale = 1.0
+        self._thread = None
+
+
+__all__ = [
+    "RegionNode",
+    "ImageRegionFinder",
+    "build_region_tree",
+    "edge_map",
+    "qimage_to_gray",
+]
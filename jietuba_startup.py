@@ -0,0 +1,185 @@
+"""
+jietuba_startup.py - 启动耗时分析与延迟导入模块
+
+主要功能:
+- StartupProfiler: 启动分析模式,记录每个模块的导入耗时(含自身耗时/累计耗时)
+  以及关键节点(QApplication 创建、托盘就绪、事件循环就绪)距启动的时间
+- warm_up_imports(): 在空闲时的后台线程中预先导入较重的模块
+  (OCR / 长截图拼接引擎 / pynput 等),首次使用时不再卡顿
+
+开启启动分析:
+    python main.py --profile-startup
+    或设置环境变量 JIETUBA_PROFILE_STARTUP=1
+
+使用方法:
+    from jietuba_startup import startup_profiler, profiling_requested
+    if profiling_requested():
+        startup_profiler.start()
+    ...
+    startup_profiler.mark("托盘就绪")
+    startup_profiler.report()
+"""
+
+import importlib
+import os
+import sys
+import threading
+import time
+from typing import Callable, Iterable, List, Optional, Tuple
+
+
+def profiling_requested(argv: Optional[List[str]] = None) -> bool:
+    """是否请求了启动分析模式（命令行参数或环境变量）"""
+    argv = sys.argv if argv is None else argv
+    if "--profile-startup" in argv:
+        return True
+    return os.environ.get("JIETUBA_PROFILE_STARTUP", "0") not in ("0", "", "false", "False")
+
+
+class _TimingLoader:
+    """包装原加载器，统计 create_module + exec_module 的耗时；其他属性全部转发给原加载器
+
+    扩展模块（.pyd/.so）的初始化发生在 create_module 中，因此两步都要计入。
+    """
+
+    def __init__(self, loader, profiler: "StartupProfiler", name: str):
+        self._loader = loader
+        self._profiler = profiler
+        self._name = name
+        self._create_time = 0.0
+
+    def __getattr__(self, item):
+        return getattr(self._loader, item)
+
+    def create_module(self, spec):
+        start = time.perf_counter()
+        try:
+            return self._loader.create_module(spec)
+        finally:
+            self._create_time = time.perf_counter() - start
+
+    def exec_module(self, module):
+        profiler = self._profiler
+        profiler._stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start + self._create_time
+            children = profiler._stack.pop()
+            if profiler._stack:
+                profiler._stack[-1] += elapsed
+            profiler.modules.append((self._name, elapsed * 1000, (elapsed - children) * 1000, len(profiler._stack)))
+
+
+class _TimingFinder:
+    """放在 sys.meta_path 最前面，找到模块后把加载器换成 _TimingLoader"""
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path, target=None):
+        # 只统计主线程的导入（后台预热线程的导入不计入启动耗时）
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+            spec.loader = _TimingLoader(spec.loader, self._profiler, fullname)
+        return spec
+
+
+class StartupProfiler:
+    """启动耗时分析器（未调用 start() 时 mark/report 都不做任何事）"""
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = 0.0
+        self.modules: List[Tuple[str, float, float, int]] = []  # (模块, 累计ms, 自身ms, 嵌套深度)
+        self.marks: List[Tuple[str, float]] = []
+        self._stack: List[float] = []
+        self._finder: Optional[_TimingFinder] = None
+        self._reported = False
+
+    def start(self) -> None:
+        if self.enabled:
+            return
+        self.enabled = True
+        self.start_time = time.perf_counter()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+        print("⏱️ [启动分析] 已开启，记录模块导入耗时")
+
+    def stop(self) -> None:
+        if self._finder is not None and self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+
+    def mark(self, name: str) -> None:
+        """记录一个关键节点（距启动的时间）"""
+        if self.enabled:
+            self.marks.append((name, (time.perf_counter() - self.start_time) * 1000))
+
+    def report(self, top: int = 25) -> None:
+        """停止记录并输出报告（只输出一次）"""
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        self.stop()
+        top_level = sum(cumulative for _name, cumulative, _self, depth in self.modules if depth == 0)
+        print("=" * 60)
+        print(f"⏱️ [启动分析] 共导入 {len(self.modules)} 个模块，导入总耗时 {top_level:.1f}ms")
+        print(f"   {'自身ms':>8} {'累计ms':>8}  模块")
+        for name, cumulative, own, _depth in sorted(self.modules, key=lambda m: m[2], reverse=True)[:top]:
+            print(f"   {own:8.1f} {cumulative:8.1f}  {name}")
+        print("⏱️ [启动分析] 关键节点:")
+        for name, at in self.marks:
+            print(f"   {at:8.1f}ms  {name}")
+        print("=" * 60)
+
+
+startup_profiler = StartupProfiler()
+
+
+def warm_up_imports(modules: Iterable[str], on_done: Optional[Callable[[List[str]], None]] = None) -> threading.Thread:
+    """在后台线程中依次导入模块（已导入的跳过，失败只打印不抛出）
+
+    Args:
+        modules: 模块名列表
+        on_done: 完成后在后台线程中调用，参数为成功导入的模块列表
+    """
+    names = [name for name in modules if name not in sys.modules]
+
+    def _run():
+        loaded = []
+        start = time.perf_counter()
+        for name in names:
+            t0 = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except Exception as e:
+                print(f"⚠️ [预加载] {name} 导入失败: {e}")
+                continue
+            loaded.append(name)
+            print(f"🔥 [预加载] {name} ({(time.perf_counter() - t0) * 1000:.0f}ms)")
+        print(f"🔥 [预加载] 完成 {len(loaded)}/{len(names)} 个模块，用时 {(time.perf_counter() - start) * 1000:.0f}ms")
+        if on_done is not None:
+            on_done(loaded)
+
+    thread = threading.Thread(target=_run, name="jietuba-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+__all__ = [
+    "StartupProfiler",
+    "startup_profiler",
+    "profiling_requested",
+    "warm_up_imports",
+]
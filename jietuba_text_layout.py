@@ -0,0 +1,157 @@
+"""
+jietuba_text_layout.py - 文字排版缓存模块
+
+文字/序号标注每次重放都要重新创建 QFont、查询 fontMetrics、逐行 drawText，
+输入文字时实时预览也是每次按键把所有行重新排版一遍（中日文字形较多时尤其明显）。
+这里把排版结果缓存下来:
+
+- 每一行是一个已 prepare 的 QStaticText（字形排版只做一次），连同行宽一起缓存
+- 缓存键为 (文字, 字体, 设备 DPI)；同一行在输入、缩放、撤销/重做之间都可复用
+- 整段文字的 TextLayout 也按 (文字, 字体, 设备 DPI) 缓存，未修改的行直接取行缓存
+
+缓存只在 GUI（主）线程读写；后台导出线程调用时只排版不缓存，避免跨线程共享。
+QStaticText 与 drawText 的绘制结果逐像素一致。
+
+使用方法:
+    from jietuba_text_layout import text_layout
+    layout = text_layout("第一行\\n第二行", font, painter.device())
+    layout.draw(painter, x, baseline_y, line_height)
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from PyQt5.QtCore import QPointF, Qt
+from PyQt5.QtGui import QFont, QFontMetrics, QFontMetricsF, QPainter, QPaintDevice, QStaticText, QTransform
+
+# 缓存容量（行缓存要容纳多段文字的所有行）
+MAX_LAYOUTS = 256
+MAX_LINES = 2048
+
+
+class TextLine:
+    """一行已排版的文字（QStaticText 与行宽）"""
+
+    __slots__ = ("text", "static", "advance")
+
+    def __init__(self, text: str, static: QStaticText, advance: float):
+        self.text = text
+        self.static = static
+        self.advance = advance
+
+
+class TextLayout:
+    """一段多行文字的排版结果；font 为已按设备分辨率解析的字体"""
+
+    __slots__ = ("text", "font", "metrics", "lines", "ascent", "descent", "height", "width")
+
+    def __init__(self, text: str, font: QFont, metrics: QFontMetricsF, lines: Tuple[TextLine, ...], height: int):
+        self.text = text
+        self.font = font
+        self.metrics = metrics
+        self.lines = lines
+        self.ascent = metrics.ascent()
+        self.descent = metrics.descent()
+        # 与 painter.fontMetrics().height() 相同的整数行高（行距按它计算，保持原有排版）
+        self.height = height
+        self.width = max((line.advance for line in lines), default=0.0)
+
+    def draw(self, painter: QPainter, x: float, y: float, line_height: float) -> None:
+        """以 (x, y) 为首行基线左端绘制（与逐行 drawText(x, y + i * line_height) 相同），画笔由调用方设置"""
+        painter.setFont(self.font)
+        for i in range(len(self.lines)):
+            self.draw_line(painter, i, x, y + i * line_height)
+
+    def draw_line(self, painter: QPainter, index: int, x: float, y: float) -> None:
+        """以 (x, y) 为基线左端绘制第 index 行；需先 painter.setFont(self.font)"""
+        line = self.lines[index]
+        if line.text:
+            painter.drawStaticText(QPointF(x, y - self.ascent), line.static)
+
+    def prefix_width(self, line_index: int, column: int) -> float:
+        """第 line_index 行前 column 个字符的宽度（光标/预编辑下划线定位用）"""
+        if not self.lines:
+            return 0.0
+        line = self.lines[max(0, min(line_index, len(self.lines) - 1))]
+        if column >= len(line.text):
+            return line.advance
+        if column <= 0:
+            return 0.0
+        return self.metrics.horizontalAdvance(line.text[:column])
+
+
+_layouts: "OrderedDict[Tuple[str, str, int], TextLayout]" = OrderedDict()
+_lines: "OrderedDict[Tuple[str, str, int], TextLine]" = OrderedDict()
+
+
+def _remember(cache: OrderedDict, key, value, limit: int) -> None:
+    cache[key] = value
+    if len(cache) > limit:
+        cache.popitem(last=False)
+
+
+def _layout_line(text: str, font: QFont, metrics: QFontMetricsF, key, use_cache: bool) -> TextLine:
+    if use_cache:
+        line = _lines.get(key)
+        if line is not None:
+            _lines.move_to_end(key)
+            return line
+    static = QStaticText(text)
+    static.setTextFormat(Qt.PlainText)
+    static.setPerformanceHint(QStaticText.AggressiveCaching)
+    static.prepare(QTransform(), font)
+    line = TextLine(text, static, metrics.horizontalAdvance(text))
+    if use_cache:
+        _remember(_lines, key, line, MAX_LINES)
+    return line
+
+
+def text_layout(text: str, font: QFont, device: Optional[QPaintDevice] = None) -> TextLayout:
+    """返回文字按行排版的结果（按 文字/字体/设备 DPI 缓存）
+
+    Args:
+        text: 文字，按换行符分行
+        font: 字体（含字号）
+        device: 目标绘图设备（一般为 painter.device()），决定字号换算用的 DPI
+    """
+    if device is not None:
+        font = QFont(font, device)
+        dpi = device.logicalDpiY()
+    else:
+        dpi = 0
+    font_key = font.key()
+    key = (text, font_key, dpi)
+    use_cache = threading.current_thread() is threading.main_thread()
+    if use_cache:
+        layout = _layouts.get(key)
+        if layout is not None:
+            _layouts.move_to_end(key)
+            return layout
+    if device is not None:
+        metrics = QFontMetricsF(font, device)
+        height = QFontMetrics(font, device).height()
+    else:
+        metrics = QFontMetricsF(font)
+        height = QFontMetrics(font).height()
+    lines = tuple(
+        _layout_line(line, font, metrics, (line, font_key, dpi), use_cache)
+        for line in text.split("\n")
+    )
+    layout = TextLayout(text, font, metrics, lines, height)
+    if use_cache:
+        _remember(_layouts, key, layout, MAX_LAYOUTS)
+    return layout
+
+
+def clear_cache() -> None:
+    _layouts.clear()
+    _lines.clear()
+
+
+__all__ = [
+    "TextLine",
+    "TextLayout",
+    "text_layout",
+    "clear_cache",
+]
@@ -16,6 +16,7 @@ import win32con
 from PyQt5.QtCore import Qt, pyqtSignal, QTimer, QPoint
 from PyQt5.QtGui import QFont, QColor, QCursor, QPainter, QPen, QInputMethodEvent
 from PyQt5.QtWidgets import QPushButton, QGroupBox, QTextEdit, QFrame
+from jietuba_window_index import WindowRectIndex, create_default_provider
 
 # ================== 多屏调试开关 ==================
 DEBUG_MONITOR = os.environ.get("JSS_DEBUG_MONITOR", "0") not in ("0", "false", "False")
@@ -223,10 +224,12 @@ class CanMoveGroupbox(QGroupBox):
 
 
 class Finder:
-    """智能窗口选择器 - 基于 Windows API 的窗口检测"""
-    def __init__(self, parent):
+    """智能窗口选择器 - 窗口枚举由 WindowProvider 完成，查找使用网格索引"""
+    def __init__(self, parent, provider=None):
         self.parent = parent
-        self.windows = []  # 存储所有窗口信息 [(hwnd, rect), ...]
+        self.provider = provider or create_default_provider()
+        self.index = WindowRectIndex()
+        self.windows = []  # 存储所有窗口信息 [(hwnd, rect, title), ...]，按 Z-order 从顶到底
         self.screen_offset_x = 0
         self.screen_offset_y = 0
 
@@ -265,126 +268,43 @@ class Finder:
             print(f"🧭 [智能选区] 使用偏移: ({self.screen_offset_x}, {self.screen_offset_y})")
 
     def find_contours_setup(self):
-        """枚举所有可见窗口"""
-        self.windows = []
+        """枚举所有可见窗口并建立空间索引（窗口未变化时沿用原索引）"""
         self._refresh_screen_offsets()
-        
-        def enum_windows_callback(hwnd, _):
-            """枚举窗口回调函数"""
-            try:
-                # 1. 只处理可见窗口
-                if not win32gui.IsWindowVisible(hwnd):
-                    return True
-                
-                # 2. 检查窗口样式（排除工具窗口、消息窗口等）
-                style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
-                ex_style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
-                
-                # 跳过没有标题栏的窗口（通常是弹出窗口或工具栏）
-                if not (style & win32con.WS_CAPTION):
-                    return True
-                
-                # 跳过工具窗口
-                if ex_style & win32con.WS_EX_TOOLWINDOW:
-                    return True
-                
-                # 3. 必须有窗口标题
-                title = win32gui.GetWindowText(hwnd)
-                if not title or len(title.strip()) == 0:
-                    return True
-                
-                # 4. 检查窗口是否真的可以接收输入（不是透明遮罩）
-                if ex_style & win32con.WS_EX_TRANSPARENT:
-                    return True
-                
-                # 5. 获取窗口矩形
-                rect = win32gui.GetWindowRect(hwnd)
-                x1, y1, x2, y2 = rect
-                
-                # 6. 窗口必须有合理的大小（排除太小的窗口）
-                width = x2 - x1
-                height = y2 - y1
-                if width < 30 or height < 30:  # 提高最小尺寸阈值
-                    return True
-                
-                # 7. 窗口必须在屏幕可见区域内（至少部分可见）
-                # 排除完全在屏幕外的窗口
-                if x2 < -1000 or y2 < -1000 or x1 > 10000 or y1 > 10000:
-                    return True
-                
-                # 8. 检查窗口类名，排除一些特殊的系统窗口
-                try:
-                    class_name = win32gui.GetClassName(hwnd)
-                    # 排除一些已知的不需要选择的窗口类
-                    excluded_classes = [
-                        'Windows.UI.Core.CoreWindow',  # UWP后台窗口
-                        'ApplicationFrameWindow',      # UWP框架窗口（有时是空的）
-                        'WorkerW',                     # 桌面工作窗口
-                        'Progman',                     # 程序管理器
-                    ]
-                    if class_name in excluded_classes:
-                        return True
-                except Exception:
-                    pass
-                
-                # 9. 转换为相对于截图区域的坐标
-                x1 -= self.screen_offset_x
-                y1 -= self.screen_offset_y
-                x2 -= self.screen_offset_x
-                y2 -= self.screen_offset_y
-                
-                self.windows.append((hwnd, [x1, y1, x2, y2], title))
-                
-            except Exception as e:
-                # 静默处理异常，继续枚举下一个窗口
-                pass
-            
-            return True
-        
         try:
-            win32gui.EnumWindows(enum_windows_callback, None)
-            print(f'🔍 [智能选区] 找到 {len(self.windows)} 个有效窗口')
-            
-            # 调试：输出前5个窗口信息
-            if DEBUG_MONITOR and self.windows:
-                print("📋 [智能选区] 检测到的窗口列表（前5个）:")
-                for i, (hwnd, rect, title) in enumerate(self.windows[:5]):
-                    print(f"  {i+1}. 标题: {title[:30]}, 大小: {rect[2]-rect[0]}x{rect[3]-rect[1]}, 位置: ({rect[0]}, {rect[1]})")
-                    
+            windows = self.provider.enumerate(self.screen_offset_x, self.screen_offset_y)
         except Exception as e:
             print(f'❌ [智能选区] 枚举窗口失败: {e}')
-            self.windows = []
+            windows = []
+        rebuilt = self.index.update(windows)
+        self.windows = self.index.windows
+        print(f'🔍 [智能选区] 找到 {len(self.windows)} 个有效窗口{"" if rebuilt else "（窗口未变化，沿用索引）"}')
+
+        # 调试：输出前5个窗口信息
+        if DEBUG_MONITOR and self.windows:
+            print("📋 [智能选区] 检测到的窗口列表（前5个）:")
+            for i, (hwnd, rect, title) in enumerate(self.windows[:5]):
+                print(f"  {i+1}. 标题: {title[:30]}, 大小: {rect[2]-rect[0]}x{rect[3]-rect[1]}, 位置: ({rect[0]}, {rect[1]})")
 
     def find_targetrect(self, point):
         """根据鼠标位置查找最顶层的包含窗口（基于 Z-order）"""
         x, y = point
         target_rect = None
-        found_window_title = None
-        
-        # 查找所有包含该点的窗口
-        matching_windows = []
-        for idx, (hwnd, rect, title) in enumerate(self.windows):
-            x1, y1, x2, y2 = rect
-            # 检查点是否在窗口内
-            if x1 <= x <= x2 and y1 <= y <= y2:
-                area = (x2 - x1) * (y2 - y1)
-                # idx 就是 Z-order（EnumWindows 按从顶到底的顺序枚举）
-                matching_windows.append((idx, area, hwnd, rect, title))
-        
-        # 如果找到多个重叠窗口
-        if matching_windows:
-            # 排序策略：优先选择 Z-order 最小的（最顶层），其次选择面积最小的（最精确）
-            matching_windows.sort(key=lambda w: (w[0], w[1]))  # (z_order, area)
-            z_order, area, hwnd, target_rect, found_window_title = matching_windows[0]
-            
+
+        # 网格索引只检查鼠标所在格子里的窗口，格子内已按 Z-order 排列
+        z_order = self.index.find_z((x, y))
+        if z_order is not None:
+            hwnd, target_rect, found_window_title = self.windows[z_order]
+
             # 调试信息
             if DEBUG_MONITOR:
                 print(f"🎯 [智能选区] 鼠标({x}, {y})处找到窗口: '{found_window_title[:30]}', 大小: {target_rect[2]-target_rect[0]}x{target_rect[3]-target_rect[1]}, Z-order: {z_order}")
-                if len(matching_windows) > 1:
-                    print(f"   共有 {len(matching_windows)} 个重叠窗口，已选择最顶层的")
+                matching = self.index.find_all((x, y))
+                if len(matching) > 1:
+                    print(f"   共有 {len(matching)} 个重叠窗口，已选择最顶层的")
                     # 输出其他候选窗口
-                    for i, (z, a, h, r, t) in enumerate(matching_windows[1:3], 1):
-                        print(f"   候选{i}: '{t[:20]}', Z-order: {z}, 面积: {a}")
+                    for i, z in enumerate(matching[1:3], 1):
+                        _h, r, t = self.windows[z]
+                        print(f"   候选{i}: '{t[:20]}', Z-order: {z}, 面积: {(r[2]-r[0])*(r[3]-r[1])}")
         
         # 如果没找到窗口，返回全屏
         if target_rect is None:
@@ -397,11 +317,12 @@ class Finder:
             except Exception:
                 target_rect = [0, 0, 1920, 1080]
         
-        return target_rect
+        return list(target_rect)
 
     def clear_setup(self):
         """清理数据"""
         self.windows = []
+        self.index.clear()
         self.screen_offset_x = 0
         self.screen_offset_y = 0
 
@@ -11,18 +11,19 @@ jietuba_widgets.py - 自定义控件模块
 支持拖拽、快捷键、透明度调整、绘图编辑、历史记录等
 
 依赖模块:
-jietuba_public, jietuba_resource, jietuba_text_drawer
+jietuba_public, jietuba_resource_loader, jietuba_text_drawer
 """
 import os
 import time
 from typing import Dict, List, Tuple, Sequence, Optional
-import jietuba_resource
-from PyQt5.QtCore import Qt, pyqtSignal, QStandardPaths, QUrl, QTimer, QSize, QPoint, QRect, QRectF
+from jietuba_resource_loader import ensure_resources
+from PyQt5.QtCore import Qt, pyqtSignal, QStandardPaths, QUrl, QTimer, QSize, QPoint, QRect, QRectF, QSettings
 from PyQt5.QtGui import QTextCursor, QMouseEvent, QCursor, QKeyEvent
 from PyQt5.QtGui import QPainter, QPen, QIcon, QFont, QImage, QPixmap, QColor, QMovie, QPolygon, QBrush
 from PyQt5.QtWidgets import QApplication, QLabel, QPushButton, QTextEdit, QWidget, QHBoxLayout, QVBoxLayout, QFileDialog, QMenu
 from jietuba_public import linelabel,TipsShower, get_screenshot_save_dir
-from jietuba_layer_system import VectorLayerDocument
+from jietuba_layer_system import VectorLayerDocument, VectorTileCache, CommandSnapshot, history_footprint, prepare_stroke, stroke_commit_options
+from jietuba_shape_geometry import draw_shape
 
 class Hung_widget(QLabel):
     button_signal = pyqtSignal(str)
@@ -127,6 +128,8 @@ class PinnedPaintLayer(QLabel):
         self._active_stroke: List[List[int]] = []
         self._pending_vectors: List[Dict] = []
         self._current_stroke_meta = None
+        # 荧光笔实时笔迹单独画在这里，绘制时以正片叠底叠加到钉图上（不依赖 Freezer.pixmap()，分块显示时同样有效）
+        self._highlight_pix: Optional[QPixmap] = None
         # 设置鼠标追踪，让paintlayer接收所有鼠标事件，然后透传给父窗口
         self.setMouseTracking(True)
 
@@ -248,18 +251,18 @@ class PinnedPaintLayer(QLabel):
                     color.setAlpha(1)
             return color
 
+        highlight_painter = None
         while len(self.main_window.pen_pointlist):
             color = get_ture_pen_alpha_color()
             pen_width = self.main_window.tool_width
             is_highlight = bool(self.main_window.painter_tools.get('highlight_on'))
             
-            # 荧光笔模式：创建base_painter并设置正片叠底混合模式（与截图窗口一致）
+            # 荧光笔模式：笔迹先画到独立的荧光笔层，本次绘制末尾再以正片叠底叠加（与截图窗口效果一致）
             base_painter = None
             if is_highlight:
-                base_pixmap = self._parent_widget.pixmap()
-                if base_pixmap and not base_pixmap.isNull():
-                    base_painter = QPainter(base_pixmap)
-                    base_painter.setCompositionMode(QPainter.CompositionMode_Multiply)
+                if highlight_painter is None:
+                    highlight_painter = self._highlight_painter()
+                base_painter = highlight_painter
             
             pen_painter = base_painter if base_painter else self.pixPainter
             if not pen_painter:
@@ -316,23 +319,28 @@ class PinnedPaintLayer(QLabel):
 
             self.main_window.old_pen = new_pen_point
         
-        # 清理 base_painter（如果创建了的话）
-        if 'base_painter' in locals() and base_painter is not None:
-            base_painter.end()
+        # 清理荧光笔层的 painter（如果创建了的话）
+        if highlight_painter is not None:
+            highlight_painter.end()
 
         if self._pending_vectors and hasattr(self._parent_widget, 'ingest_vector_commands'):
             payload = list(self._pending_vectors)
             self._pending_vectors.clear()
             self._parent_widget.ingest_vector_commands(payload)
 
+        if self._highlight_pix is not None:
+            overlay_painter = QPainter(self)
+            overlay_painter.setCompositionMode(QPainter.CompositionMode_Multiply)
+            overlay_painter.drawPixmap(0, 0, self._highlight_pix)
+            overlay_painter.end()
+
         # 处理矩形工具
         if self.main_window.drawrect_pointlist[0][0] != -2 and self.main_window.drawrect_pointlist[1][0] != -2:
             try:
                 temppainter = QPainter(self)
-                temppainter.setPen(QPen(self.main_window.pencolor, self.main_window.tool_width, Qt.SolidLine))
                 poitlist = self.main_window.drawrect_pointlist
-                temppainter.drawRect(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                     abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                draw_shape(temppainter, "rect", poitlist[0], poitlist[1],
+                           self.main_window.pencolor, self.main_window.tool_width)
                 temppainter.end()
             except Exception as e:
                 print(f"钉图画矩形临时QPainter错误: {e}")
@@ -341,9 +349,8 @@ class PinnedPaintLayer(QLabel):
                 try:
                     start_pt = poitlist[0][:]
                     end_pt = poitlist[1][:]
-                    self.pixPainter.setPen(QPen(self.main_window.pencolor, self.main_window.tool_width, Qt.SolidLine))
-                    self.pixPainter.drawRect(min(start_pt[0], end_pt[0]), min(start_pt[1], end_pt[1]),
-                                             abs(start_pt[0] - end_pt[0]), abs(start_pt[1] - end_pt[1]))
+                    draw_shape(self.pixPainter, "rect", start_pt, end_pt,
+                               self.main_window.pencolor, self.main_window.tool_width)
                     self.main_window.drawrect_pointlist = [[-2, -2], [-2, -2], 0]
                     if hasattr(self._parent_widget, 'record_rectangle_command'):
                         self._parent_widget.record_rectangle_command(start_pt, end_pt,
@@ -356,10 +363,9 @@ class PinnedPaintLayer(QLabel):
         if self.main_window.drawcircle_pointlist[0][0] != -2 and self.main_window.drawcircle_pointlist[1][0] != -2:
             try:
                 temppainter = QPainter(self)
-                temppainter.setPen(QPen(self.main_window.pencolor, self.main_window.tool_width, Qt.SolidLine))
                 poitlist = self.main_window.drawcircle_pointlist
-                temppainter.drawEllipse(min(poitlist[0][0], poitlist[1][0]), min(poitlist[0][1], poitlist[1][1]),
-                                        abs(poitlist[0][0] - poitlist[1][0]), abs(poitlist[0][1] - poitlist[1][1]))
+                draw_shape(temppainter, "circle", poitlist[0], poitlist[1],
+                           self.main_window.pencolor, self.main_window.tool_width)
                 temppainter.end()
             except Exception as e:
                 print(f"钉图画圆临时QPainter错误: {e}")
@@ -368,9 +374,8 @@ class PinnedPaintLayer(QLabel):
                 try:
                     start_pt = poitlist[0][:]
                     end_pt = poitlist[1][:]
-                    self.pixPainter.setPen(QPen(self.main_window.pencolor, self.main_window.tool_width, Qt.SolidLine))
-                    self.pixPainter.drawEllipse(min(start_pt[0], end_pt[0]), min(start_pt[1], end_pt[1]),
-                                                abs(start_pt[0] - end_pt[0]), abs(start_pt[1] - end_pt[1]))
+                    draw_shape(self.pixPainter, "circle", start_pt, end_pt,
+                               self.main_window.pencolor, self.main_window.tool_width)
                     self.main_window.drawcircle_pointlist = [[-2, -2], [-2, -2], 0]
                     if hasattr(self._parent_widget, 'record_circle_command'):
                         self._parent_widget.record_circle_command(start_pt, end_pt,
@@ -540,37 +545,46 @@ class PinnedPaintLayer(QLabel):
             pass
     
     def draw_arrow(self, painter, pointlist):
-        """绘制箭头 - 复用 PaintLayer 的优化箭头实现"""
+        """绘制箭头 - 与截图窗口共用 jietuba_shape_geometry 的箭头几何"""
         try:
-            # 直接调用 jietuba_drawing.py 中的优化箭头函数，避免代码重复
-            from jietuba_drawing import PaintLayer
-            
-            # 创建一个临时的 PaintLayer 实例来调用其箭头绘制方法
-            # 注意：这里只是借用其绘制方法，不需要完整初始化
-            temp_layer = PaintLayer.__new__(PaintLayer)
-            temp_layer._draw_optimized_arrow(
-                painter, 
-                pointlist, 
-                painter.pen().color(),
-                self.main_window.tool_width
-            )
-            
+            draw_shape(painter, "arrow", pointlist[0], pointlist[1],
+                       painter.pen().color(), self.main_window.tool_width)
         except Exception as e:
             print(f"钉图绘制箭头错误: {e}")
 
+    def _highlight_painter(self) -> Optional[QPainter]:
+        """返回荧光笔层的 QPainter（按绘画层尺寸按需创建）"""
+        size = self.pixmap().size() if self.pixmap() is not None else self.size()
+        if size.isEmpty():
+            return None
+        if self._highlight_pix is None or self._highlight_pix.size() != size:
+            self._highlight_pix = QPixmap(size)
+            self._highlight_pix.fill(Qt.transparent)
+        return QPainter(self._highlight_pix)
+
+    def clear_highlight(self) -> None:
+        """丢弃荧光笔实时笔迹（笔迹提交到矢量文档后调用）"""
+        self._highlight_pix = None
+
     def _finalize_vector_stroke(self):
         if not self._active_stroke or not self._current_stroke_meta:
             self._active_stroke = []
             self._current_stroke_meta = None
             return
         color, width, is_highlight = self._current_stroke_meta
+        # 提交前简化采样点（容差随笔宽，外观不变）
+        simplify, smooth = stroke_commit_options()
+        points, stroke_meta = prepare_stroke(
+            self._active_stroke, width, simplify=simplify, smooth=smooth,
+        )
         self._pending_vectors.append(
             {
                 "type": "stroke",
-                "points": [tuple(pt) for pt in self._active_stroke],
+                "points": points,
                 "color": QColor(color),
                 "width": width,
                 "is_highlight": is_highlight,
+                "stamp_ratio": stroke_meta.get("stamp_ratio"),
             }
         )
         self._active_stroke = []
@@ -603,8 +617,14 @@ class PinnedPaintLayer(QLabel):
             print(f"⚠️ PinnedPaintLayer清理时出错: {e}")
 
 class Freezer(QLabel):
+    # 显示尺寸超过该像素数（如长截图）时改为按视口分块渲染，不再生成整张显示图
+    TILED_DISPLAY_PIXELS = 4096 * 4096
+    # 滚轮缩放停止多久后（毫秒）按最终尺寸高质量重绘，之前只显示快速预览
+    ZOOM_SETTLE_MS = 150
+
     def __init__(self, parent=None, img=None, x=0, y=0, listpot=0, main_window=None):
         super().__init__()
+        ensure_resources()
         self.main_window = main_window  # 保存主截图窗口的引用
         
         # 初始化安全状态标记
@@ -621,12 +641,18 @@ class Freezer(QLabel):
         # 内存优化：只保留 layer_document，删除冗余的 origin_imgpix 和 showing_imgpix
         # 底图存储在 layer_document._base_pixmap 中，需要时从 layer_document 渲染
         self.layer_document = VectorLayerDocument(img)
+        # 分块显示：_tiled_size 为当前分块显示的目标尺寸，None 表示整图显示
+        self._tile_cache = None
+        self._tiled_size = None
         
         self.listpot = listpot
         
         # 设置图像（从 layer_document 渲染）
         if img and not img.isNull():
-            self.setPixmap(img)
+            if img.width() * img.height() > self.TILED_DISPLAY_PIXELS:
+                self.setPixmap(self._render_for_display(img.width(), img.height()))
+            else:
+                self.setPixmap(img)
         else:
             # 如果图像无效，直接报错而不是创建无意义的空白图
             raise ValueError("钉图窗口初始化失败: 传入的图像为空或无效")
@@ -699,6 +725,12 @@ class Freezer(QLabel):
         self.hide_timer.setSingleShot(True)  # 只触发一次
         self.hide_timer.setInterval(500)  # 0.5秒延迟
         self.hide_timer.timeout.connect(self._hide_toolbar_delayed)
+
+        # 缩放停止后的高质量重绘定时器
+        self._zoom_timer = QTimer(self)
+        self._zoom_timer.setSingleShot(True)
+        self._zoom_timer.setInterval(self.ZOOM_SETTLE_MS)
+        self._zoom_timer.timeout.connect(self._finish_zoom)
         
         # 删除原来的侧边工具栏信号连接
         # self.hung_widget.button_signal.connect(self.hw_signalcallback)
@@ -799,9 +831,10 @@ class Freezer(QLabel):
             
             # 创建异步 OCR 识别线程
             class OCRThread(QThread):
-                def __init__(self, pixmap, enable_grayscale, enable_upscale, upscale_factor, parent=None):
+                def __init__(self, snapshot, enable_grayscale, enable_upscale, upscale_factor, parent=None):
                     super().__init__(parent)
-                    self.pixmap = pixmap
+                    # 文档只读快照，合成也在后台线程完成
+                    self.snapshot = snapshot
                     self.enable_grayscale = enable_grayscale
                     self.enable_upscale = enable_upscale
                     self.upscale_factor = upscale_factor
@@ -810,7 +843,7 @@ class Freezer(QLabel):
                 def run(self):
                     try:
                         self.result = _ocr_manager.recognize_pixmap(
-                            self.pixmap, 
+                            self.snapshot.render_image(), 
                             return_format="dict",
                             enable_grayscale=self.enable_grayscale,
                             enable_upscale=self.enable_upscale,
@@ -820,18 +853,15 @@ class Freezer(QLabel):
                         print(f"❌ [OCR Thread] 识别失败: {e}")
                         self.result = None
             
-            # 获取钉图的图像
-            if hasattr(self, 'layer_document'):
-                pixmap = self.layer_document.render_composited()
-            else:
-                pixmap = self.pixmap()
+            # 获取钉图的只读快照（合成在识别线程中进行）
+            snapshot = self.layer_document.render_snapshot()
             
             # 保存原始尺寸用于归一化坐标
-            original_width = pixmap.width()
-            original_height = pixmap.height()
+            original_width = snapshot.size.width()
+            original_height = snapshot.size.height()
             
             # 启动异步识别
-            self.ocr_thread = OCRThread(pixmap, enable_grayscale, enable_upscale, upscale_factor, self)
+            self.ocr_thread = OCRThread(snapshot, enable_grayscale, enable_upscale, upscale_factor, self)
             
             def on_ocr_finished():
                 try:
@@ -883,18 +913,42 @@ class Freezer(QLabel):
         return max(0.0, float(width_px) / ref)
 
     def _trim_history(self, limit: int = 20) -> None:
+        """限制历史：最多 limit 步，且丢弃旧步骤后历史实际占用的内存不超过预算"""
         if not hasattr(self, 'backup_pic_list'):
             return
-        if len(self.backup_pic_list) <= limit:
+        budget = QSettings('Fandes', 'jietuba').value('paint/undo_budget_mb', 32, type=int) * 1024 * 1024
+        footprint = history_footprint(
+            [entry.get("state") for entry in self.backup_pic_list],
+            getattr(self, 'layer_document', None),
+        )
+        overflow = max(0, len(self.backup_pic_list) - limit)
+        while overflow < len(footprint) - 1 and footprint[overflow] > budget:
+            overflow += 1
+        if overflow == 0:
             return
-        overflow = len(self.backup_pic_list) - limit
         self.backup_pic_list = self.backup_pic_list[overflow:]
         self.backup_ssid = max(0, len(self.backup_pic_list) - 1)
 
-    def _render_for_display(self, width: int, height: int) -> Optional[QPixmap]:
+    def _render_for_display(self, width: int, height: int, *, preview: bool = False) -> Optional[QPixmap]:
+        """渲染显示用图像；超大尺寸时切换为分块显示并返回空图（由 paintEvent 绘制可见块）
+
+        preview=True 时返回快速预览（连续缩放中使用），之后需再以 preview=False 渲染一次。
+        """
         target_size = QSize(max(1, int(width)), max(1, int(height)))
         if hasattr(self, 'layer_document'):
             try:
+                if target_size.width() * target_size.height() > self.TILED_DISPLAY_PIXELS:
+                    if self._tile_cache is None:
+                        self._tile_cache = VectorTileCache(self.layer_document)
+                        print(f"🧩 钉图分块显示: {target_size.width()}x{target_size.height()}")
+                    self._tiled_size = target_size
+                    self.update()
+                    return QPixmap()
+                if self._tiled_size is not None:
+                    self._tiled_size = None
+                    self._tile_cache = None
+                if preview:
+                    return self.layer_document.render_preview(target_size)
                 return self.layer_document.render_composited(target_size)
             except Exception as e:
                 print(f"⚠️ 钉图矢量渲染失败: {e}")
@@ -908,7 +962,8 @@ class Freezer(QLabel):
     def _capture_history_state(self, *, initial: bool = False) -> None:
         snapshot = {
             "mode": "vector",
-            "state": self.layer_document.export_state() if hasattr(self, 'layer_document') else [],
+            # 增量快照：状态未变化时返回同一对象，无需逐条比较
+            "state": self.layer_document.snapshot() if hasattr(self, 'layer_document') else [],
         }
         if initial or not hasattr(self, 'backup_pic_list'):
             self.backup_pic_list = []
@@ -918,7 +973,12 @@ class Freezer(QLabel):
         if self.backup_pic_list and self.backup_pic_list[-1].get("mode") == "vector":
             last_state = self.backup_pic_list[-1].get("state")
             current_state = snapshot["state"]
-            if last_state == current_state:
+            unchanged = last_state is current_state or (
+                not isinstance(last_state, CommandSnapshot)
+                and len(last_state) == len(current_state)
+                and last_state == list(current_state)
+            )
+            if unchanged:
                 print(f"🔍 钉图备份: 状态未变化，跳过备份 (命令数: {len(current_state)})")
                 self.backup_ssid = len(self.backup_pic_list) - 1
                 return
@@ -935,6 +995,7 @@ class Freezer(QLabel):
             pix = self.paintlayer.pixmap()
             if pix and not pix.isNull():
                 pix.fill(Qt.transparent)
+            self.paintlayer.clear_highlight()
             self.paintlayer.update()
 
     def _refresh_from_document(self, *, clear_overlay: bool = False) -> None:
@@ -945,10 +1006,9 @@ class Freezer(QLabel):
         if not hasattr(self, 'layer_document'):
             return
         try:
-            target_w = max(1, self.width())
-            target_h = max(1, self.height())
-            display = self.layer_document.render_composited(QSize(target_w, target_h))
-            self.setPixmap(display)
+            display = self._render_for_display(self.width(), self.height())
+            if display is not None:
+                self.setPixmap(display)
         except Exception as e:
             print(f"⚠️ 钉图矢量刷新失败: {e}")
         if clear_overlay:
@@ -1019,8 +1079,11 @@ class Freezer(QLabel):
             is_highlight = bool(item.get("is_highlight"))
             blend = "multiply" if is_highlight else "normal"
             brush_style = "square" if is_highlight else "round"
+            extra_meta = None
+            if item.get("stamp_ratio") is not None:
+                extra_meta = {"stamp_ratio": float(item["stamp_ratio"])}
             self.layer_document.add_stroke(
-                points, qcolor, width_ratio, blend=blend, brush=brush_style
+                points, qcolor, width_ratio, blend=blend, brush=brush_style, extra_meta=extra_meta
             )
             changed = True
         if changed:
@@ -1527,8 +1590,6 @@ class Freezer(QLabel):
                     if hasattr(self, 'hide_timer') and self.hide_timer:
                         self.hide_timer.stop()
                     
-                    # 合并原图和绘画内容创建最终图像
-                    final_img = self._create_merged_image()
                     print("🔍 [调试] 准备打开保存对话框")
                     
                     # 获取当前窗口位置和状态，保存对话框关闭后恢复
@@ -1537,6 +1598,7 @@ class Freezer(QLabel):
                     
                     path, l = QFileDialog.getSaveFileName(self, "另存为", QStandardPaths.writableLocation(
                         QStandardPaths.PicturesLocation), "png Files (*.png);;"
+                                                          "jietuba 編集ファイル (*.jtba);;"
                                                           "jpg file(*.jpg);;jpeg file(*.JPEG);; bmp file(*.BMP );;ico file(*.ICO);;"
                                                           ";;all files(*.*)")
                     
@@ -1549,12 +1611,22 @@ class Freezer(QLabel):
                         self.move(current_pos)
                         self.raise_()
                     
-                    if path:
+                    if path and (path.lower().endswith(".jtba") or l.endswith("(*.jtba)")):
+                        # 可继续编辑的文件：保存底图与矢量命令
+                        from jietuba_document_file import FILE_SUFFIX, save_document
+                        if not path.lower().endswith(FILE_SUFFIX):
+                            path += FILE_SUFFIX
+                        written = save_document(path, self.layer_document)
+                        print(f"✅ 钉图窗口已保存为编辑文件: {path} ({written / 1024:.0f} KB)")
+                    elif path:
                         print(f"🔍 [调试] 开始保存图像到: {path}")
-                        final_img.save(path)
+                        # 合并原图和绘画内容并保存，都在后台线程完成
+                        self._export_merged_async(
+                            path=path,
+                            on_done=lambda _image, saved: print(f"✅ 钉图窗口已保存到: {saved}"),
+                        )
                         self.tips_shower.set_pos(self.x(),self.y())
                         # 移除了画像を保存しました提示
-                        print(f"✅ 钉图窗口已保存到: {path}")
                         print("🔍 [调试] 保存完成，应该保持窗口开启状态")
                         # 注意：保存后不关闭窗口，保持钉图状态
                     else:
@@ -1582,15 +1654,12 @@ class Freezer(QLabel):
                 self._prevent_clear = False
                 print("❌ [调试] 没有可保存的图像数据")
         elif action == copyaction:
-            clipboard = QApplication.clipboard()
             try:
                 if hasattr(self, 'layer_document') and self.layer_document:
-                    # 合并原图和绘画内容创建最终图像
-                    final_img = self._create_merged_image()
-                    clipboard.setPixmap(final_img)
+                    # 合并原图和绘画内容在后台线程完成，完成后回到 GUI 线程写入剪贴板
+                    self.copy_merged_image_async()
                     self.tips_shower.set_pos(self.x(),self.y())
                     # 移除了画像をコピーしました提示
-                    print("✅ 已复制包含绘画内容的完整图像到剪贴板")
                 else:
                     print('画像が存在しません')
             except Exception as e:
@@ -1611,6 +1680,34 @@ class Freezer(QLabel):
             self.drawRect = not self.drawRect
             self.update()
             
+    def _export_merged_async(self, *, path: str = "", on_done=None):
+        """在后台线程创建包含绘画内容的完整图像（结果与 _create_merged_image 相同）
+
+        Args:
+            path: 非空时在后台线程直接保存到该文件
+            on_done: 完成后在 GUI 线程调用 on_done(QImage, path)
+        """
+        from jietuba_export import export_async
+
+        target_size = QSize(max(1, self.width()), max(1, self.height()))
+        overlay = None
+        # 叠加仍在绘画层上的临时内容（例如还未提交的笔迹）
+        if hasattr(self, 'paintlayer') and self.paintlayer and hasattr(self.paintlayer, 'pixmap'):
+            paint_content = self.paintlayer.pixmap()
+            if paint_content and not paint_content.isNull():
+                overlay = paint_content.toImage()
+        return export_async(
+            self.layer_document.render_snapshot(), target_size, overlay=overlay, path=path, on_done=on_done
+        )
+
+    def copy_merged_image_async(self):
+        """后台合成完整图像后复制到剪贴板"""
+        def _copy(image, _path):
+            QApplication.clipboard().setImage(image)
+            print("✅ 已复制包含绘画内容的完整图像到剪贴板")
+
+        return self._export_merged_async(on_done=_copy)
+
     def _create_merged_image(self):
         """创建包含绘画内容的完整图像"""
         try:
@@ -1645,9 +1742,14 @@ class Freezer(QLabel):
             
         except Exception as e:
             print(f"❌ 创建合并图像失败: {e}")
-            # 出错时回退到当前显示的pixmap
+            # 出错时回退到当前显示的pixmap（分块显示时 pixmap 为空，改用原图）
             fallback = self.pixmap()
-            return fallback if fallback and not fallback.isNull() else QPixmap()
+            if fallback and not fallback.isNull():
+                return fallback
+            try:
+                return self.layer_document.render_base(QSize(max(1, self.width()), max(1, self.height())))
+            except Exception:
+                return QPixmap()
             
     def change_ontop(self):
         if self.on_top:
@@ -1722,7 +1824,8 @@ class Freezer(QLabel):
                     else:
                         scale = self.height() / max(1, self.width())
                     h = int(w * scale)
-                    display = self._render_for_display(w, h)
+                    # 连续滚动时只显示快速预览，停止后由 _finish_zoom 高质量重绘
+                    display = self._render_for_display(w, h, preview=True)
                     if display is not None:
                         self.setPixmap(display)
                     self.resize(w, h)
@@ -1731,9 +1834,19 @@ class Freezer(QLabel):
                     delta_x = -(w - old_width)*old_pos.x()/old_width
                     delta_y = -(h - old_height)*old_pos.y()/old_height
                     self.move(self.x() + delta_x, self.y() + delta_y)
-                    QApplication.processEvents()
+                    if self._zoom_timer is not None:
+                        self._zoom_timer.start()
 
             self.update()
+    def _finish_zoom(self):
+        """缩放停止后按当前尺寸重新高质量渲染"""
+        if self.closed or getattr(self, '_is_closed', False) or not hasattr(self, 'layer_document'):
+            return
+        display = self._render_for_display(self.width(), self.height())
+        if display is not None:
+            self.setPixmap(display)
+        self.update()
+
     def _clamp_position_to_virtual_desktop(self, x: int, y: int) -> Tuple[int, int]:
         """将窗口位置限制在虚拟桌面范围内，防止移动到极端坐标。"""
         screens = QApplication.screens()
@@ -2485,6 +2598,14 @@ class Freezer(QLabel):
             self.settingOpacity = False
 
     def paintEvent(self, event):
+        if getattr(self, '_tiled_size', None) is not None and self._tile_cache is not None:
+            # 分块显示：只渲染/绘制本次需要重绘的区域覆盖到的块
+            painter = QPainter(self)
+            try:
+                self._tile_cache.paint(painter, self._tiled_size, event.rect())
+            except Exception as e:
+                print(f"⚠️ 钉图分块绘制失败: {e}")
+            painter.end()
         super().paintEvent(event)
         
         # 钉图窗口只负责绘制边框，绘画内容由paintlayer处理
@@ -2562,6 +2683,10 @@ class Freezer(QLabel):
             self.timer = None
             print(f"🧹 [内存清理] 定时器已停止并删除")
         
+        if getattr(self, '_zoom_timer', None) is not None:
+            self._zoom_timer.stop()
+            self._zoom_timer = None
+
         # 停止延迟隐藏定时器
         if hasattr(self, 'hide_timer') and self.hide_timer:
             self.hide_timer.stop()
@@ -2707,6 +2832,10 @@ class Freezer(QLabel):
             except Exception as e:
                 print(f"⚠️ 清理backup_pic_list时出错: {e}")
         
+        # 清理分块显示缓存
+        self._tiled_size = None
+        self._tile_cache = None
+        
         # 清理 origin_imgpix 和 showing_imgpix（已废弃，不再使用）
         
         # 清理关闭按钮
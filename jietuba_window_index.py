@@ -0,0 +1,219 @@
+"""
+jietuba_window_index.py - 智能选区窗口枚举与空间索引模块
+
+把 Finder 的"枚举窗口"和"按鼠标位置查找窗口"拆开:
+- WindowProvider 接口负责枚举可选窗口 (按 Z-order 从顶到底)
+- WindowRectIndex 把窗口矩形按网格分桶,鼠标移动时只检查所在格子里的窗口
+
+这样索引部分不依赖 Windows,可以用 FakeWindowProvider 在任意平台测试和压测。
+
+主要类:
+- WindowProvider: 窗口枚举接口
+- Win32WindowProvider: 基于 win32gui.EnumWindows 的实现 (类名按 hwnd 缓存)
+- FakeWindowProvider: 返回固定窗口列表的实现 (测试/模拟)
+- WindowRectIndex: 网格分桶的窗口矩形索引
+
+使用方法:
+    provider = FakeWindowProvider([(1, [0, 0, 800, 600], "A"), (2, [100, 100, 400, 300], "B")])
+    index = WindowRectIndex(provider.enumerate())
+    hit = index.find((150, 150))   # -> (1, [0, 0, 800, 600], "A")  (列表靠前的窗口在上层)
+"""
+
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+WindowEntry = Tuple[int, List[int], str]  # (hwnd, [x1, y1, x2, y2], title)
+
+# 不作为智能选区候选的窗口类
+EXCLUDED_CLASSES = (
+    'Windows.UI.Core.CoreWindow',  # UWP后台窗口
+    'ApplicationFrameWindow',      # UWP框架窗口（有时是空的）
+    'WorkerW',                     # 桌面工作窗口
+    'Progman',                     # 程序管理器
+)
+
+
+class WindowProvider(ABC):
+    """窗口枚举接口
+
+    enumerate() 返回按 Z-order 从顶到底排列的 [(hwnd, [x1, y1, x2, y2], title)]，
+    坐标已减去 (offset_x, offset_y)，即相对于截图窗口。
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def enumerate(self, offset_x: int = 0, offset_y: int = 0) -> List[WindowEntry]:
+        """枚举可选窗口（按 Z-order 从顶到底）"""
+
+
+class Win32WindowProvider(WindowProvider):
+    """通过 win32gui.EnumWindows 枚举可见的顶层窗口"""
+
+    name = "win32"
+
+    def __init__(self, min_size: int = 30):
+        self.min_size = min_size
+        # 窗口类名在窗口生命周期内不会改变，按 hwnd 缓存，重复截图时省去 GetClassName
+        self._class_names: Dict[int, str] = {}
+
+    def _class_name(self, hwnd: int) -> str:
+        name = self._class_names.get(hwnd)
+        if name is None:
+            import win32gui
+            try:
+                name = win32gui.GetClassName(hwnd)
+            except Exception:
+                name = ""
+            self._class_names[hwnd] = name
+        return name
+
+    def enumerate(self, offset_x: int = 0, offset_y: int = 0) -> List[WindowEntry]:
+        import win32gui
+        import win32con
+
+        windows: List[WindowEntry] = []
+        seen = set()
+
+        def enum_windows_callback(hwnd, _):
+            """枚举窗口回调函数"""
+            try:
+                seen.add(hwnd)
+                # 1. 只处理可见窗口
+                if not win32gui.IsWindowVisible(hwnd):
+                    return True
+
+                # 2. 检查窗口样式（排除无标题栏窗口、工具窗口、透明遮罩）
+                style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
+                if not (style & win32con.WS_CAPTION):
+                    return True
+                ex_style = win32gui.GetWindowLong(hwnd, win32con.GWL_EXSTYLE)
+                if ex_style & (win32con.WS_EX_TOOLWINDOW | win32con.WS_EX_TRANSPARENT):
+                    return True
+
+                # 3. 必须有窗口标题
+                title = win32gui.GetWindowText(hwnd)
+                if not title or len(title.strip()) == 0:
+                    return True
+
+                # 4. 窗口矩形：大小合理且至少部分在屏幕可见区域内
+                x1, y1, x2, y2 = win32gui.GetWindowRect(hwnd)
+                if x2 - x1 < self.min_size or y2 - y1 < self.min_size:
+                    return True
+                if x2 < -1000 or y2 < -1000 or x1 > 10000 or y1 > 10000:
+                    return True
+
+                # 5. 排除特殊的系统窗口类
+                if self._class_name(hwnd) in EXCLUDED_CLASSES:
+                    return True
+
+                # 6. 转换为相对于截图区域的坐标
+                windows.append((hwnd, [x1 - offset_x, y1 - offset_y, x2 - offset_x, y2 - offset_y], title))
+            except Exception:
+                # 静默处理异常，继续枚举下一个窗口
+                pass
+            return True
+
+        win32gui.EnumWindows(enum_windows_callback, None)
+        # 丢弃已销毁窗口的类名缓存（hwnd 可能被系统复用）
+        for hwnd in [h for h in self._class_names if h not in seen]:
+            del self._class_names[hwnd]
+        return windows
+
+
+class FakeWindowProvider(WindowProvider):
+    """返回固定窗口列表的枚举器（坐标为全局坐标，枚举时同样减去偏移）"""
+
+    name = "fake"
+
+    def __init__(self, windows: Sequence[WindowEntry] = ()):
+        self.windows = [(hwnd, list(rect), title) for hwnd, rect, title in windows]
+        self.calls = 0
+
+    def enumerate(self, offset_x: int = 0, offset_y: int = 0) -> List[WindowEntry]:
+        self.calls += 1
+        return [
+            (hwnd, [rect[0] - offset_x, rect[1] - offset_y, rect[2] - offset_x, rect[3] - offset_y], title)
+            for hwnd, rect, title in self.windows
+        ]
+
+
+class WindowRectIndex:
+    """窗口矩形的网格分桶索引
+
+    每个窗口登记到它覆盖的所有格子里；格子内按 Z-order 排列，
+    查询时取所在格子中第一个包含该点的窗口即为最顶层窗口。
+    """
+
+    def __init__(self, windows: Sequence[WindowEntry] = (), cell_size: int = 256):
+        self.cell_size = max(16, int(cell_size))
+        self.windows: List[WindowEntry] = []
+        self._buckets: Dict[Tuple[int, int], List[int]] = {}
+        self.update(windows)
+
+    def __len__(self) -> int:
+        return len(self.windows)
+
+    def update(self, windows: Sequence[WindowEntry]) -> bool:
+        """用新的枚举结果更新索引；窗口及其位置都没有变化时保留原索引
+
+        Returns:
+            是否重建了索引
+        """
+        windows = list(windows)
+        if windows == self.windows and self._buckets:
+            return False
+        self.windows = windows
+        self._buckets = {}
+        size = self.cell_size
+        for z, (_hwnd, rect, _title) in enumerate(windows):
+            x1, y1, x2, y2 = rect
+            for cy in range(y1 // size, y2 // size + 1):
+                for cx in range(x1 // size, x2 // size + 1):
+                    self._buckets.setdefault((cx, cy), []).append(z)
+        return True
+
+    def find_z(self, point) -> Optional[int]:
+        """返回包含该点的最顶层窗口在列表中的下标（Z-order）"""
+        x, y = point
+        size = self.cell_size
+        for z in self._buckets.get((int(x // size), int(y // size)), ()):
+            x1, y1, x2, y2 = self.windows[z][1]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                return z
+        return None
+
+    def find(self, point) -> Optional[WindowEntry]:
+        """返回包含该点的最顶层窗口 (hwnd, rect, title)"""
+        z = self.find_z(point)
+        return self.windows[z] if z is not None else None
+
+    def find_all(self, point) -> List[int]:
+        """返回包含该点的所有窗口下标（从顶到底）"""
+        x, y = point
+        size = self.cell_size
+        result = []
+        for z in self._buckets.get((int(x // size), int(y // size)), ()):
+            x1, y1, x2, y2 = self.windows[z][1]
+            if x1 <= x <= x2 and y1 <= y <= y2:
+                result.append(z)
+        return result
+
+    def clear(self) -> None:
+        self.windows = []
+        self._buckets = {}
+
+
+def create_default_provider() -> WindowProvider:
+    """返回当前平台可用的窗口枚举器"""
+    return Win32WindowProvider()
+
+
+__all__ = [
+    "WindowProvider",
+    "Win32WindowProvider",
+    "FakeWindowProvider",
+    "WindowRectIndex",
+    "create_default_provider",
+]
@@ -33,6 +33,12 @@ import signal
 import faulthandler
 from datetime import datetime
 from pathlib import Path
+
+# 启动分析模式（--profile-startup）需要在导入其他模块之前开启
+from jietuba_startup import startup_profiler, profiling_requested, warm_up_imports
+if profiling_requested():
+    startup_profiler.start()
+
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QComboBox, QSystemTrayIcon, QMenu, QAction, 
@@ -44,9 +50,9 @@ from PyQt5.QtCore import pyqtSignal, QTimer, Qt, pyqtSlot, QAbstractNativeEventF
 # 导入截图核心功能
 from jietuba_screenshot import Slabel
 from jietuba_public import CONFIG_DICT
-from jietuba_settings import SettingsDialog
-from jietuba_long_stitch_unified import normalize_engine_value
 from jietuba_logger import get_logger
+# 设置对话框 / 长截图拼接引擎 / OCR 等较重的模块在首次使用时导入，
+# 启动后空闲时由 _warm_up_deferred_modules 在后台预加载
 
 # 内置全局快捷键实现（Windows）
 # 使用 RegisterHotKey + 原生事件过滤器捕获 WM_HOTKEY
@@ -380,11 +386,27 @@ class ConfigManager:
     def set_hotkey(self, hotkey):
         self.settings.setValue('hotkey/global', hotkey)
     
+    def get_repeat_region_hotkey(self):
+        """获取"前回範囲"快捷键（空字符串表示禁用）"""
+        return self.settings.value('hotkey/repeat_region', "", type=str)
+    
+    def set_repeat_region_hotkey(self, hotkey):
+        """设置"前回範囲"快捷键"""
+        self.settings.setValue('hotkey/repeat_region', hotkey)
+    
     def get_smart_selection(self):
         return self.settings.value('screenshot/smartcursor', self.smart_selection_default, type=bool)
     
     def set_smart_selection(self, enabled):
         self.settings.setValue('screenshot/smartcursor', enabled)
+
+    def get_smart_image_regions(self):
+        """获取基于截图画面的界面元素检测开关（默认关闭）"""
+        return self.settings.value('screenshot/smart_image_regions', False, type=bool)
+
+    def set_smart_image_regions(self, enabled):
+        """设置基于截图画面的界面元素检测开关"""
+        self.settings.setValue('screenshot/smart_image_regions', bool(enabled))
     
     def get_taskbar_button(self):
         """获取任务栏按钮开关状态"""
@@ -408,6 +430,7 @@ class ConfigManager:
 
     def get_long_stitch_engine(self):
         """获取长截图拼接引擎设置"""
+        from jietuba_long_stitch_unified import normalize_engine_value
         raw_value = self.settings.value('screenshot/long_stitch_engine', 'hash_rust', type=str)
         normalized = normalize_engine_value(raw_value)
         
@@ -422,6 +445,7 @@ class ConfigManager:
     
     def set_long_stitch_engine(self, engine):
         """设置长截图拼接引擎"""
+        from jietuba_long_stitch_unified import normalize_engine_value
         normalized = normalize_engine_value(engine)
         
         # 🆕 如果尝试设置auto或rust，强制切换为hash_python
@@ -484,6 +508,34 @@ class ConfigManager:
     def set_pinned_auto_toolbar(self, enabled: bool):
         """设置钉图窗口自动显示工具栏开关"""
         self.settings.setValue('pinned/auto_toolbar', bool(enabled))
+
+    def get_low_latency_capture(self):
+        """获取低延迟截图模式开关（后台预截屏，默认关闭）"""
+        return self.settings.value('screenshot/low_latency_mode', False, type=bool)
+
+    def set_low_latency_capture(self, enabled: bool):
+        """设置低延迟截图模式开关"""
+        self.settings.setValue('screenshot/low_latency_mode', bool(enabled))
+
+    def get_simplify_strokes(self):
+        """获取提交笔迹时是否简化采样点（默认开启）"""
+        return self.settings.value('paint/simplify_strokes', True, type=bool)
+
+    def set_simplify_strokes(self, enabled: bool):
+        """设置笔迹简化开关"""
+        from jietuba_layer_system import reload_stroke_commit_options
+        self.settings.setValue('paint/simplify_strokes', bool(enabled))
+        reload_stroke_commit_options()
+
+    def get_smooth_strokes(self):
+        """获取提交笔迹时是否平滑（曲线拟合，默认关闭）"""
+        return self.settings.value('paint/smooth_strokes', False, type=bool)
+
+    def set_smooth_strokes(self, enabled: bool):
+        """设置笔迹平滑开关"""
+        from jietuba_layer_system import reload_stroke_commit_options
+        self.settings.setValue('paint/smooth_strokes', bool(enabled))
+        reload_stroke_commit_options()
     
     def get_ocr_enabled(self):
         """获取 OCR 功能开关状态（默认关闭）"""
@@ -582,6 +634,7 @@ class MainWindow(QMainWindow):
         self._setup_window()
         self._setup_ui()
         self._setup_tray()
+        startup_profiler.mark("托盘就绪")
         self._setup_signals()
 
         # 初始化截图组件
@@ -604,12 +657,24 @@ class MainWindow(QMainWindow):
         # 预加载设置对话框（延迟创建，避免阻塞启动）
         self._settings_dialog = None
         QTimer.singleShot(1000, self._preload_settings_dialog)
+        # 空闲时在后台预加载长截图/OCR 等模块
+        QTimer.singleShot(3000, self._warm_up_deferred_modules)
+
+    def _warm_up_deferred_modules(self):
+        """后台预加载首次使用时才导入的模块（startup/warmup 关闭时跳过）"""
+        if not self.config_manager.settings.value('startup/warmup', True, type=bool):
+            return
+        modules = ['pynput.mouse', 'jietuba_long_stitch_unified', 'jietuba_scroll']
+        if self.config_manager.get_ocr_enabled():
+            modules.append('jietuba_ocr')
+        warm_up_imports(modules)
 
     def _preload_settings_dialog(self):
         """预加载设置对话框，避免首次打开时卡顿"""
         try:
             if self._settings_dialog is None:
                 print("⚙️ [预加载] 开始预加载设置对话框...")
+                from jietuba_settings import SettingsDialog
                 self._settings_dialog = SettingsDialog(
                     self.config_manager, 
                     self.current_hotkey, 
@@ -772,6 +837,7 @@ class MainWindow(QMainWindow):
             success = self.hotkey_manager.register_hotkey(hotkey_str, self.start_screenshot)
             if success:
                 print(f"✅ 全局快捷键注册成功: {hotkey_str}")
+                self._register_repeat_region_hotkey()
                 return True
             else:
                 print(f"❌ 全局快捷键注册失败: {hotkey_str}")
@@ -782,6 +848,19 @@ class MainWindow(QMainWindow):
             traceback.print_exc()
             return False
         
+    def _register_repeat_region_hotkey(self):
+        """注册"前回範囲"快捷键（未设置时跳过，失败不影响主快捷键）"""
+        repeat_hotkey = self.config_manager.get_repeat_region_hotkey().strip()
+        if not repeat_hotkey:
+            return
+        try:
+            if self.hotkey_manager.register_hotkey(repeat_hotkey, self.start_repeat_region_screenshot):
+                print(f"✅ 前回範囲快捷键注册成功: {repeat_hotkey}")
+            else:
+                print(f"❌ 前回範囲快捷键注册失败: {repeat_hotkey}")
+        except Exception as e:
+            print(f"❌ 注册前回範囲快捷键时出错: {e}")
+        
     def _on_screenshot_end(self):
         """截图结束回调"""
         print("截图完成")
@@ -1035,6 +1114,10 @@ class MainWindow(QMainWindow):
         screenshot_action.triggered.connect(self.start_screenshot)
         tray_menu.addAction(screenshot_action)
         
+        open_action = QAction("編集ファイルを開く...", self)
+        open_action.triggered.connect(self.open_annotation_file)
+        tray_menu.addAction(open_action)
+        
         show_action = QAction("メインウィンドウを表示", self)
         show_action.triggered.connect(self.show_main_window)
         tray_menu.addAction(show_action)
@@ -1059,6 +1142,29 @@ class MainWindow(QMainWindow):
         
         # 注册全局快捷键
         self._register_hotkey(self.current_hotkey)
+        
+        # 低延迟截图模式：启动后台截屏
+        self.capture_ring = None
+        self._apply_low_latency_capture(self.config_manager.get_low_latency_capture())
+
+    def _apply_low_latency_capture(self, enabled):
+        """启动/停止低延迟截图模式的后台截屏"""
+        if enabled and self.capture_ring is None:
+            from jietuba_capture import CaptureRingBuffer
+            interval = self.config_manager.settings.value('screenshot/low_latency_interval', 1.0, type=float)
+            self.capture_ring = CaptureRingBuffer(interval=interval, busy=self._pinned_editing).start()
+        elif not enabled and self.capture_ring is not None:
+            self.capture_ring.stop()
+            self.capture_ring = None
+            print("🎞️ [低延迟] 后台截屏已停止")
+
+    def _pinned_editing(self):
+        """钉图工具栏是否显示中（正在编辑钉图时后台截屏暂停，避免卡顿）"""
+        widget = getattr(self, 'screenshot_widget', None)
+        if not widget or getattr(widget, 'mode', None) != "pinned":
+            return False
+        box = getattr(widget, 'botton_box', None)
+        return bool(box and box.isVisible())
 
     def _update_hotkey_display(self):
         """更新快捷键显示"""
@@ -1132,8 +1238,13 @@ class MainWindow(QMainWindow):
     def start_screenshot(self):
         """开始截图"""
         print("开始截图...")
+        self._hotkey_time = time.perf_counter()
         self.status_label.setText("スクリーンショット中...")
         
+        # 低延迟模式：主窗口/任务栏按钮都不在画面上时，直接用缓冲帧显示截图界面
+        if self._start_screenshot_from_ring():
+            return
+        
         # 关闭所有打开的对话框（包括设置对话框）
         for widget in QApplication.topLevelWidgets():
             if isinstance(widget, QDialog) and widget.isVisible():
@@ -1153,6 +1264,10 @@ class MainWindow(QMainWindow):
             self.taskbar_button.hide()
             print("✅ 任务栏按钮已隐藏用于截图")
         
+        # 后台截屏暂停，避免截到截图界面
+        if getattr(self, 'capture_ring', None) is not None:
+            self.capture_ring.pause()
+        
         # 延迟一小段时间确保窗口完全隐藏
         QTimer.singleShot(50, self._do_screenshot)
     
@@ -1161,12 +1276,93 @@ class MainWindow(QMainWindow):
         # 开始截图
         if self.screenshot_widget:
             self.screenshot_widget.screen_shot()
+            self._log_overlay_latency("实时截屏")
+
+    def _start_screenshot_from_ring(self):
+        """低延迟模式：用后台缓冲的最新帧立即显示截图界面，随后刷新为最新截图
+
+        Returns:
+            bool: 是否已经走了低延迟路径
+        """
+        ring = getattr(self, 'capture_ring', None)
+        if ring is None or not self.screenshot_widget:
+            return False
+        # 主窗口或任务栏按钮可见时缓冲帧里会包含它们，走普通流程
+        if self.isVisible() or (getattr(self, 'taskbar_button', None) and self.taskbar_button.isVisible()):
+            ring.pause()
+            return False
+        if any(isinstance(w, QDialog) and w.isVisible() for w in QApplication.topLevelWidgets()):
+            ring.pause()
+            return False
+        
+        # 不能事后刷新背景时（不支持 WDA_EXCLUDEFROMCAPTURE），只接受 2 个间隔内的帧，否则重新截屏
+        from jietuba_capture import capture_exclusion_supported
+        max_age = ring.interval * (4 if capture_exclusion_supported() else 2)
+        frame = ring.take_latest(max_age)
+        ring.pause()
+        if frame is None:
+            return False
+        capture, age = frame
+        
+        self._was_visible = False
+        self._taskbar_button_was_visible = False
+        widget = self.screenshot_widget
+        widget.screen_shot(capture=capture)
+        self._log_overlay_latency(f"缓冲帧 {age * 1000:.0f}ms前")
+        QTimer.singleShot(0, widget.refine_background)
+        return True
+
+    def _log_overlay_latency(self, source):
+        """输出快捷键→截图界面显示的延迟"""
+        start = getattr(self, '_hotkey_time', None)
+        if start is not None:
+            print(f"⏱️ 快捷键→截图界面: {(time.perf_counter() - start) * 1000:.1f}ms ({source})")
+            self._hotkey_time = None
+
+    def start_repeat_region_screenshot(self):
+        """按上一次的截图区域直接截图（不显示全屏选择界面）"""
+        from jietuba_capture import load_last_region
+        region = load_last_region()
+        if region is None:
+            print("⚠️ 没有可用的上次截图区域，改为普通截图")
+            self.start_screenshot()
+            return
+        
+        print(f"开始截取上次区域: {region.x()}, {region.y()}, {region.width()}x{region.height()}")
+        # 隐藏主窗口和任务栏按钮，避免被截进去
+        self._repeat_restore_main = self.isVisible()
+        if self._repeat_restore_main:
+            self.hide()
+        self._repeat_restore_taskbar = bool(
+            getattr(self, 'taskbar_button', None) and self.taskbar_button.isVisible())
+        if self._repeat_restore_taskbar:
+            self.taskbar_button.hide()
+        QTimer.singleShot(50, lambda: self._do_repeat_region_screenshot(region))
+
+    def _do_repeat_region_screenshot(self, region):
+        """实际截取上次区域并走普通截图的保存/剪贴板流程"""
+        from jietuba_capture import grab_region
+        try:
+            pixmap = grab_region(region)
+            if pixmap.isNull():
+                print("❌ 上次区域截图失败")
+            else:
+                self.handle_screenshot_completion(pixmap)
+        finally:
+            if getattr(self, '_repeat_restore_taskbar', False):
+                self.taskbar_button.show()
+            if getattr(self, '_repeat_restore_main', False):
+                self.show()
 
     def _on_screenshot_end(self):
         """截图结束处理"""
         print("截图结束")
         self.status_label.setText("待機中")
         
+        # 恢复后台截屏
+        if getattr(self, 'capture_ring', None) is not None:
+            self.capture_ring.resume()
+        
         # 恢复任务栏按钮（如果之前是显示的）
         if hasattr(self, '_taskbar_button_was_visible') and self._taskbar_button_was_visible:
             if hasattr(self, 'taskbar_button') and self.taskbar_button:
@@ -1215,6 +1411,7 @@ class MainWindow(QMainWindow):
             # 使用预加载的对话框，或首次创建
             if self._settings_dialog is None:
                 print("⚠️ [DEBUG] 设置对话框未预加载，立即创建...")
+                from jietuba_settings import SettingsDialog
                 self._settings_dialog = SettingsDialog(self.config_manager, self.current_hotkey, self)
             else:
                 print("✅ [DEBUG] 使用预加载的设置对话框")
@@ -1223,6 +1420,7 @@ class MainWindow(QMainWindow):
             
             print("🔍 [DEBUG] 设置对话框已准备")
             
+            old_repeat_hotkey = self.config_manager.get_repeat_region_hotkey()
             result = self._settings_dialog.exec_()
             print(f"🔍 [DEBUG] 对话框执行结果: {result}")
             
@@ -1265,6 +1463,12 @@ class MainWindow(QMainWindow):
                         )
                 else:
                     print(f"🔍 [DEBUG] 快捷键未改变或为空")
+                    # 只修改了前回範囲快捷键时，重新注册全部快捷键
+                    if self.config_manager.get_repeat_region_hotkey() != old_repeat_hotkey:
+                        self._register_hotkey(self.current_hotkey)
+                
+                # 低延迟截图模式
+                self._apply_low_latency_capture(self.config_manager.get_low_latency_capture())
                 
                 # 更新任务栏按钮状态
                 taskbar_enabled = self.config_manager.get_taskbar_button()
@@ -1294,6 +1498,48 @@ class MainWindow(QMainWindow):
             2000
         )
 
+    def open_annotation_file(self, path=None):
+        """打开 .jtba 编辑文件，恢复为可继续编辑的钉图窗口"""
+        from PyQt5.QtWidgets import QFileDialog
+        from PyQt5.QtCore import QStandardPaths
+        from PyQt5.QtGui import QCursor
+        from jietuba_document_file import FILE_FILTER, DocumentFileReader
+        from jietuba_widgets import Freezer
+
+        # 钉图窗口的绘制工具依赖截图窗口，截图窗口尚未创建或已释放时不打开
+        if not self.screenshot_widget:
+            print("⚠️ 截图窗口不可用，无法打开编辑文件")
+            return None
+        if not path:
+            path, _ = QFileDialog.getOpenFileName(
+                None, "編集ファイルを開く",
+                QStandardPaths.writableLocation(QStandardPaths.PicturesLocation), FILE_FILTER)
+        if not path:
+            return None
+        try:
+            start = time.perf_counter()
+            reader = DocumentFileReader(path)
+            base = QPixmap.fromImage(reader.base_image())
+            state = reader.export_state()
+            print(f"📂 编辑文件: {path} ({len(state)} 条命令, 读取 {(time.perf_counter() - start) * 1000:.0f}ms)")
+        except Exception as e:
+            print(f"❌ 编辑文件读取失败: {e}")
+            QMessageBox.warning(None, "jietuba", f"ファイルを開けませんでした:\n{e}")
+            return None
+
+        # 钉图窗口出现在鼠标所在屏幕内
+        screen = QApplication.screenAt(QCursor.pos()) or QApplication.primaryScreen()
+        area = screen.availableGeometry()
+        x = max(area.left(), min(QCursor.pos().x() - base.width() // 2, area.right() - base.width()))
+        y = max(area.top(), min(QCursor.pos().y() - base.height() // 2, area.bottom() - base.height()))
+        freezer = Freezer(None, base, x, y, len(self.freeze_imgs), self.screenshot_widget)
+        freezer.layer_document.import_state(state)
+        freezer._refresh_from_document(clear_overlay=True)
+        # 打开时的状态作为撤销历史的起点
+        freezer._capture_history_state(initial=True)
+        self.freeze_imgs.append(freezer)
+        return freezer
+
     def show_main_window(self):
         """显示主窗口 - 增强版，确保窗口能正确显示"""
         try:
@@ -1373,6 +1619,10 @@ class MainWindow(QMainWindow):
                         pass
                 self.freeze_imgs.clear()
                 print("🧹 所有钉图窗口已清理")
+
+            # 等待后台导出（保存中的文件）完成
+            if 'jietuba_export' in sys.modules:
+                sys.modules['jietuba_export'].wait_all()
             
             # 清理截图组件
             if hasattr(self, 'screenshot_widget') and self.screenshot_widget:
@@ -1388,6 +1638,10 @@ class MainWindow(QMainWindow):
                 self.hotkey_manager.unregister_all()
                 print("已注销所有全局快捷键")
             
+            # 停止后台截屏
+            if getattr(self, 'capture_ring', None) is not None:
+                self._apply_low_latency_capture(False)
+            
             # 清理窗口监控定时器
             if hasattr(self, 'window_monitor_timer'):
                 self.window_monitor_timer.stop()
@@ -1432,6 +1686,7 @@ def main():
     logger.info("🚀 [Watchdog] main() 启动")
 
     app = QApplication(sys.argv)
+    startup_profiler.mark("QApplication 创建")
     # 托盘应用关键设置：避免所有窗口被隐藏/关闭时自动退出
 
     try:
@@ -1461,6 +1716,7 @@ def main():
     
     # 创建主窗口
     window = MainWindow()
+    startup_profiler.mark("主窗口创建")
     
     # 根据配置决定是否显示主窗口
     if window.config_manager.get_show_main_window():
@@ -1470,6 +1726,8 @@ def main():
         print("ℹ️ 后台启动模式，主窗口未显示")
     
     print("jietuba启动完成")
+    if startup_profiler.enabled:
+        QTimer.singleShot(0, lambda: (startup_profiler.mark("事件循环就绪"), startup_profiler.report()))
     
     # 运行应用程序
     sys.exit(app.exec_())